@@ -13,12 +13,12 @@ from opaque_keys.edx.keys import CourseKey
 from requests.exceptions import HTTPError
 from rest_framework import serializers
 
-from enterprise_access.apps.content_assignments.content_metadata_api import get_content_metadata_for_assignments
 from enterprise_access.apps.subsidy_access_policy.constants import (
     CENTS_PER_DOLLAR,
     SORT_BY_ENROLLMENT_COUNT,
     PolicyTypes
 )
+from enterprise_access.apps.subsidy_access_policy.credits_available import LearnerAssignmentsLoader
 from enterprise_access.apps.subsidy_access_policy.models import SubsidyAccessPolicy
 
 from .content_assignments.assignment import (
@@ -87,35 +87,66 @@ class SubsidyAccessPolicyAggregatesSerializer(serializers.Serializer):
         help_text="Total Amount of available spend for policy, in USD.",
     )
 
-    @extend_schema_field(serializers.IntegerField)
-    def get_amount_redeemed_usd_cents(self, policy):
+    def _prefetched_aggregates(self, policy):
+        """
+        Returns the ``PolicyAggregates`` for the given policy that the view bulk loaded
+        into the serializer context, or None.
+        """
+        return self.context.get('policy_aggregates', {}).get(policy.uuid)
+
+    def _total_redeemed(self, policy):
+        """
+        Protect against Subsidy API Errors.
+        """
+        if prefetched_aggregates := self._prefetched_aggregates(policy):
+            return prefetched_aggregates.total_redeemed
+        try:
+            return policy.total_redeemed
+        except HTTPError as exc:
+            logger.exception(f"HTTPError from subsidy service: {exc}")
+            return None
+
+    def _total_allocated(self, policy):
+        if prefetched_aggregates := self._prefetched_aggregates(policy):
+            return prefetched_aggregates.total_allocated
+        return policy.total_allocated
+
+    def _spend_available(self, policy):
         """
-        Make amount a positive number.
         Protect against Subsidy API Errors.
         """
+        if prefetched_aggregates := self._prefetched_aggregates(policy):
+            return prefetched_aggregates.spend_available
         try:
-            return policy.total_redeemed * -1
+            return policy.spend_available
         except HTTPError as exc:
             logger.exception(f"HTTPError from subsidy service: {exc}")
             return None
 
+    @extend_schema_field(serializers.IntegerField)
+    def get_amount_redeemed_usd_cents(self, policy):
+        """
+        Make amount a positive number.
+        Protect against Subsidy API Errors.
+        """
+        total_redeemed = self._total_redeemed(policy)
+        if total_redeemed is None:
+            return None
+        return total_redeemed * -1
+
     @extend_schema_field(serializers.IntegerField)
     def get_amount_allocated_usd_cents(self, policy):
         """
         Make amount a positive number.
         """
-        return policy.total_allocated * -1
+        return self._total_allocated(policy) * -1
 
     @extend_schema_field(serializers.IntegerField)
     def get_spend_available_usd_cents(self, policy):
         """
         Protect against Subsidy API Errors.
         """
-        try:
-            return policy.spend_available
-        except HTTPError as exc:
-            logger.exception(f"HTTPError from subsidy service: {exc}")
-            return None
+        return self._spend_available(policy)
 
     @extend_schema_field(serializers.FloatField)
     def get_amount_redeemed_usd(self, policy):
@@ -124,11 +155,10 @@ class SubsidyAccessPolicyAggregatesSerializer(serializers.Serializer):
         Convert cents to dollars.
         Protect against Subsidy API Errors.
         """
-        try:
-            return float(policy.total_redeemed * -1) / CENTS_PER_DOLLAR
-        except HTTPError as exc:
-            logger.exception(f"HTTPError from subsidy service: {exc}")
+        total_redeemed = self._total_redeemed(policy)
+        if total_redeemed is None:
             return None
+        return float(total_redeemed * -1) / CENTS_PER_DOLLAR
 
     @extend_schema_field(serializers.FloatField)
     def get_amount_allocated_usd(self, policy):
@@ -136,7 +166,7 @@ class SubsidyAccessPolicyAggregatesSerializer(serializers.Serializer):
         Make amount a positive number.
         Convert cents to dollars.
         """
-        return float(policy.total_allocated * -1) / CENTS_PER_DOLLAR
+        return float(self._total_allocated(policy) * -1) / CENTS_PER_DOLLAR
 
     @extend_schema_field(serializers.FloatField)
     def get_spend_available_usd(self, policy):
@@ -144,11 +174,10 @@ class SubsidyAccessPolicyAggregatesSerializer(serializers.Serializer):
         Convert cents to dollars.
         Protect against Subsidy API Errors.
         """
-        try:
-            return float(policy.spend_available) / CENTS_PER_DOLLAR
-        except HTTPError as exc:
-            logger.exception(f"HTTPError from subsidy service: {exc}")
+        spend_available = self._spend_available(policy)
+        if spend_available is None:
             return None
+        return float(spend_available) / CENTS_PER_DOLLAR
 
 
 class SubsidyAccessPolicyResponseSerializer(serializers.ModelSerializer):
@@ -195,7 +224,7 @@ class SubsidyAccessPolicyResponseSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_group_associations(self, obj):
-        return list(obj.groups.values_list("enterprise_group_uuid", flat=True))
+        return list(obj.group_uuids())
 
 
 class SubsidyAccessPolicyCRUDSerializer(serializers.ModelSerializer):
@@ -297,7 +326,7 @@ class SubsidyAccessPolicyCRUDSerializer(serializers.ModelSerializer):
         return self.context['view']
 
     def get_group_associations(self, obj):
-        return list(obj.groups.values_list("enterprise_group_uuid", flat=True))
+        return list(obj.group_uuids())
 
     def create(self, validated_data):
         policy_type = validated_data.get('policy_type')
@@ -600,19 +629,17 @@ class SubsidyAccessPolicyCreditsAvailableResponseSerializer(SubsidyAccessPolicyR
         if not obj.is_assignable:
             return []
 
-        assignments = obj.assignment_configuration.assignments.prefetch_related('actions').filter(
-            lms_user_id=self.context.get('lms_user_id')
-        )
-        unacknowledged_assignments_uuids = [
-            assignment.uuid
-            for assignment in assignments
-            if not assignment.learner_acknowledged
-        ]
-        unacknowledged_assignments = assignments.filter(uuid__in=unacknowledged_assignments_uuids)
-        content_metadata_lookup = get_content_metadata_for_assignments(obj.catalog_uuid, unacknowledged_assignments)
-        context = {'content_metadata': content_metadata_lookup}
+        # The view loads assignments for every policy up front; fall back to loading them for just this one.
+        assignments_by_policy_uuid = self.context.get('assignments_by_policy_uuid')
+        if assignments_by_policy_uuid is None or obj.uuid not in assignments_by_policy_uuid:
+            assignments_by_policy_uuid = LearnerAssignmentsLoader([obj], self.context.get('lms_user_id')).load()
+        policy_assignments = assignments_by_policy_uuid.get(obj.uuid)
+        if not policy_assignments:
+            return []
+
+        context = {'content_metadata': policy_assignments.content_metadata}
         serializer = LearnerContentAssignmentWithLearnerAcknowledgedResponseSerializer(
-            unacknowledged_assignments,
+            policy_assignments.assignments,
             many=True,
             context=context,
         )
@@ -634,7 +661,7 @@ class SubsidyAccessPolicyCreditsAvailableResponseSerializer(SubsidyAccessPolicyR
         return obj.subsidy_balance()
 
     def get_group_associations(self, obj):
-        return list(obj.groups.values_list("enterprise_group_uuid", flat=True))
+        return list(obj.group_uuids())
 
 
 class SubsidyAccessPolicyCanRedeemReasonResponseSerializer(serializers.Serializer):
@@ -51,6 +51,7 @@ from enterprise_access.apps.subsidy_access_policy.tests.factories import (
 )
 from enterprise_access.apps.subsidy_access_policy.utils import create_idempotency_key_for_transaction
 from enterprise_access.apps.subsidy_request.models import LearnerCreditRequestConfiguration
+from enterprise_access.concurrency_utils import FanOutResult
 from test_utils import TEST_ENTERPRISE_GROUP_UUID, TEST_USER_RECORD, APITestWithMocks
 
 SUBSIDY_ACCESS_POLICY_LIST_ENDPOINT = reverse('api:v1:subsidy-access-policies-list')
@@ -1184,10 +1185,24 @@ class TestSubsidyAccessPolicyRedeemViewset(APITestWithMocks):
         contains_key_patcher = mock.patch(path_prefix + 'catalog_contains_content_key')
         self.mock_contains_key = contains_key_patcher.start()
         self.mock_contains_key.return_value = True
+        contains_keys_patcher = mock.patch(
+            path_prefix + 'catalog_contains_content_keys',
+            side_effect=lambda content_keys: {key: self.mock_contains_key(key) for key in content_keys},
+        )
+        contains_keys_patcher.start()
+        self.addCleanup(contains_keys_patcher.stop)
 
         get_content_metadata_patcher = mock.patch(path_prefix + 'get_content_metadata')
         self.mock_get_content_metadata = get_content_metadata_patcher.start()
         self.mock_get_content_metadata.return_value = {}
+        get_content_metadata_for_keys_patcher = mock.patch(
+            path_prefix + 'get_content_metadata_for_keys',
+            side_effect=lambda content_keys: FanOutResult(
+                {key: self.mock_get_content_metadata(key) for key in content_keys}, {}, [],
+            ),
+        )
+        get_content_metadata_for_keys_patcher.start()
+        self.addCleanup(get_content_metadata_for_keys_patcher.stop)
 
         lms_client_patcher = mock.patch('enterprise_access.apps.subsidy_access_policy.models.LmsApiClient')
         lms_client = lms_client_patcher.start()
@@ -1773,10 +1788,24 @@ class BaseCanRedeemTestMixin:
         contains_key_patcher = mock.patch(path_prefix + 'catalog_contains_content_key')
         self.mock_contains_key = contains_key_patcher.start()
         self.mock_contains_key.return_value = True
+        contains_keys_patcher = mock.patch(
+            path_prefix + 'catalog_contains_content_keys',
+            side_effect=lambda content_keys: {key: self.mock_contains_key(key) for key in content_keys},
+        )
+        contains_keys_patcher.start()
+        self.addCleanup(contains_keys_patcher.stop)
 
         get_content_metadata_patcher = mock.patch(path_prefix + 'get_content_metadata')
         self.mock_get_content_metadata = get_content_metadata_patcher.start()
         self.mock_get_content_metadata.return_value = {}
+        get_content_metadata_for_keys_patcher = mock.patch(
+            path_prefix + 'get_content_metadata_for_keys',
+            side_effect=lambda content_keys: FanOutResult(
+                {key: self.mock_get_content_metadata(key) for key in content_keys}, {}, [],
+            ),
+        )
+        get_content_metadata_for_keys_patcher.start()
+        self.addCleanup(get_content_metadata_for_keys_patcher.stop)
 
         transactions_for_learner_patcher = mock.patch(path_prefix + 'transactions_for_learner')
         self.mock_policy_transactions_for_learner = transactions_for_learner_patcher.start()
@@ -4,7 +4,6 @@ REST API views for the subsidy_access_policy app.
 import logging
 import math
 import os
-from collections import defaultdict
 from contextlib import suppress
 from urllib import parse
 
@@ -37,6 +36,11 @@ from enterprise_access.apps.core.constants import (
 )
 from enterprise_access.apps.events.signals import SUBSIDY_REDEEMED
 from enterprise_access.apps.events.utils import send_subsidy_redemption_event_to_event_bus
+from enterprise_access.apps.subsidy_access_policy.aggregates import PolicyAggregatesLoader
+from enterprise_access.apps.subsidy_access_policy.api import (
+    get_redeemable_policies_for_customer,
+    redeemable_policies_for_customer
+)
 from enterprise_access.apps.subsidy_access_policy.constants import (
     GROUP_MEMBERS_WITH_AGGREGATES_DEFAULT_PAGE_SIZE,
     REASON_BEYOND_ENROLLMENT_DEADLINE,
@@ -52,10 +56,10 @@ from enterprise_access.apps.subsidy_access_policy.constants import (
     REASON_POLICY_SPEND_LIMIT_REACHED,
     REASON_SUBSIDY_EXPIRED,
     SORT_BY_ENROLLMENT_COUNT,
-    MissingSubsidyAccessReasonUserMessages,
-    TransactionStateChoices
+    MissingSubsidyAccessReasonUserMessages
 )
 from enterprise_access.apps.subsidy_access_policy.content_metadata_api import make_list_price_dict
+from enterprise_access.apps.subsidy_access_policy.credits_available import LearnerAssignmentsLoader
 from enterprise_access.apps.subsidy_access_policy.exceptions import (
     ContentPriceNullException,
     MissingAssignment,
@@ -66,6 +70,7 @@ from enterprise_access.apps.subsidy_access_policy.models import (
     SubsidyAccessPolicy,
     SubsidyAccessPolicyLockAttemptFailed
 )
+from enterprise_access.apps.subsidy_access_policy.redeemability import PolicyRedeemabilityEvaluator
 from enterprise_access.apps.subsidy_access_policy.subsidy_api import (
     get_and_cache_subsidy_learners_aggregate_data,
     get_redemptions_by_content_and_policy_for_learner
@@ -320,8 +325,21 @@ class SubsidyAccessPolicyViewSet(
         """
         Lists `SubsidyAccessPolicy` records, filtered by the
         given query parameters.
+
+        The aggregates of every policy on the requested page are loaded in bulk,
+        and handed to the serializer via its context.
         """
-        return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        policies = page if page is not None else list(queryset)
+
+        context = self.get_serializer_context()
+        context['policy_aggregates'] = PolicyAggregatesLoader(policies).load()
+        serializer = self.get_serializer(policies, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
     @extend_schema(
         tags=[SUBSIDY_ACCESS_POLICY_CRUD_API_TAG],
@@ -480,17 +498,18 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
         Base queryset that returns all active & redeemable policies associated
         with the customer uuid requested by the client.
         """
-        return SubsidyAccessPolicy.policies_with_redemption_enabled().filter(
-            enterprise_customer_uuid=self.enterprise_customer_uuid,
-        ).order_by('-created')
+        return redeemable_policies_for_customer(self.enterprise_customer_uuid)
 
-    def evaluate_policies(self, enterprise_customer_uuid, lms_user_id, content_key, skip_customer_user_check=False):
+    def evaluate_policies(
+        self, enterprise_customer_uuid, lms_user_id, content_key, skip_customer_user_check=False, evaluator=None,
+    ):
         """
         Evaluate all policies for the given enterprise customer to check if it can be redeemed against the given learner
         and content.
 
-        Note: Calling this will cause multiple backend API calls to the enterprise-subsidy can_redeem endpoint, one for
-        each access policy evaluated.
+        Note: Unless a ``PolicyRedeemabilityEvaluator`` whose caches were already warmed via ``prefetch()`` is
+        provided, calling this will cause multiple backend API calls to the enterprise-subsidy can_redeem endpoint,
+        one for each subsidy evaluated.
 
         Returns:
             tuple of (list of SubsidyAccessPolicy, dict mapping str -> list of SubsidyAccessPolicy): The first tuple
@@ -498,40 +517,27 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
             non-redeemable policies.  The reason strings are non-specific, short explanations for why each bucket of
             policies has been deemed non-redeemable.
         """
-        redeemable_policies = []
-        non_redeemable_policies = defaultdict(list)
-        all_policies_for_enterprise = self.get_queryset()
-        for policy in all_policies_for_enterprise:
-            try:
-                redeemable, reason, _ = policy.can_redeem(
-                    lms_user_id, content_key, skip_customer_user_check=skip_customer_user_check
-                )
-                logger.info(
-                    f'[can_redeem] {policy} inputs: (lms_user_id={lms_user_id}, content_key={content_key}) results: '
-                    f'redeemable={redeemable}, reason={reason}.'
-                )
-            except ContentPriceNullException as exc:
-                logger.warning(f'{exc} when checking can_redeem() for {enterprise_customer_uuid}')
-                raise RedemptionRequestException(
-                    detail=f'Could not determine price for content_key: {content_key}',
-                ) from exc
-            if redeemable:
-                redeemable_policies.append(policy)
-            else:
-                # Aggregate the reasons for policies not being redeemable.  This really only works if the reason string
-                # is short and generic because the bucketing logic simply treats entire string as the bucket key.
-                non_redeemable_policies[reason].append(policy)
-
-        return (redeemable_policies, non_redeemable_policies)
+        if evaluator is None:
+            evaluator = PolicyRedeemabilityEvaluator(
+                get_redeemable_policies_for_customer(enterprise_customer_uuid),
+                lms_user_id,
+                skip_customer_user_check=skip_customer_user_check,
+            )
+        try:
+            return evaluator.evaluate(content_key)
+        except ContentPriceNullException as exc:
+            logger.warning(f'{exc} when checking can_redeem() for {enterprise_customer_uuid}')
+            raise RedemptionRequestException(
+                detail=f'Could not determine price for content_key: {content_key}',
+            ) from exc
 
     def policies_with_credit_available(self, enterprise_customer_uuid, lms_user_id):
         """
         Return policies with credit availble, associated with the given customer, and redeemable by the given learner.
         """
         policies = []
-        all_policies_for_enterprise = self.get_queryset().filter(
-            enterprise_customer_uuid=enterprise_customer_uuid
-        )
+        all_policies_for_enterprise = get_redeemable_policies_for_customer(enterprise_customer_uuid)
+        PolicyRedeemabilityEvaluator(all_policies_for_enterprise, lms_user_id).prefetch_credit_available()
         for policy in all_policies_for_enterprise:
             if policy.credit_available(lms_user_id):
                 policies.append(policy)
@@ -567,6 +573,10 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
             many=True,
             context={
                 'lms_user_id': lms_user_id,
+                'assignments_by_policy_uuid': LearnerAssignmentsLoader(
+                    policies_with_credit_available,
+                    lms_user_id,
+                ).load(),
             },
         ).data
 
@@ -619,11 +629,11 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
         content_key = serializer.data['content_key']
         metadata = serializer.data.get('metadata')
         try:
-            # For now, we should lock the whole policy (i.e. pass nothing to policy.lock()).  In some cases this is more
-            # aggressive than necessary, but we can optimize for performance at a later phase of this project.  At that
-            # point, we should also consider migrating this logic into the policy model so that different policy types
-            # that have different locking needs can supply different lock kwargs.
-            with policy.lock():
+            # Only lock this learner within the (non-assignable) policy, so that redemptions by different learners
+            # may proceed concurrently.  The policy-wide spend_limit is still enforced, via the spend reservation
+            # that policy.redeem() takes out for the duration of the transaction creation request.
+            # A learner's concurrent requests (e.g. double-clicks) wait their turn, rather than fail fast with a 429.
+            with policy.lock_for_redemption(lms_user_id, wait_seconds=settings.POLICY_LOCK_REDEEM_WAIT_SECONDS):
                 can_redeem, reason, existing_transactions = policy.can_redeem(lms_user_id, content_key)
                 if can_redeem:
                     redemption_result = policy.redeem(lms_user_id, content_key, existing_transactions, metadata)
@@ -752,7 +762,7 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
             )
             raise NotFound(detail='Could not determine a value for lms_user_id')
 
-        policies_for_customer = self.get_queryset()
+        policies_for_customer = get_redeemable_policies_for_customer(enterprise_customer_uuid)
         if not policies_for_customer:
             raise NotFound(detail='No active policies for this customer')
 
@@ -761,6 +771,29 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
             lms_user_id
         )
 
+        redemption_details_by_content_key = {}
+        for content_key in content_keys:
+            # Flattened because the response doesn't need to be bucketed by policy_uuid.
+            redemptions = redemptions_by_content_and_policy.redemptions_for_content(content_key)
+            # Determine if the learner has already redeemed the requested content_key.
+            successful_redemptions = redemptions_by_content_and_policy.successful_redemptions_for_content(content_key)
+            redemption_details_by_content_key[content_key] = (redemptions, successful_redemptions)
+
+        # Of all policies for this customer, determine which are redeemable and which are not.
+        # But, only do this for content keys with no existing successful redemptions,
+        # so we don't unnecessarily call `can_redeem()` on every policy.  Every upstream
+        # dependency of those evaluations is prefetched up front, once per distinct input.
+        evaluator = PolicyRedeemabilityEvaluator(
+            policies_for_customer,
+            lms_user_id,
+            # don't skip the customer user check if we're using an override lms_user_id
+            skip_customer_user_check=not bool(lms_user_id_override),
+        )
+        evaluator.prefetch([
+            content_key for content_key, (_, successful_redemptions) in redemption_details_by_content_key.items()
+            if not successful_redemptions
+        ])
+
         element_responses = []
         for content_key in content_keys:
             reasons = []
@@ -768,40 +801,14 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
             non_redeemable_policies = []
             resolved_policy = None
             list_price_dict = None
+            redemptions, successful_redemptions = redemption_details_by_content_key[content_key]
 
-            redemptions_by_policy = redemptions_by_content_and_policy[content_key]
-            policy_by_redemption_uuid = {
-                redemption['uuid']: policy
-                for policy, redemptions in redemptions_by_policy.items()
-                for redemption in redemptions
-            }
-            # Flatten dict of lists because the response doesn't need to be bucketed by policy_uuid.
-            redemptions = [
-                redemption
-                for redemptions in redemptions_by_policy.values()
-                for redemption in redemptions
-            ]
-
-            # Determine if the learner has already redeemed the requested content_key.  Just because a transaction has
-            # state='committed' doesn't mean it counts as a successful redemption; it must also NOT have a committed
-            # reversal.
-            successful_redemptions = [
-                redemption for redemption in redemptions
-                if redemption['state'] == TransactionStateChoices.COMMITTED and (
-                    not redemption['reversal'] or
-                    redemption['reversal'].get('state') != TransactionStateChoices.COMMITTED
-                )
-            ]
-
-            # Of all policies for this customer, determine which are redeemable and which are not.
-            # But, only do this if there are no existing successful redemptions,
-            # so we don't unnecessarily call `can_redeem()` on every policy.
             if not successful_redemptions:
                 redeemable_policies, non_redeemable_policies = self.evaluate_policies(
                     enterprise_customer_uuid,
-                    lms_user_id, content_key,
-                    # don't skip the customer user check if we're using an override lms_user_id
-                    skip_customer_user_check=not bool(lms_user_id_override),
+                    lms_user_id,
+                    content_key,
+                    evaluator=evaluator,
                 )
 
             if not successful_redemptions and not redeemable_policies:
@@ -811,7 +818,7 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
                 ))
 
             if redeemable_policies:
-                resolved_policy = SubsidyAccessPolicy.resolve_policy(redeemable_policies)
+                resolved_policy = evaluator.resolve_policy(redeemable_policies)
 
             try:
                 if resolved_policy:
@@ -820,7 +827,9 @@ class SubsidyAccessPolicyRedeemViewset(UserDetailsFromJwtMixin, PermissionRequir
                     # Get the policy used for redemption and use that to compute the price. If the redemption was the
                     # result of assignment, the historical assignment price might differ from the canonical price. We
                     # prefer to display the redeemed price to avoid confusion.
-                    successfully_redeemed_policy = policy_by_redemption_uuid[successful_redemptions[0]['uuid']]
+                    successfully_redeemed_policy = redemptions_by_content_and_policy.policy_for_redemption(
+                        successful_redemptions[0]['uuid']
+                    )
                     list_price_dict = successfully_redeemed_policy.get_list_price(lms_user_id, content_key)
                 else:
                     # In the case where the learner cannot redeem and has never redeemed this content, bypass the
@@ -944,6 +953,7 @@ class SubsidyAccessPolicyAllocateViewset(UserDetailsFromJwtMixin, PermissionRequ
         content_price_cents = serializer.data['content_price_cents']
 
         try:
+            # Lock the whole policy, which also excludes redemption of its assignments (see lock_for_redemption()).
             with policy.lock():
                 can_allocate, reason = policy.can_allocate(
                     len(learner_emails),
@@ -8,6 +8,7 @@ from django.conf import settings
 
 from enterprise_access.apps.api_client.base_oauth import BaseOAuthClient
 from enterprise_access.apps.api_client.base_user import BaseUserApiClient
+from enterprise_access.concurrency_utils import fetch_all_pages
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,20 @@ class LicenseManagerApiClient(BaseOAuthClient):
     customer_agreement_provisioning_endpoint = api_base_url + 'provisioning-admins/customer-agreement/'
     subscription_provisioning_endpoint = api_base_url + 'provisioning-admins/subscriptions/'
 
+    def _get_page(self, url):
+        """
+        Fetches a single page of a paginated list endpoint, for use with ``fetch_all_pages()``.
+        """
+        response = self.client.get(url, timeout=settings.LICENSE_MANAGER_CLIENT_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _new_client_get_page(self):
+        """
+        Returns ``_get_page()`` of a new client, with a session of its own, for fetching pages concurrently.
+        """
+        return type(self)()._get_page
+
     def get_subscription_overview(self, subscription_uuid):
         """
         Call license-manager API for data about a SubscriptionPlan.
@@ -68,22 +83,17 @@ class LicenseManagerApiClient(BaseOAuthClient):
             'enterprise_customer_uuid': enterprise_customer_uuid,
             'user_email': user_email
         }
-        results = []
-        current_response = None
-        next_url = self.admin_license_view_endpoint
         try:
-            while next_url:
-                current_response = self.client.get(
-                    next_url,
-                    params=query_params,
-                    timeout=settings.LICENSE_MANAGER_CLIENT_TIMEOUT
-                )
-                current_response.raise_for_status()
-                data = current_response.json()
-                results.extend(data.get('results', []))
-
-                next_url = data.get('next') if traverse_pagination else None
-            return results
+            current_response = self.client.get(
+                self.admin_license_view_endpoint,
+                params=query_params,
+                timeout=settings.LICENSE_MANAGER_CLIENT_TIMEOUT
+            )
+            current_response.raise_for_status()
+            pages = [current_response.json()]
+            if traverse_pagination:
+                pages = fetch_all_pages(pages[0], self._get_page, new_get_page=self._new_client_get_page)
+            return [result for page in pages for result in page.get('results', [])]
         except requests.exceptions.HTTPError as exc:
             logger.exception(f"Failed to get learner subscription licenses for admin : {exc}")
             raise
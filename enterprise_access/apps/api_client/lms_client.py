@@ -14,6 +14,7 @@ from enterprise_access.apps.api_client.base_user import BaseUserApiClient
 from enterprise_access.apps.api_client.exceptions import FetchGroupMembersConflictingParamsException
 from enterprise_access.apps.enterprise_groups.constants import GROUP_MEMBERSHIP_EMAIL_ERROR_STATUS
 from enterprise_access.cache_utils import versioned_cache_key
+from enterprise_access.concurrency_utils import fetch_all_pages
 from enterprise_access.utils import localized_utcnow, should_send_email_to_pecu
 
 logger = logging.getLogger(__name__)
@@ -57,6 +58,20 @@ class LmsApiClient(BaseOAuthClient):
     enterprise_flex_membership_endpoint = enterprise_api_v1_base_url + 'enterprise-group-membership/'
     enterprise_course_enrollment_admin_endpoint = enterprise_api_v1_base_url + 'enterprise-course-enrollment-admin/'
 
+    def _get_page(self, url):
+        """
+        Fetches a single page of a paginated list endpoint, for use with ``fetch_all_pages()``.
+        """
+        response = self.client.get(url, timeout=settings.LMS_CLIENT_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _new_client_get_page(self):
+        """
+        Returns ``_get_page()`` of a new client, with a session of its own, for fetching pages concurrently.
+        """
+        return type(self)()._get_page
+
     def get_course_enrollments_for_learner_profile(self, enterprise_uuid, lms_user_id):
         """
         Retrieves all course enrollments for a learner to be viewed by admin.
@@ -104,26 +119,23 @@ class LmsApiClient(BaseOAuthClient):
             'lms_user_id': lms_user_id,
         }
 
-        results = []
         current_response = None
-        next_url = self.enterprise_flex_membership_endpoint
         try:
-            while next_url:
-                current_response = self.client.get(
-                    next_url,
-                    params=query_params,
-                    timeout=settings.LMS_CLIENT_TIMEOUT
-                )
-                current_response.raise_for_status()
-                data = current_response.json()
-                results.extend(data.get('results', []))
-
-                next_url = data.get('next') if traverse_pagination else None
-            return results
+            current_response = self.client.get(
+                self.enterprise_flex_membership_endpoint,
+                params=query_params,
+                timeout=settings.LMS_CLIENT_TIMEOUT
+            )
+            current_response.raise_for_status()
+            pages = [current_response.json()]
+            if traverse_pagination:
+                pages = fetch_all_pages(pages[0], self._get_page, new_get_page=self._new_client_get_page)
+            return [result for page in pages for result in page.get('results', [])]
         except requests.exceptions.HTTPError as exc:
+            failed_response = exc.response if exc.response is not None else current_response
             logger.exception(
                 f"Failed to fetch enterprise flex group memberships for learner {lms_user_id}: {exc} "
-                f"Response content: {current_response.content if current_response else None}"
+                f"Response content: {failed_response.content if failed_response else None}"
             )
             raise
 
@@ -248,15 +260,13 @@ class LmsApiClient(BaseOAuthClient):
         query_params = f'?enterprise_customer_uuid={str(enterprise_customer_uuid)}&role=enterprise_admin'
 
         try:
-            url = self.enterprise_learner_endpoint + query_params
+            pages = fetch_all_pages(
+                self._get_page(self.enterprise_learner_endpoint + query_params),
+                self._get_page,
+                new_get_page=self._new_client_get_page,
+            )
             results = []
-
-            while url:
-                response = self.client.get(url, timeout=settings.LMS_CLIENT_TIMEOUT)
-                response.raise_for_status()
-                resp_json = response.json()
-                url = resp_json['next']
-
+            for resp_json in pages:
                 for result in resp_json['results']:
                     user_data = result['user']
                     user_data.update(ecu_id=result['id'], created=result['created'])
@@ -266,7 +276,7 @@ class LmsApiClient(BaseOAuthClient):
             logger.error(
                 'Failed to fetch enterprise admin users for %r because %r',
                 enterprise_customer_uuid,
-                response.text,
+                exc.response.text,
             )
             raise exc
 
@@ -491,13 +501,9 @@ class LmsApiClient(BaseOAuthClient):
         response_json = response.json()
         results = response_json.get('results', [])
         if traverse_pagination:
-            next_page = response.json().get("next")
-            while next_page:
-                response = self.client.get(next_page)
-                response.raise_for_status()
-                response_json = response.json()
-                next_page = response_json.get('next')
-                results.extend(response_json.get('results', []))
+            pages = fetch_all_pages(response_json, self._get_page, new_get_page=self._new_client_get_page)
+            response_json = pages[-1]
+            results.extend(result for page in pages[1:] for result in page.get('results', []))
 
             response_json['results'] = results
             response_json['next'] = None
@@ -615,11 +621,8 @@ class LmsApiClient(BaseOAuthClient):
                 f'{enterprise_group_uuid}/learners/?pending_users_only=true')
             results = []
 
-            while url:
-                response = self.client.get(url, timeout=settings.LMS_CLIENT_TIMEOUT)
-                response.raise_for_status()
-                resp_json = response.json()
-                url = resp_json.get('next')
+            pages = fetch_all_pages(self._get_page(url), self._get_page, new_get_page=self._new_client_get_page)
+            for resp_json in pages:
                 for result in resp_json['results']:
                     pending_learner_id = result['pending_enterprise_customer_user_id']
                     recent_action = result['recent_action']
@@ -733,6 +736,20 @@ class LmsUserApiClient(BaseUserApiClient):
         f'{enterprise_learner_portal_api_base_url}enterprise_course_enrollments/'
     )
 
+    def _get_page(self, url):
+        """
+        Fetches a single page of a paginated list endpoint, for use with ``fetch_all_pages()``.
+        """
+        response = self.get(url, timeout=settings.LMS_CLIENT_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _new_client_get_page(self):
+        """
+        Returns ``_get_page()`` of a new client, with a session of its own, for fetching pages concurrently.
+        """
+        return type(self)(self.original_request)._get_page
+
     def get_enterprise_customers_for_user(self, username, traverse_pagination=False):
         """
         Fetches enterprise learner data for a given username.
@@ -746,29 +763,22 @@ class LmsUserApiClient(BaseUserApiClient):
         query_params = {
             'username': username,
         }
-        results = []
-        initial_response_data = None
         current_response = None
-        next_url = self.enterprise_learner_endpoint
         try:
-            while next_url:
-                current_response = self.get(
-                    next_url,
-                    params=query_params,
-                    timeout=settings.LMS_CLIENT_TIMEOUT
-                )
-                current_response.raise_for_status()
-                data = current_response.json()
-
-                if not initial_response_data:
-                    # Store the initial response data (first page) for later use
-                    initial_response_data = data
-
-                # Collect results from the current page
-                results.extend(data.get('results', []))
+            current_response = self.get(
+                self.enterprise_learner_endpoint,
+                params=query_params,
+                timeout=settings.LMS_CLIENT_TIMEOUT
+            )
+            current_response.raise_for_status()
+            # Store the initial response data (first page) for later use
+            initial_response_data = current_response.json()
 
-                # If pagination is enabled, continue with the next page; otherwise, break
-                next_url = data.get('next') if traverse_pagination else None
+            # If pagination is enabled, collect results from every page; otherwise, just the first
+            pages = [initial_response_data]
+            if traverse_pagination:
+                pages = fetch_all_pages(initial_response_data, self._get_page, new_get_page=self._new_client_get_page)
+            results = [result for page in pages for result in page.get('results', [])]
 
             consolidated_response = {
                 **initial_response_data,
@@ -780,9 +790,10 @@ class LmsUserApiClient(BaseUserApiClient):
             }
             return consolidated_response
         except requests.exceptions.HTTPError as exc:
+            failed_response = exc.response if exc.response is not None else current_response
             logger.exception(
                 f"Failed to fetch enterprise learner for learner {username}: {exc} "
-                f"Response content: {current_response.content if current_response else None}"
+                f"Response content: {failed_response.content if failed_response else None}"
             )
             raise
 
@@ -9,7 +9,13 @@ from edx_django_utils.cache import TieredCache
 from enterprise_access.apps.api_client import EnterpriseCatalogUserV1ApiClient
 from enterprise_access.apps.api_client.license_manager_client import LicenseManagerUserApiClient
 from enterprise_access.apps.api_client.lms_client import LmsApiClient, LmsUserApiClient
-from enterprise_access.cache_utils import request_cache, versioned_cache_key
+from enterprise_access.cache_utils import (
+    LocalTieredCache,
+    refresh_with_single_flight,
+    request_cache,
+    request_cache_key,
+    versioned_cache_key
+)
 from enterprise_access.utils import determine_timeout_offset
 
 logger = logging.getLogger(__name__)
@@ -18,9 +24,11 @@ REQUEST_CACHE_NAMESPACE = 'subsidy_access_policy'
 
 CACHE_MISS = object()
 
+ENTERPRISE_CUSTOMER_LOCAL_CACHE_NAMESPACE = 'enterprise_customer'
+
 
 def enterprise_customer_users_cache_key(username):
-    return versioned_cache_key('get_subsidy_learners_aggregate_data', username)
+    return request_cache_key('get_enterprise_customer_users', username)
 
 
 def enterprise_customer_cache_key(enterprise_customer_slug, enterprise_customer_uuid):
@@ -86,7 +94,7 @@ def get_and_cache_enterprise_customer(
         enterprise_customer_uuid=enterprise_customer_uuid,
     )
 
-    cached_response = TieredCache.get_cached_response(cache_key)
+    cached_response = LocalTieredCache.get_cached_response(cache_key, ENTERPRISE_CUSTOMER_LOCAL_CACHE_NAMESPACE)
     if cached_response.is_found:
         logger.info(
             f'enterprise_customer cache hit for enterprise_customer_slug {enterprise_customer_slug} '
@@ -94,12 +102,15 @@ def get_and_cache_enterprise_customer(
         )
         return cached_response.value
 
-    response_payload = LmsApiClient().get_enterprise_customer_data(
-        enterprise_customer_uuid=enterprise_customer_uuid,
-        enterprise_customer_slug=enterprise_customer_slug,
-    )
-    TieredCache.set_all_tiers(cache_key, response_payload, timeout)
-    return response_payload
+    def fetch_and_cache():
+        response_payload = LmsApiClient().get_enterprise_customer_data(
+            enterprise_customer_uuid=enterprise_customer_uuid,
+            enterprise_customer_slug=enterprise_customer_slug,
+        )
+        LocalTieredCache.set_all_tiers(cache_key, response_payload, timeout, ENTERPRISE_CUSTOMER_LOCAL_CACHE_NAMESPACE)
+        return response_payload
+
+    return refresh_with_single_flight(cache_key, fetch_and_cache)
 
 
 def get_and_cache_secured_algolia_search_keys(
@@ -127,18 +138,22 @@ def get_and_cache_secured_algolia_search_keys(
         )
         return cached_response.value
 
-    client = EnterpriseCatalogUserV1ApiClient(request)
-    response_payload = client.get_secured_algolia_api_key(
-        enterprise_customer_uuid=enterprise_customer_uuid,
-    )
+    def fetch_and_cache():
+        client = EnterpriseCatalogUserV1ApiClient(request)
+        response_payload = client.get_secured_algolia_api_key(
+            enterprise_customer_uuid=enterprise_customer_uuid,
+        )
 
-    # Cache timeout based on calculated API response field 'valid_until' - epsilon_seconds
-    algolia_response = response_payload.get('algolia', {})
-    if valid_until_date := algolia_response.get('valid_until'):
-        timeout = determine_timeout_offset(valid_until_date)
+        # Cache timeout based on calculated API response field 'valid_until' - epsilon_seconds
+        cache_timeout = timeout
+        algolia_response = response_payload.get('algolia', {})
+        if valid_until_date := algolia_response.get('valid_until'):
+            cache_timeout = determine_timeout_offset(valid_until_date)
 
-    TieredCache.set_all_tiers(cache_key, response_payload, timeout)
-    return response_payload
+        TieredCache.set_all_tiers(cache_key, response_payload, cache_timeout)
+        return response_payload
+
+    return refresh_with_single_flight(cache_key, fetch_and_cache)
 
 
 def get_and_cache_subscription_licenses_for_learner(
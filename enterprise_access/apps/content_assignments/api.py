@@ -5,12 +5,17 @@ records and business logic.
 from __future__ import annotations  # needed for using QuerySet in type hinting.
 
 import logging
+import time
+from collections import defaultdict, namedtuple
 from typing import Iterable
 from uuid import uuid4
 
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Q, Sum
 from django.db.models.functions import Lower
+from edx_django_utils.monitoring import set_custom_attribute
+from requests.exceptions import RequestException
 
 from enterprise_access.apps.content_assignments.content_metadata_api import (
     get_content_metadata_for_assignments,
@@ -21,8 +26,13 @@ from enterprise_access.apps.content_assignments.tasks import (
     send_exec_ed_enrollment_warmer,
     send_reminder_email_for_pending_assignment
 )
+from enterprise_access.apps.content_metadata.api import (
+    fetch_and_cache_catalog_content_metadata,
+    get_uncached_catalog_content_keys
+)
 from enterprise_access.apps.core.models import User
 from enterprise_access.apps.subsidy_access_policy.content_metadata_api import get_and_cache_content_metadata
+from enterprise_access.cache_utils import request_cache, request_cache_key
 from enterprise_access.utils import (
     chunks,
     get_automatic_expiration_date_and_reason,
@@ -30,7 +40,11 @@ from enterprise_access.utils import (
     localized_utcnow
 )
 
-from .constants import AssignmentAutomaticExpiredReason, LearnerContentAssignmentStateChoices
+from .constants import (
+    ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE,
+    AssignmentAutomaticExpiredReason,
+    LearnerContentAssignmentStateChoices
+)
 from .models import AssignmentConfiguration, LearnerContentAssignment
 from .tasks import (
     create_pending_enterprise_learner_for_assignment_task,
@@ -120,6 +134,21 @@ def get_assignments_for_configuration(
     return queryset
 
 
+def get_unacknowledged_assignments_for_learner(assignment_configuration_uuids, lms_user_id):
+    """
+    Returns a queryset of every ``LearnerContentAssignment`` of the given learner, across all of the
+    given assignment configurations, that the learner has not acknowledged.  Acknowledgement
+    is computed in SQL, see ``LearnerContentAssignment.annotate_learner_acknowledged_onto_queryset()``.
+    """
+    queryset = LearnerContentAssignment.annotate_learner_acknowledged_onto_queryset(
+        LearnerContentAssignment.objects.filter(
+            assignment_configuration__in=assignment_configuration_uuids,
+            lms_user_id=lms_user_id,
+        )
+    )
+    return queryset.filter(Q(is_learner_acknowledged__isnull=True) | Q(is_learner_acknowledged=False))
+
+
 def get_assignments_for_admin(
     assignment_configuration,
     learner_emails,
@@ -246,23 +275,134 @@ def get_assignment_for_learner(
         return None
 
 
+def allocated_quantity_cache_key(assignment_configuration_uuid):
+    return request_cache_key('allocated_quantity_for_configuration', assignment_configuration_uuid)
+
+
 def get_allocated_quantity_for_configuration(assignment_configuration):
     """
     Returns a float representing the total quantity, in USD cents, currently allocated
     via Assignments for the given configuration.
     """
-    assignments_queryset = get_assignments_for_configuration(
-        assignment_configuration,
-        state=LearnerContentAssignmentStateChoices.ALLOCATED,
+    return get_allocated_quantities_for_configurations([assignment_configuration.uuid])[assignment_configuration.uuid]
+
+
+def get_allocated_quantities_for_configurations(assignment_configuration_uuids):
+    """
+    Returns a dict mapping each of the given assignment configuration uuids to the total quantity,
+    in USD cents, currently allocated via Assignments for that configuration.
+
+    Totals are memoized for the rest of the request (until assignments are written),
+    and those not yet known are computed in one grouped query.
+    """
+    _cache = request_cache(namespace=ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE)
+    results = {}
+    uuids_to_query = []
+    for assignment_configuration_uuid in dict.fromkeys(assignment_configuration_uuids):
+        cached_response = _cache.get_cached_response(allocated_quantity_cache_key(assignment_configuration_uuid))
+        if cached_response.is_found:
+            results[assignment_configuration_uuid] = cached_response.value
+        else:
+            uuids_to_query.append(assignment_configuration_uuid)
+
+    if uuids_to_query:
+        rows = LearnerContentAssignment.objects.filter(
+            assignment_configuration__in=uuids_to_query,
+            state=LearnerContentAssignmentStateChoices.ALLOCATED,
+        ).values(
+            'assignment_configuration',
+        ).annotate(
+            total_quantity=Sum('content_quantity'),
+        ).order_by()
+        queried_quantities = {row['assignment_configuration']: row['total_quantity'] for row in rows}
+        for assignment_configuration_uuid in uuids_to_query:
+            total_quantity = queried_quantities.get(assignment_configuration_uuid) or 0
+            _cache.set(allocated_quantity_cache_key(assignment_configuration_uuid), total_quantity)
+            results[assignment_configuration_uuid] = total_quantity
+
+    return results
+
+
+def _get_content_summary(assignment_configuration, content_key):
+    """
+    Helper to retrieve (from cache) the content metadata summary
+    """
+    content_metadata = get_and_cache_content_metadata(
+        assignment_configuration.enterprise_customer_uuid,
+        content_key,
     )
-    aggregate = assignments_queryset.aggregate(
-        total_quantity=Sum('content_quantity'),
+    return content_metadata
+
+
+class ResolvedAllocationContent(
+    namedtuple(
+        'ResolvedAllocationContent',
+        ['content_key', 'content_title', 'parent_content_key', 'preferred_course_run_key'],
     )
-    return aggregate['total_quantity'] or 0
+):
+    """
+    The content metadata that allocating some ``content_key`` depends on, resolved once per allocation
+    by ``resolve_allocation_content()``, then passed through to each step of the allocation that needs it.
+
+    content_title: The title of the content.
+    parent_content_key: The parent course key if ``content_key`` is a course run key, otherwise None.
+    preferred_course_run_key: The run that nudge emails should target the start date of.
+    """
+
+    @property
+    def is_assigned_course_run(self):
+        return bool(self.parent_content_key)
+
+
+def resolve_allocation_content(assignment_configuration, content_key):
+    """
+    Retrieves (from cache) the content metadata summary of ``content_key`` once, and resolves from it
+    everything that allocating the content depends on.
+
+    Returns: A ``ResolvedAllocationContent``.
+    """
+    content_metadata = _get_content_summary(assignment_configuration, content_key)
+    metadata_content_key = content_metadata.get('content_key')
+    return ResolvedAllocationContent(
+        content_key=content_key,
+        content_title=content_metadata.get('content_title'),
+        # content_key is either a course run key or a course key. If it matches the returned content_key,
+        # this is a course key which has no parent key; otherwise, it's a course run key, whose parent
+        # course key was returned.
+        parent_content_key=None if content_key == metadata_content_key else metadata_content_key,
+        # During assignment allocation, time has passed since the last time an assignment
+        # was allocated/re-allocated. Therefore, it's entirely possible a new course run has been published.
+        # We assume the intent of the admin re-allocating this content is that they want to assign the NEW run.
+        preferred_course_run_key=content_metadata.get('course_run_key'),
+    )
+
+
+class AllocationTimings:
+    """
+    Records how long each phase of an allocation took, in milliseconds. Call ``lap(phase)`` at the end
+    of each phase, then ``report()`` to emit the breakdown as ``allocation_<phase>_ms`` custom attributes
+    and log it.
+    """
+
+    def __init__(self):
+        self.started_at = self.lapped_at = time.monotonic()
+        self.durations_ms = {}
+
+    def lap(self, phase):
+        now = time.monotonic()
+        self.durations_ms[phase] = int((now - self.lapped_at) * 1000)
+        self.lapped_at = now
+
+    def report(self, allocation_batch_id):
+        self.durations_ms['total'] = int((time.monotonic() - self.started_at) * 1000)
+        for phase, duration_ms in self.durations_ms.items():
+            set_custom_attribute(f'allocation_{phase}_ms', duration_ms)
+        logger.info(f'[ALLOCATION TIMINGS] batch_id={allocation_batch_id}, durations_ms={self.durations_ms}')
 
 
 def allocate_assignments(
     assignment_configuration, learner_emails, content_key, content_price_cents, known_lms_user_ids=None,
+    resolved_content=None,
 ):
     """
     Creates or updates an allocated assignment record
@@ -283,6 +423,8 @@ def allocate_assignments(
       - ``known_lms_user_ids``: Optional list of known lms user ids corresponding to the provided emails.
         If present, it's assumed to be *all* lms user ids for the provided emails, and that no duplicate
         user emails are provided.
+      - ``resolved_content``: Optional ``ResolvedAllocationContent`` of the ``content_key``, if the caller
+        has already resolved it. Otherwise, it's resolved once here, and used by every step of the allocation.
 
     Returns: A dictionary of updated, created, and unchanged assignment records. e.g.
       ```
@@ -296,6 +438,8 @@ def allocate_assignments(
       ```
 
     """
+    timings = AllocationTimings()
+
     # Set a batch ID to track assignments updated and/or created together.
     allocation_batch_id = uuid4()
 
@@ -311,6 +455,12 @@ def allocate_assignments(
     if content_price_cents < 0:
         raise AllocationException('Allocation price must be >= 0')
 
+    # Resolve the content's title, parent content key and preferred course run key once,
+    # for both the existing assignments we update and the new ones we create.
+    if resolved_content is None:
+        resolved_content = resolve_allocation_content(assignment_configuration, content_key)
+    timings.lap('resolve_content')
+
     learner_emails_to_allocate = _deduplicate_learner_emails_to_allocate(learner_emails)
 
     # We store the allocated quantity as a (future) debit
@@ -328,12 +478,15 @@ def allocate_assignments(
         lms_user_ids_by_email, emails_by_lms_user_id = _map_allocation_emails_with_lms_user_ids(
             learner_emails_to_allocate,
         )
+    timings.lap('lookup_learners')
+
     existing_assignments = _get_existing_assignments_for_allocation(
         assignment_configuration,
         learner_emails_to_allocate,
         content_key,
         lms_user_ids_by_email,
     )
+    timings.lap('lookup_existing_assignments')
     # Maintain a set of emails with existing records - we know we don't have to create
     # new assignments for these.
     learner_emails_with_existing_assignments = set()
@@ -344,13 +497,13 @@ def allocate_assignments(
     # This step to find and update the preferred_course_run_key is required in order
     # for nudge emails to target the start date of the new run. For run-based assignments,
     # the preferred_course_run_key is the same as the assignment's content_key.
-    preferred_course_run_key = _get_preferred_course_run_key(assignment_configuration, content_key)
+    preferred_course_run_key = resolved_content.preferred_course_run_key
 
     # Determine if the assignment's content_key is a course run or a course key based
     # on an associated parent content key. If the parent content key is None, then the
     # assignment is for a course; otherwise, it's an assignment for a course run.
-    parent_content_key = _get_parent_content_key(assignment_configuration, content_key)
-    is_assigned_course_run = bool(parent_content_key)
+    parent_content_key = resolved_content.parent_content_key
+    is_assigned_course_run = resolved_content.is_assigned_course_run
 
     # Split up the existing assignment records by state
     for assignment in existing_assignments:
@@ -373,9 +526,7 @@ def allocate_assignments(
                 assignment,
                 content_quantity,
                 allocation_batch_id,
-                preferred_course_run_key,
-                parent_content_key,
-                is_assigned_course_run,
+                resolved_content,
             )
             existing_assignments_needs_update.add(assignment)
         elif assignment.state == LearnerContentAssignmentStateChoices.ALLOCATED:
@@ -411,11 +562,12 @@ def allocate_assignments(
         created_assignments = _create_new_assignments(
             assignment_configuration,
             learner_emails_for_assignment_creation,
-            content_key,
+            resolved_content,
             content_quantity,
             lms_user_ids_by_email,
             allocation_batch_id,
         )
+    timings.lap('write_assignments')
 
     # Enqueue an asynchronous task to link assigned learners to the customer
     # This has to happen outside of the atomic block to avoid a race condition
@@ -423,6 +575,8 @@ def allocate_assignments(
     for assignment in updated_assignments + created_assignments:
         create_pending_enterprise_learner_for_assignment_task.delay(assignment.uuid)
         send_email_for_new_assignment.delay(assignment.uuid)
+    timings.lap('enqueue_tasks')
+    timings.report(allocation_batch_id)
 
     # Make a list of all pre-existing assignments that were not updated.
     unchanged_assignments = list(set(existing_assignments) - set(updated_assignments))
@@ -539,13 +693,7 @@ def _get_existing_assignments_for_allocation(
     return existing_assignments
 
 
-def _reallocate_assignment(
-        assignment,
-        content_quantity,
-        allocation_batch_id,
-        preferred_course_run_key,
-        parent_content_key,
-        is_assigned_course_run):
+def _reallocate_assignment(assignment, content_quantity, allocation_batch_id, resolved_content):
     """
     Modifies a ``LearnerContentAssignment`` record during the allocation flow.  The record
     is **not** saved.
@@ -558,9 +706,9 @@ def _reallocate_assignment(
     assignment.cancelled_at = None
     assignment.expired_at = None
     assignment.errored_at = None
-    assignment.preferred_course_run_key = preferred_course_run_key
-    assignment.parent_content_key = parent_content_key
-    assignment.is_assigned_course_run = is_assigned_course_run
+    assignment.preferred_course_run_key = resolved_content.preferred_course_run_key
+    assignment.parent_content_key = resolved_content.parent_content_key
+    assignment.is_assigned_course_run = resolved_content.is_assigned_course_run
     # Prevent invalid data from entering the database by calling the low-level full_clean() function manually.
     assignment.full_clean()
     return assignment
@@ -582,63 +730,10 @@ def _update_and_refresh_assignments(assignment_records, fields_changed):
     )
 
 
-def _get_content_summary(assignment_configuration, content_key):
-    """
-    Helper to retrieve (from cache) the content metadata summary
-    """
-    content_metadata = get_and_cache_content_metadata(
-        assignment_configuration.enterprise_customer_uuid,
-        content_key,
-    )
-    return content_metadata
-
-
-def _get_content_title(assignment_configuration, content_key):
-    """
-    Helper to retrieve (from cache) the title of a content_key'ed content_metadata
-    """
-    course_content_metadata = _get_content_summary(assignment_configuration, content_key)
-    return course_content_metadata.get('content_title')
-
-
-def _get_parent_content_key(assignment_configuration, content_key):
-    """
-    Helper to retrieve (from cache) the parent content key of a content_key's content_metadata.
-    Note: content_key is either a course run key or a course key. Only course run keys have a
-    parent course key.
-
-    If content_key is for a course key, this will return the same key. Otherwise, the content_key
-    represents a course run, and this will return the run's parent course key.
-    """
-    course_content_metadata = _get_content_summary(assignment_configuration, content_key)
-    metadata_content_key = course_content_metadata.get('content_key')
-
-    # Check if the assignment's content_key matches the returned content_key. If so, this is a course key
-    # which has no parent key.
-    if content_key == metadata_content_key:
-        return None
-
-    # Otherwise, this is a course run key, so return the parent course key
-    return metadata_content_key
-
-
-def _get_preferred_course_run_key(assignment_configuration, content_key):
-    """
-    During assignment allocation, time has passed since the last time an assignment
-    was allocated/re-allocated. Therefore, it's entirely possible a new course run has been published.
-    We assume the intent of the admin re-allocating this content is that they want to assign the NEW run.
-
-    Returns:
-      The preferred course run key (from cache) of a content_key'ed content_metadata
-    """
-    course_content_metadata = _get_content_summary(assignment_configuration, content_key)
-    return course_content_metadata.get('course_run_key')
-
-
 def _create_new_assignments(
     assignment_configuration,
     learner_emails,
-    content_key,
+    resolved_content,
     content_quantity,
     lms_user_ids_by_email,
     allocation_batch_id
@@ -652,26 +747,21 @@ def _create_new_assignments(
     )
     logger.info(
         message, assignment_configuration.uuid, allocation_batch_id,
-        learner_emails, content_key,
+        learner_emails, resolved_content.content_key,
     )
 
     # First, prepare assignment objects using data available in-memory only.
-    content_title = _get_content_title(assignment_configuration, content_key)
-    parent_content_key = _get_parent_content_key(assignment_configuration, content_key)
-    preferred_course_run_key = _get_preferred_course_run_key(assignment_configuration, content_key)
-    is_assigned_course_run = bool(parent_content_key)
-
     assignments_to_create = []
     for learner_email in learner_emails:
         assignment = LearnerContentAssignment(
             assignment_configuration=assignment_configuration,
             learner_email=learner_email,
             lms_user_id=lms_user_ids_by_email.get(learner_email.lower()),
-            content_key=content_key,
-            parent_content_key=parent_content_key,
-            is_assigned_course_run=is_assigned_course_run,
-            preferred_course_run_key=preferred_course_run_key,
-            content_title=content_title,
+            content_key=resolved_content.content_key,
+            parent_content_key=resolved_content.parent_content_key,
+            is_assigned_course_run=resolved_content.is_assigned_course_run,
+            preferred_course_run_key=resolved_content.preferred_course_run_key,
+            content_title=resolved_content.content_title,
             content_quantity=content_quantity,
             state=LearnerContentAssignmentStateChoices.ALLOCATED,
             allocation_batch_id=allocation_batch_id,
@@ -944,3 +1034,78 @@ def expire_assignment(
         send_assignment_automatically_expired_email.delay(assignment.uuid)
 
     return automatic_expiration_reason
+
+
+def get_live_assignment_content_keys_by_catalog(enterprise_catalog_uuids=None):
+    """
+    Returns a dict mapping catalog uuid -> sorted list of the content keys of live assignments
+    (see ``LearnerContentAssignmentStateChoices.LIVE_STATES``) in active assignment configurations
+    whose policy uses that catalog, optionally only for the given catalogs.
+    """
+    assignments = LearnerContentAssignment.objects.filter(
+        assignment_configuration__active=True,
+        assignment_configuration__subsidy_access_policy__isnull=False,
+        state__in=LearnerContentAssignmentStateChoices.LIVE_STATES,
+    )
+    if enterprise_catalog_uuids is not None:
+        assignments = assignments.filter(
+            assignment_configuration__subsidy_access_policy__catalog_uuid__in=enterprise_catalog_uuids,
+        )
+    catalog_content_key_pairs = assignments.values_list(
+        'assignment_configuration__subsidy_access_policy__catalog_uuid',
+        'content_key',
+    ).distinct()
+
+    content_keys_by_catalog_uuid = defaultdict(set)
+    for catalog_uuid, content_key in catalog_content_key_pairs:
+        content_keys_by_catalog_uuid[catalog_uuid].add(content_key)
+    return {
+        catalog_uuid: sorted(content_keys)
+        for catalog_uuid, content_keys in content_keys_by_catalog_uuid.items()
+    }
+
+
+def warm_live_assignment_content_metadata(enterprise_catalog_uuids=None, batch_size=None, sleep_seconds=None):
+    """
+    Prefetches, into the cache read by ``get_content_metadata_for_assignments()``, the catalog content metadata
+    of every live assignment (see ``get_live_assignment_content_keys_by_catalog()``), so that expiration and
+    nudge sweeps, and reminder emails, don't each hit the enterprise-catalog service cold.
+
+    Keys already cached (or negatively cached), and not stale, are skipped.  The rest are fetched
+    ``batch_size`` keys at a time, sleeping ``sleep_seconds`` between fetches to rate limit
+    requests to the catalog service.  Keys that are still uncached after their fetch, e.g. because
+    it failed, count as failed.
+
+    Returns:
+        dict: The number of content keys which were warmed, skipped and failed.
+    """
+    batch_size = batch_size or settings.CONTENT_METADATA_WARMING_BATCH_SIZE
+    if sleep_seconds is None:
+        sleep_seconds = settings.CONTENT_METADATA_WARMING_SLEEP_SECONDS
+
+    results = {'warmed': 0, 'skipped': 0, 'failed': 0}
+    is_first_fetch = True
+    for catalog_uuid, content_keys in get_live_assignment_content_keys_by_catalog(enterprise_catalog_uuids).items():
+        uncached_content_keys = get_uncached_catalog_content_keys(catalog_uuid, content_keys)
+        results['skipped'] += len(content_keys) - len(uncached_content_keys)
+
+        for content_keys_batch in chunks(uncached_content_keys, batch_size):
+            if not is_first_fetch and sleep_seconds:
+                time.sleep(sleep_seconds)
+            is_first_fetch = False
+
+            try:
+                fetch_and_cache_catalog_content_metadata(catalog_uuid, content_keys_batch)
+            except RequestException as exc:
+                logger.exception(
+                    f'[WARM CONTENT METADATA] Failed to fetch {len(content_keys_batch)} content keys '
+                    f'in catalog {catalog_uuid}: {exc}'
+                )
+            failed_content_keys = get_uncached_catalog_content_keys(catalog_uuid, content_keys_batch)
+            results['failed'] += len(failed_content_keys)
+            results['warmed'] += len(content_keys_batch) - len(failed_content_keys)
+
+    for name, count in results.items():
+        set_custom_attribute(f'content_metadata_warming_{name}', count)
+    logger.info(f'[WARM CONTENT METADATA] Warming results: {results}')
+    return results
@@ -38,6 +38,9 @@ class LearnerContentAssignmentStateChoices:
     # States from which an assignment can be reversed
     REVERSIBLE_STATES = (ACCEPTED,)
 
+    # States of assignments that expiration and nudge sweeps, and reminder emails, read content metadata for.
+    LIVE_STATES = (ALLOCATED, ACCEPTED)
+
 
 class AssignmentActions:
     """
@@ -132,3 +135,7 @@ START_DATE_DEFAULT_TO_TODAY_THRESHOLD_DAYS = 14
 RETIRED_EMAIL_ADDRESS_FORMAT = 'retired_user{}@retired.invalid'
 
 BRAZE_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Request cache namespace of allocated quantities per assignment configuration,
+# cleared whenever assignments are written.
+ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE = 'allocated_quantity'
@@ -3,6 +3,7 @@ API file interacting with assignment metadata (created to avoid a circular
 import error)
 """
 import datetime
+import logging
 
 from django.utils import timezone
 
@@ -16,21 +17,124 @@ DATE_INPUT_PATTERNS = [
 ]
 DEFAULT_STRFTIME_PATTERN = '%b %d, %Y'
 
+logger = logging.getLogger(__name__)
 
-def _content_metadata_for_assignment(assignment, course_metadata_list):
+
+class ContentMetadataLookup:
+    """
+    Indexes a list of course-level content metadata records, e.g. as returned by
+    ``get_and_cache_catalog_content_metadata()``, by course key and by the key of each of their runs,
+    so that the metadata of many assignments is resolved with dictionary lookups rather than list scans.
+
+    Resolves, for a given assignment:
+
+    * ``course_metadata()``: the course-level record for the assignment's content.
+    * ``course_run_metadata()``: the assignment's preferred run within that record, else its advertised run.
+    * ``normalized_metadata()``: the normalized metadata of the assignment's preferred run, else of its advertised run.
+    """
+
+    def __init__(self, course_metadata_list):
+        self._course_metadata_by_key = {}
+        self._course_metadata_by_run_key = {}
+        self._course_run_metadata_by_key = {}
+        for course_metadata in course_metadata_list or []:
+            self._course_metadata_by_key.setdefault(course_metadata.get('key'), course_metadata)
+            for course_run in course_metadata.get('course_runs') or []:
+                self._course_metadata_by_run_key.setdefault(course_run.get('key'), course_metadata)
+                self._course_run_metadata_by_key.setdefault(course_run.get('key'), course_run)
+
+    def course_metadata(self, assignment):
+        """
+        Returns the course metadata dictionary whose key is the assignment's content_key (course run)
+        or parent_content_key (course), else the one with a run keyed by the content_key, or None.
+        """
+        for content_key in (assignment.content_key, assignment.parent_content_key):
+            if course_metadata := self._course_metadata_by_key.get(content_key):
+                return course_metadata
+        return self._course_metadata_by_run_key.get(assignment.content_key)
+
+    def course_run_metadata(self, assignment):
+        """
+        Returns the run metadata dictionary of the assignment's preferred course run, if any, falling back
+        to the advertised run of the assignment's course.  Returns None if the course can't be found.
+        """
+        course_metadata = self.course_metadata(assignment)
+        if not course_metadata:
+            return None
+        if preferred_course_run_key := assignment.preferred_course_run_key:
+            if self._course_metadata_by_run_key.get(preferred_course_run_key) is course_metadata:
+                return self._course_run_metadata_by_key[preferred_course_run_key]
+        return get_course_run_metadata_for_course(assignment, course_metadata)
+
+    def normalized_metadata(self, assignment):
+        """
+        Returns the normalized metadata of the assignment's course run, or an empty dict if the course can't be found.
+        """
+        course_metadata = self.course_metadata(assignment)
+        if not course_metadata:
+            return {}
+        return get_normalized_metadata_for_course(assignment, course_metadata)
+
+
+def get_normalized_metadata_for_course(assignment, course_metadata):
     """
-    Given a list of course metadata dictionaries and an assignment,
-    find the course metadata dictionary that corresponds to the
-    assignment's content_key (course run) or parent_content_key (course).
+    Returns the normalized metadata of the assignment's preferred course run from the given course
+    metadata dictionary, or that of the advertised course run if the assignment has no preferred run.
     """
-    return next(
-        (
-            course_metadata
-            for course_metadata in course_metadata_list
-            if course_metadata.get('key') in (assignment.content_key, assignment.parent_content_key)
-        ),
-        None
-    )
+    normalized_metadata_by_run = course_metadata.get('normalized_metadata_by_run', {})
+    # Return the content metadata for a specific course run based on the preferred_course_run_key
+    if preferred_course_run_key := assignment.preferred_course_run_key:
+        return normalized_metadata_by_run.get(preferred_course_run_key, {})
+    # Return current advertised course run metadata if preferred_course_run_key is NULL (i.e.,
+    # impacting legacy course-based assignments created pre-May 2024).
+    return course_metadata.get('normalized_metadata', {})
+
+
+def get_advertised_course_run_metadata(course_metadata):
+    course_runs = course_metadata.get('course_runs', [])
+    advertised_course_run_uuid = course_metadata.get('advertised_course_run_uuid')
+    return next((run for run in course_runs if run.get('uuid') == advertised_course_run_uuid), None)
+
+
+def get_course_run_metadata_for_course(assignment, course_metadata):
+    """
+    Returns the run metadata of the assignment's preferred course run from the given course metadata
+    dictionary.  If the assignment has no preferred run, or its metadata is not found, returns the
+    advertised course run.
+    """
+    course_runs = course_metadata.get('course_runs', [])
+
+    # For run-based assignments, return metadata for the preferred course run if
+    # available. If not, fallback to advertised run.
+    if preferred_course_run_key := assignment.preferred_course_run_key:
+        course_run = next((run for run in course_runs if run.get('key') == preferred_course_run_key), None)
+        if not course_run:
+            logger.warning(
+                'Metadata not found for preferred course run key %s in content metadata %s. Assignment UUID: %s',
+                preferred_course_run_key,
+                course_metadata.get('key'),
+                assignment.uuid
+            )
+            # Fallback to advertised course run if preferred course run metadata is missing
+            return get_advertised_course_run_metadata(course_metadata)
+        return course_run
+
+    # For course-based assignments, return metadata for the advertised course run
+    return get_advertised_course_run_metadata(course_metadata)
+
+
+def get_content_metadata_lookup(enterprise_catalog_uuid, assignments):
+    """
+    Fetches (from cache or enterprise-catalog API call) content metadata
+    in bulk for the `content_keys` of the given assignments, provided
+    such metadata is related to the given `enterprise_catalog_uuid`.
+
+    Returns:
+        A ``ContentMetadataLookup`` of the fetched content metadata.
+    """
+    content_keys = {assignment.content_key for assignment in assignments}
+    course_metadata_list = get_and_cache_catalog_content_metadata(enterprise_catalog_uuid, content_keys)
+    return ContentMetadataLookup(course_metadata_list)
 
 
 def get_content_metadata_for_assignments(enterprise_catalog_uuid, assignments):
@@ -48,10 +152,10 @@ def get_content_metadata_for_assignments(enterprise_catalog_uuid, assignments):
         to a content metadata dictionary, or null if no such dictionary
         could be found for a given key.
     """
-    content_keys = {assignment.content_key for assignment in assignments}
-    course_metadata_list = get_and_cache_catalog_content_metadata(enterprise_catalog_uuid, content_keys)
+    assignments = list(assignments)
+    lookup = get_content_metadata_lookup(enterprise_catalog_uuid, assignments)
     metadata_by_key = {
-        assignment.content_key: _content_metadata_for_assignment(assignment, course_metadata_list)
+        assignment.content_key: lookup.course_metadata(assignment)
         for assignment in assignments
     }
     return metadata_by_key
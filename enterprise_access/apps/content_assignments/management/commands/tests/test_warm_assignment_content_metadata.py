@@ -0,0 +1,53 @@
+"""
+Tests for `warm_assignment_content_metadata` management command.
+"""
+from io import StringIO
+from unittest import TestCase, mock
+from uuid import uuid4
+
+from django.core.management import call_command
+
+COMMAND_PATH = 'enterprise_access.apps.content_assignments.management.commands.warm_assignment_content_metadata'
+
+
+class TestWarmAssignmentContentMetadataCommand(TestCase):
+    """
+    Tests `warm_assignment_content_metadata` management command.
+    """
+
+    @mock.patch(f'{COMMAND_PATH}.warm_live_assignment_content_metadata')
+    def test_command(self, mock_warm):
+        mock_warm.return_value = {'warmed': 5, 'skipped': 2, 'failed': 1}
+        out = StringIO()
+
+        call_command('warm_assignment_content_metadata', stdout=out)
+
+        mock_warm.assert_called_once_with(None, None, None)
+        self.assertIn(
+            'Warmed 5 content keys of live assignments, skipped 2 already cached, 1 failed.',
+            out.getvalue(),
+        )
+
+    @mock.patch(f'{COMMAND_PATH}.warm_live_assignment_content_metadata')
+    def test_command_with_options(self, mock_warm):
+        mock_warm.return_value = {'warmed': 0, 'skipped': 0, 'failed': 0}
+        catalog_uuids = [str(uuid4()), str(uuid4())]
+
+        call_command(
+            'warm_assignment_content_metadata',
+            '--catalog-uuid', catalog_uuids[0],
+            '--catalog-uuid', catalog_uuids[1],
+            '--batch-size', '10',
+            '--sleep-seconds', '0.5',
+            stdout=StringIO(),
+        )
+
+        mock_warm.assert_called_once_with(catalog_uuids, 10, 0.5)
+
+    @mock.patch(f'{COMMAND_PATH}.warm_live_assignment_content_metadata')
+    @mock.patch(f'{COMMAND_PATH}.warm_live_assignment_content_metadata_task')
+    def test_command_async(self, mock_task, mock_warm):
+        call_command('warm_assignment_content_metadata', '--async', stdout=StringIO())
+
+        mock_task.delay.assert_called_once_with(None, None, None)
+        mock_warm.assert_not_called()
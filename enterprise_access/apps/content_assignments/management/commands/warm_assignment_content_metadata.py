@@ -0,0 +1,75 @@
+"""
+Management command to prefetch the content metadata of live assignments into the cache.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from enterprise_access.apps.content_assignments.api import warm_live_assignment_content_metadata
+from enterprise_access.apps.content_assignments.tasks import warm_live_assignment_content_metadata_task
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Prefetch, in bulk, the catalog content metadata of every allocated or accepted assignment
+    in an active assignment configuration, so that the expiration and nudge sweeps, and reminder emails,
+    find it cached rather than each hitting the enterprise-catalog service cold.
+
+    This command is intended to run from a crontab, shortly before the
+    ``automatically_expire_assignments`` and ``automatically_nudge_assignments`` commands.
+    """
+    help = (
+        'Prefetch the catalog content metadata of live assignments into the cache'
+    )
+
+    def add_arguments(self, parser):
+        """
+        Entry point to add arguments.
+        """
+        parser.add_argument(
+            '--catalog-uuid',
+            action='append',
+            dest='catalog_uuids',
+            default=None,
+            help='Only warm content metadata in this catalog. May be given multiple times.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=None,
+            help='How many content keys to fetch at a time. Defaults to settings.CONTENT_METADATA_WARMING_BATCH_SIZE.',
+        )
+        parser.add_argument(
+            '--sleep-seconds',
+            type=float,
+            dest='sleep_seconds',
+            default=None,
+            help='How long to sleep between fetches. Defaults to settings.CONTENT_METADATA_WARMING_SLEEP_SECONDS.',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            default=False,
+            help='Spin off a celery task to warm the cache, rather than warming it in this process.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Warms the content metadata of live assignments, and reports how many content keys were warmed,
+        skipped, or failed.
+        """
+        warming_args = (options['catalog_uuids'], options['batch_size'], options['sleep_seconds'])
+        if options['run_async']:
+            warm_live_assignment_content_metadata_task.delay(*warming_args)
+            self.stdout.write('Queued a task to warm the content metadata of live assignments.')
+            return
+
+        results = warm_live_assignment_content_metadata(*warming_args)
+        self.stdout.write(
+            f"Warmed {results['warmed']} content keys of live assignments, "
+            f"skipped {results['skipped']} already cached, {results['failed']} failed."
+        )
@@ -8,8 +8,8 @@ from uuid import UUID, uuid4
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import models
-from django.db.models import Case, Exists, F, Max, OuterRef, Q, Value, When
-from django.db.models.fields import CharField, DateTimeField, IntegerField
+from django.db.models import Case, Exists, F, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.fields import BooleanField, CharField, DateTimeField, IntegerField
 from django.db.models.functions import Cast, Coalesce
 from django.db.models.lookups import GreaterThan
 from django.utils import timezone
@@ -18,9 +18,11 @@ from pytz import UTC
 from simple_history.models import HistoricalRecords
 from simple_history.utils import bulk_create_with_history, bulk_update_with_history
 
+from enterprise_access.cache_utils import request_cache
 from enterprise_access.utils import format_traceback
 
 from .constants import (
+    ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE,
     NUM_DAYS_BEFORE_AUTO_EXPIRATION,
     RETIRED_EMAIL_ADDRESS_FORMAT,
     AssignmentActionErrors,
@@ -233,6 +235,16 @@ class AssignmentConfiguration(TimeStampedModel):
         return acknowledged_assignments, already_acknowledged_assignments, unacknowledged_assignments
 
 
+class LearnerContentAssignmentQuerySet(models.QuerySet):
+    """
+    QuerySet for ``LearnerContentAssignment``, whose bulk updates bypass ``save()``, so they clear memoized
+    allocated quantities themselves.  Deletes are handled by a ``post_delete`` receiver (see signals.py).
+    """
+    def update(self, **kwargs):
+        LearnerContentAssignment.clear_allocated_quantity_cache()
+        return super().update(**kwargs)
+
+
 class LearnerContentAssignment(TimeStampedModel):
     """
     Represent an assignment of a piece of content to a learner.
@@ -395,6 +407,8 @@ class LearnerContentAssignment(TimeStampedModel):
     )
     history = HistoricalRecords()
 
+    objects = LearnerContentAssignmentQuerySet.as_manager()
+
     def __str__(self):
         return (
             f'uuid={self.uuid}, state={self.state}, learner_email={self.learner_email}, content_key={self.content_key}'
@@ -407,6 +421,21 @@ class LearnerContentAssignment(TimeStampedModel):
         if self.content_quantity and self.content_quantity > 0:
             raise ValidationError(f'{self} cannot have a positive content quantity.')
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.clear_allocated_quantity_cache()
+
+    @staticmethod
+    def clear_allocated_quantity_cache():
+        """
+        Allocated quantities memoized earlier in this request may no longer hold once assignments are written.
+
+        Every write made through this model clears them: ``save()``, ``bulk_create()``, ``bulk_update()``,
+        ``QuerySet.update()`` and deletes.  Outside of requests, e.g. in Celery workers, the request cache is
+        never reset, so they're also cleared before each task runs (see signals.py).
+        """
+        request_cache(namespace=ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE).clear()
+
     @classmethod
     def bulk_create(cls, assignment_records):
         """
@@ -414,6 +443,7 @@ class LearnerContentAssignment(TimeStampedModel):
         while saving their history:
         https://django-simple-history.readthedocs.io/en/latest/common_issues.html#bulk-creating-a-model-with-history
         """
+        cls.clear_allocated_quantity_cache()
         return bulk_create_with_history(
             assignment_records,
             cls,
@@ -436,6 +466,7 @@ class LearnerContentAssignment(TimeStampedModel):
         for record in assignment_records:
             record.modified = timezone.now()
 
+        cls.clear_allocated_quantity_cache()
         return bulk_update_with_history(
             assignment_records,
             cls,
@@ -447,7 +478,13 @@ class LearnerContentAssignment(TimeStampedModel):
     def learner_acknowledged(self):
         """
         Returns whether or not the learner has acknowledged the assignment.
+
+        Reads the ``is_learner_acknowledged`` annotation instead, if this assignment
+        was loaded via ``annotate_learner_acknowledged_onto_queryset()``.
         """
+        if hasattr(self, 'is_learner_acknowledged'):
+            return self.is_learner_acknowledged
+
         if self.state == LearnerContentAssignmentStateChoices.EXPIRED:
             last_expired_action = self.get_last_successful_expiration_action()
             if not last_expired_action:
@@ -675,6 +712,17 @@ class LearnerContentAssignment(TimeStampedModel):
             error_reason=None,
         ).order_by('-completed_at').first()
 
+    def get_last_successful_acknowledged_cancelled_at(self):
+        """
+        Returns when the last successful "acknowledged" cancellation action for this assignment was completed,
+        or None if no such record exists.  Reads the ``last_cancelled_acknowledged_at`` annotation instead,
+        if this assignment was loaded via ``annotate_learner_acknowledged_onto_queryset()``.
+        """
+        if hasattr(self, 'last_cancelled_acknowledged_at'):
+            return self.last_cancelled_acknowledged_at
+        action = self.get_last_successful_acknowledged_cancelled_action()
+        return action.completed_at if action else None
+
     def add_successful_acknowledged_cancelled_action(self):
         """
         Adds a successful acknowledged LearnerContentAssignmentAction for this assignment record.
@@ -694,6 +742,17 @@ class LearnerContentAssignment(TimeStampedModel):
             error_reason=None,
         ).order_by('-completed_at').first()
 
+    def get_last_successful_acknowledged_expired_at(self):
+        """
+        Returns when the last successful "acknowledged" expiration action for this assignment was completed,
+        or None if no such record exists.  Reads the ``last_expired_acknowledged_at`` annotation instead,
+        if this assignment was loaded via ``annotate_learner_acknowledged_onto_queryset()``.
+        """
+        if hasattr(self, 'last_expired_acknowledged_at'):
+            return self.last_expired_acknowledged_at
+        action = self.get_last_successful_acknowledged_expired_action()
+        return action.completed_at if action else None
+
     def add_successful_acknowledged_expired_action(self):
         """
         Adds a successful acknowledged LearnerContentAssignmentAction for this assignment record.
@@ -859,6 +918,64 @@ class LearnerContentAssignment(TimeStampedModel):
 
         return new_queryset
 
+    @classmethod
+    def annotate_learner_acknowledged_onto_queryset(cls, queryset):
+        """
+        Annotate whether the learner has acknowledged each assignment, computed in SQL, so that
+        acknowledgement can be filtered on without loading every assignment's actions.
+
+        Fields added:
+        * last_expired_at (DateTimeField)
+        * last_expired_acknowledged_at (DateTimeField)
+        * last_cancelled_at (DateTimeField)
+        * last_cancelled_acknowledged_at (DateTimeField)
+        * is_learner_acknowledged (BooleanField): Same as the ``learner_acknowledged`` property.
+
+        Args:
+            queryset (QuerySet): LearnerContentAssignment queryset, vanilla.
+
+        Returns:
+            QuerySet: LearnerContentAssignment queryset, same objects but with extra fields annotated.
+        """
+        def last_successful_action_completed_at(action_type):
+            return Subquery(
+                LearnerContentAssignmentAction.objects.filter(
+                    assignment=OuterRef('uuid'),
+                    action_type=action_type,
+                    error_reason=None,
+                ).order_by('-completed_at').values('completed_at')[:1]
+            )
+
+        new_queryset = queryset.annotate(
+            last_expired_at=last_successful_action_completed_at(AssignmentActions.EXPIRED),
+            last_expired_acknowledged_at=last_successful_action_completed_at(AssignmentActions.EXPIRED_ACKNOWLEDGED),
+            last_cancelled_at=last_successful_action_completed_at(AssignmentActions.CANCELLED),
+            last_cancelled_acknowledged_at=last_successful_action_completed_at(
+                AssignmentActions.CANCELLED_ACKNOWLEDGED,
+            ),
+        ).annotate(
+            # An expired or cancelled assignment is acknowledged if it was acknowledged after it was last
+            # expired or cancelled.  Comparisons against a missing action are never true.
+            is_learner_acknowledged=Case(
+                When(
+                    Q(state=LearnerContentAssignmentStateChoices.EXPIRED) &
+                    GreaterThan(F('last_expired_acknowledged_at'), F('last_expired_at')),
+                    then=Value(True),
+                ),
+                When(state=LearnerContentAssignmentStateChoices.EXPIRED, then=Value(False)),
+                When(
+                    Q(state=LearnerContentAssignmentStateChoices.CANCELLED) &
+                    GreaterThan(F('last_cancelled_acknowledged_at'), F('last_cancelled_at')),
+                    then=Value(True),
+                ),
+                When(state=LearnerContentAssignmentStateChoices.CANCELLED, then=Value(False)),
+                # Fallback to None, in case the assignment is in a state that may not be acknowledged.
+                default=Value(None),
+                output_field=BooleanField(null=True),
+            ),
+        )
+        return new_queryset
+
 
 class LearnerContentAssignmentAction(TimeStampedModel):
     """
@@ -925,16 +1042,16 @@ class LearnerContentAssignmentAction(TimeStampedModel):
         """
         # Check whether user has acknowledged the expiration.
         if self.action_type == AssignmentActions.EXPIRED:
-            last_acknowledged_expiration = self.assignment.get_last_successful_acknowledged_expired_action()
-            if not last_acknowledged_expiration:
+            last_acknowledged_expiration_at = self.assignment.get_last_successful_acknowledged_expired_at()
+            if not last_acknowledged_expiration_at:
                 return False
-            return last_acknowledged_expiration.completed_at > self.completed_at
+            return last_acknowledged_expiration_at > self.completed_at
 
         # Check whether user has acknowledged the cancellation.
         if self.action_type == AssignmentActions.CANCELLED:
-            last_acknowledged_cancellation = self.assignment.get_last_successful_acknowledged_cancelled_action()
-            if not last_acknowledged_cancellation:
+            last_acknowledged_cancellation_at = self.assignment.get_last_successful_acknowledged_cancelled_at()
+            if not last_acknowledged_cancellation_at:
                 return False
-            return last_acknowledged_cancellation.completed_at > self.completed_at
+            return last_acknowledged_cancellation_at > self.completed_at
 
         return None
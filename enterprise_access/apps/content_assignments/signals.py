@@ -3,7 +3,8 @@ Signal handlers for content_assignments app.
 """
 import logging
 
-from django.db.models.signals import post_save
+from celery.signals import task_prerun
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from openedx_events.enterprise.signals import LEDGER_TRANSACTION_REVERSED
@@ -11,10 +12,30 @@ from openedx_events.enterprise.signals import LEDGER_TRANSACTION_REVERSED
 from enterprise_access.apps.content_assignments.constants import LearnerContentAssignmentStateChoices
 from enterprise_access.apps.content_assignments.models import LearnerContentAssignment
 from enterprise_access.apps.core.models import User
+from enterprise_access.apps.subsidy_access_policy.models import PolicySpendSnapshot, SubsidyAccessPolicy
+from enterprise_access.apps.subsidy_access_policy.subsidy_api import invalidate_transactions_for_learner
 
 logger = logging.getLogger(__name__)
 
 
+@receiver(post_delete, sender=LearnerContentAssignment)
+def clear_allocated_quantity_cache_for_deleted_assignment(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Post delete hook to clear allocated quantities memoized before an assignment was deleted,
+    however it was deleted (individually, in bulk, or along with its configuration).
+    """
+    LearnerContentAssignment.clear_allocated_quantity_cache()
+
+
+@task_prerun.connect
+def clear_allocated_quantity_cache_before_task(**kwargs):  # pylint: disable=unused-argument
+    """
+    Celery workers never reset the request cache between tasks, so clear allocated quantities
+    memoized by a previous task before each task runs.
+    """
+    LearnerContentAssignment.clear_allocated_quantity_cache()
+
+
 @receiver(post_save, sender=User)
 def update_assignment_lms_user_id_from_user_email(sender, **kwargs):  # pylint: disable=unused-argument
     """
@@ -66,3 +87,45 @@ def update_assignment_status_for_reversed_transaction(**kwargs):
             f'Cannot reverse LearnerContentAssignment {assignment_to_update.uuid} '
             f'because its state is {assignment_to_update.state}'
         )
+
+
+@receiver(LEDGER_TRANSACTION_REVERSED)
+def invalidate_cached_transactions_for_reversed_transaction(**kwargs):
+    """
+    OEP-49 event handler to invalidate the reversed transaction's learner's cached transactions.
+    """
+    ledger_transaction = kwargs.get('ledger_transaction')
+    policy_uuid = ledger_transaction.subsidy_access_policy_uuid
+    lms_user_id = ledger_transaction.lms_user_id
+
+    subsidy_uuid = None
+    if policy_uuid:
+        subsidy_uuid = SubsidyAccessPolicy.objects.filter(
+            uuid=policy_uuid,
+        ).values_list('subsidy_uuid', flat=True).first()
+    if not subsidy_uuid or not lms_user_id:
+        logger.info(
+            f'Not invalidating cached transactions for reversed transaction {ledger_transaction.uuid}, '
+            f'no learner or policy found with lms_user_id={lms_user_id} and policy_uuid={policy_uuid}'
+        )
+        return
+
+    invalidate_transactions_for_learner(subsidy_uuid, lms_user_id)
+
+
+@receiver(LEDGER_TRANSACTION_REVERSED)
+def update_policy_spend_snapshot_for_reversed_transaction(**kwargs):
+    """
+    OEP-49 event handler to give the reversed transaction's quantity back to its policy's spend snapshot.
+    """
+    ledger_transaction = kwargs.get('ledger_transaction')
+    policy_uuid = ledger_transaction.subsidy_access_policy_uuid
+    if not policy_uuid or not ledger_transaction.quantity:
+        return
+
+    # Transaction quantities are negative, so this increases the (negative) redeemed total.
+    if not PolicySpendSnapshot.record_reversal(policy_uuid, ledger_transaction.uuid, ledger_transaction.quantity):
+        logger.info(
+            f'Not updating spend snapshot of policy {policy_uuid} for transaction {ledger_transaction.uuid}, '
+            'whose reversal was already recorded'
+        )
@@ -13,14 +13,13 @@ from enterprise_access.apps.api_client.lms_client import LmsApiClient
 from enterprise_access.apps.content_assignments.content_metadata_api import (
     format_datetime_obj,
     get_card_image_url,
-    get_content_metadata_for_assignments,
+    get_content_metadata_lookup,
     get_course_partners,
     get_human_readable_date
 )
 from enterprise_access.tasks import LoggedTaskWithRetry
 from enterprise_access.utils import (
     get_automatic_expiration_date_and_reason,
-    get_course_run_metadata_for_assignment,
     get_normalized_metadata_for_assignment,
     localized_utcnow
 )
@@ -82,7 +81,7 @@ class BrazeCampaignSender:
         self.braze_client = BrazeApiClient()
         self.lms_client = LmsApiClient()
         self._customer_data = None
-        self._course_metadata = None
+        self._content_metadata_lookup = None
 
     def send_campaign_message(self, braze_trigger_properties, campaign_identifier):
         """
@@ -144,24 +143,31 @@ class BrazeCampaignSender:
             self._customer_data = self.lms_client.get_enterprise_customer_data(self.enterprise_customer_uuid)
         return self._customer_data
 
+    @property
+    def content_metadata_lookup(self):
+        """
+        Returns a memoized ``ContentMetadataLookup`` of the content metadata for the assignment.
+        """
+        if not self._content_metadata_lookup:
+            self._content_metadata_lookup = get_content_metadata_lookup(
+                self.policy.catalog_uuid, [self.assignment]
+            )
+        return self._content_metadata_lookup
+
     @property
     def course_metadata(self):
         """
         Returns memoized course metadata dictionary.
         """
-        if not self._course_metadata:
-            metadata_by_key = get_content_metadata_for_assignments(
-                self.policy.catalog_uuid, [self.assignment]
+        course_metadata = self.content_metadata_lookup.course_metadata(self.assignment)
+        if not course_metadata:
+            msg = (
+                f'Could not fetch metadata for assignment {self.assignment.uuid}, '
+                f'content_key {self.assignment.content_key}, '
+                f'parent_content_key {self.assignment.parent_content_key}'
             )
-            self._course_metadata = metadata_by_key.get(self.assignment.content_key)
-            if not self._course_metadata:
-                msg = (
-                    f'Could not fetch metadata for assignment {self.assignment.uuid}, '
-                    f'content_key {self.assignment.content_key}, '
-                    f'parent_content_key {self.assignment.parent_content_key}'
-                )
-                raise Exception(msg)
-        return self._course_metadata
+            raise Exception(msg)
+        return course_metadata
 
     @property
     def normalized_metadata(self):
@@ -218,7 +224,7 @@ class BrazeCampaignSender:
         """
         start_date = self.normalized_metadata.get('start_date')
         end_date = self.normalized_metadata.get('end_date')
-        course_run_metadata = get_course_run_metadata_for_assignment(self.assignment, self.course_metadata)
+        course_run_metadata = self.content_metadata_lookup.course_run_metadata(self.assignment)
         self_paced_normalized_start_date = get_self_paced_normalized_start_date(
             start_date,
             end_date,
@@ -558,3 +564,15 @@ def send_assignment_automatically_expired_email(expired_assignment_uuid):
     )
     assignment.add_successful_expiration_action()
     logger.info(f'Sent braze campaign expiration uuid={campaign_uuid} message for assignment {assignment}')
+
+
+@shared_task(base=LoggedTaskWithRetry)
+def warm_live_assignment_content_metadata_task(enterprise_catalog_uuids=None, batch_size=None, sleep_seconds=None):
+    """
+    Prefetches the content metadata of live assignments into the cache, ahead of the
+    expiration and nudge sweeps, see ``api.warm_live_assignment_content_metadata()``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from enterprise_access.apps.content_assignments.api import warm_live_assignment_content_metadata
+
+    return warm_live_assignment_content_metadata(enterprise_catalog_uuids, batch_size, sleep_seconds)
@@ -5,20 +5,27 @@ import re
 from unittest import mock
 
 import ddt
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
+from edx_django_utils.cache import RequestCache, TieredCache
+from requests.exceptions import HTTPError
 
 from enterprise_access.apps.core.tests.factories import UserFactory
 from enterprise_access.apps.subsidy_access_policy.tests.factories import AssignedLearnerCreditAccessPolicyFactory
 
 from ..api import (
     AllocationException,
+    ResolvedAllocationContent,
     allocate_assignments,
     cancel_assignments,
     expire_assignment,
+    get_allocated_quantities_for_configurations,
     get_allocated_quantity_for_configuration,
     get_assignment_for_learner,
-    get_assignments_for_configuration
+    get_assignments_for_configuration,
+    get_live_assignment_content_keys_by_catalog,
+    resolve_allocation_content,
+    warm_live_assignment_content_metadata
 )
 from ..constants import (
     NUM_DAYS_BEFORE_AUTO_EXPIRATION,
@@ -70,6 +77,10 @@ class TestContentAssignmentApi(TestCase):
         cls.assignment_configuration = AssignmentConfiguration.objects.create()
         cls.other_assignment_configuration = AssignmentConfiguration.objects.create()
 
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+
     def test_get_assignments_for_configuration(self):
         """
         Simple test to fetch assignment records related to a given configuration.
@@ -329,6 +340,43 @@ class TestContentAssignmentApi(TestCase):
             actual_amount = get_allocated_quantity_for_configuration(other_config)
             self.assertEqual(actual_amount, 0)
 
+    def test_get_allocated_quantities_for_configurations(self):
+        """
+        Tests that totals for many configurations are computed in one grouped query,
+        and then memoized until assignments are written.
+        """
+        empty_config = AssignmentConfiguration.objects.create()
+        for config, amount, state in (
+            (self.assignment_configuration, -1000, LearnerContentAssignmentStateChoices.ALLOCATED),
+            (self.assignment_configuration, -2000, LearnerContentAssignmentStateChoices.ALLOCATED),
+            (self.assignment_configuration, -4000, LearnerContentAssignmentStateChoices.CANCELLED),
+            (self.other_assignment_configuration, -500, LearnerContentAssignmentStateChoices.ALLOCATED),
+        ):
+            LearnerContentAssignmentFactory.create(
+                assignment_configuration=config,
+                content_quantity=amount,
+                state=state,
+            )
+        config_uuids = [self.assignment_configuration.uuid, self.other_assignment_configuration.uuid, empty_config.uuid]
+        expected_amounts = {
+            self.assignment_configuration.uuid: -3000,
+            self.other_assignment_configuration.uuid: -500,
+            empty_config.uuid: 0,
+        }
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_allocated_quantities_for_configurations(config_uuids), expected_amounts)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_allocated_quantities_for_configurations(config_uuids), expected_amounts)
+            self.assertEqual(get_allocated_quantity_for_configuration(empty_config), 0)
+
+        LearnerContentAssignmentFactory.create(
+            assignment_configuration=empty_config,
+            content_quantity=-100,
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(get_allocated_quantity_for_configuration(empty_config), -100)
+
     def test_allocate_assignments_negative_quantity(self):
         """
         Tests the allocation of new assignments for a price < 0
@@ -812,6 +860,90 @@ class TestContentAssignmentApi(TestCase):
         ):
             mock_pending_learner_task.delay.assert_called_once_with(assignment.uuid)
 
+    @mock.patch('enterprise_access.apps.content_assignments.api.get_and_cache_content_metadata')
+    @ddt.data(
+        {'content_key': 'edX+DemoX', 'expected_parent_content_key': None},
+        {'content_key': 'course-v1:edX+DemoX+2T2023', 'expected_parent_content_key': 'edX+DemoX'},
+    )
+    @ddt.unpack
+    def test_resolve_allocation_content(
+        self, mock_get_and_cache_content_metadata, content_key, expected_parent_content_key,
+    ):
+        mock_get_and_cache_content_metadata.return_value = {
+            'content_title': 'edx: Demo 101',
+            'content_key': 'edX+DemoX',
+            'course_run_key': 'course-v1:edX+DemoX+2T2023',
+        }
+
+        resolved_content = resolve_allocation_content(self.assignment_configuration, content_key)
+
+        self.assertEqual(resolved_content, ResolvedAllocationContent(
+            content_key=content_key,
+            content_title='edx: Demo 101',
+            parent_content_key=expected_parent_content_key,
+            preferred_course_run_key='course-v1:edX+DemoX+2T2023',
+        ))
+        self.assertEqual(resolved_content.is_assigned_course_run, bool(expected_parent_content_key))
+        mock_get_and_cache_content_metadata.assert_called_once_with(
+            self.assignment_configuration.enterprise_customer_uuid,
+            content_key,
+        )
+
+    @mock.patch('enterprise_access.apps.content_assignments.api.send_email_for_new_assignment')
+    @mock.patch('enterprise_access.apps.content_assignments.api.create_pending_enterprise_learner_for_assignment_task')
+    @mock.patch('enterprise_access.apps.content_assignments.api.set_custom_attribute')
+    @mock.patch('enterprise_access.apps.content_assignments.api.get_and_cache_content_metadata')
+    def test_allocate_assignments_resolves_content_once(
+        self, mock_get_and_cache_content_metadata, mock_set_custom_attribute, *args,
+    ):
+        mock_get_and_cache_content_metadata.return_value = {
+            'content_title': 'edx: Demo 101',
+            'content_key': 'edX+DemoX',
+            'course_run_key': 'course-v1:edX+DemoX+2T2023',
+        }
+        LearnerContentAssignmentFactory.create(
+            assignment_configuration=self.assignment_configuration,
+            learner_email='alice@foo.com',
+            content_key='edX+DemoX',
+            state=LearnerContentAssignmentStateChoices.CANCELLED,
+        )
+
+        allocation_results = allocate_assignments(
+            self.assignment_configuration, ['alice@foo.com', 'bob@foo.com'], 'edX+DemoX', 100,
+        )
+
+        # Content is resolved once, for both the re-allocated and the newly created assignment.
+        mock_get_and_cache_content_metadata.assert_called_once()
+        [updated_assignment] = allocation_results['updated']
+        [created_assignment] = allocation_results['created']
+        self.assertEqual(updated_assignment.preferred_course_run_key, 'course-v1:edX+DemoX+2T2023')
+        self.assertEqual(created_assignment.preferred_course_run_key, 'course-v1:edX+DemoX+2T2023')
+        self.assertEqual(created_assignment.content_title, 'edx: Demo 101')
+        # And the time spent on each phase of the allocation is reported.
+        reported_attributes = {call_args[0][0] for call_args in mock_set_custom_attribute.call_args_list}
+        self.assertTrue({'allocation_resolve_content_ms', 'allocation_total_ms'} <= reported_attributes)
+
+    @mock.patch('enterprise_access.apps.content_assignments.api.send_email_for_new_assignment')
+    @mock.patch('enterprise_access.apps.content_assignments.api.create_pending_enterprise_learner_for_assignment_task')
+    @mock.patch('enterprise_access.apps.content_assignments.api.get_and_cache_content_metadata')
+    def test_allocate_assignments_with_resolved_content(self, mock_get_and_cache_content_metadata, *args):
+        resolved_content = ResolvedAllocationContent(
+            content_key='course-v1:edX+DemoX+2T2023',
+            content_title='edx: Demo 101',
+            parent_content_key='edX+DemoX',
+            preferred_course_run_key='course-v1:edX+DemoX+2T2023',
+        )
+
+        allocation_results = allocate_assignments(
+            self.assignment_configuration, ['bob@foo.com'], resolved_content.content_key, 100,
+            resolved_content=resolved_content,
+        )
+
+        mock_get_and_cache_content_metadata.assert_not_called()
+        [assignment] = allocation_results['created']
+        self.assertEqual(assignment.parent_content_key, 'edX+DemoX')
+        self.assertTrue(assignment.is_assigned_course_run)
+
 
 @ddt.ddt
 class TestAssignmentExpiration(TestCase):
@@ -1062,3 +1194,76 @@ class TestAssignmentExpiration(TestCase):
         self.assertEqual(assignment.learner_email, 'larry@stooges.com')
         self.assertEqual(assignment.lms_user_id, 12345)
         mock_expired_email.delay.assert_called_once_with(assignment.uuid)
+
+
+@override_settings(CONTENT_METADATA_WARMING_SLEEP_SECONDS=0)
+class TestWarmLiveAssignmentContentMetadata(TestCase):
+    """
+    Tests for ``warm_live_assignment_content_metadata()``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.policy = AssignedLearnerCreditAccessPolicyFactory()
+        self.other_policy = AssignedLearnerCreditAccessPolicyFactory()
+        for policy, content_key, state in (
+            (self.policy, 'course+A', LearnerContentAssignmentStateChoices.ALLOCATED),
+            (self.policy, 'course+A', LearnerContentAssignmentStateChoices.ACCEPTED),
+            (self.policy, 'course+B', LearnerContentAssignmentStateChoices.ACCEPTED),
+            (self.policy, 'course+C', LearnerContentAssignmentStateChoices.CANCELLED),
+            (self.other_policy, 'course+A', LearnerContentAssignmentStateChoices.ALLOCATED),
+        ):
+            LearnerContentAssignmentFactory(
+                assignment_configuration=policy.assignment_configuration,
+                content_key=content_key,
+                state=state,
+            )
+        self.addCleanup(TieredCache.dangerous_clear_all_tiers)
+
+        client_patcher = mock.patch(
+            'enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiClient', autospec=True,
+        )
+        self.mock_client = client_patcher.start().return_value
+        self.addCleanup(client_patcher.stop)
+        self.mock_client.catalog_content_metadata.side_effect = lambda _, content_keys: {
+            'count': len(content_keys),
+            'results': [{'key': content_key} for content_key in content_keys],
+        }
+
+    def test_get_live_assignment_content_keys_by_catalog(self):
+        self.assertEqual(get_live_assignment_content_keys_by_catalog(), {
+            self.policy.catalog_uuid: ['course+A', 'course+B'],
+            self.other_policy.catalog_uuid: ['course+A'],
+        })
+        self.assertEqual(
+            get_live_assignment_content_keys_by_catalog([self.other_policy.catalog_uuid]),
+            {self.other_policy.catalog_uuid: ['course+A']},
+        )
+
+    def test_warm(self):
+        results = warm_live_assignment_content_metadata(batch_size=1)
+
+        self.assertEqual(results, {'warmed': 3, 'skipped': 0, 'failed': 0})
+        self.assertEqual(self.mock_client.catalog_content_metadata.call_count, 3)
+
+        # Everything is cached now, so is skipped.
+        self.assertEqual(warm_live_assignment_content_metadata(), {'warmed': 0, 'skipped': 3, 'failed': 0})
+        self.assertEqual(self.mock_client.catalog_content_metadata.call_count, 3)
+
+    def test_warm_failures(self):
+        def catalog_content_metadata(catalog_uuid, content_keys):
+            if catalog_uuid == self.other_policy.catalog_uuid:
+                raise HTTPError('oh barnacles')
+            return {'count': len(content_keys), 'results': [{'key': content_key} for content_key in content_keys]}
+
+        self.mock_client.catalog_content_metadata.side_effect = catalog_content_metadata
+
+        results = warm_live_assignment_content_metadata()
+
+        self.assertEqual(results, {'warmed': 2, 'skipped': 0, 'failed': 1})
+
+    @mock.patch('enterprise_access.apps.content_assignments.api.time.sleep')
+    def test_warm_rate_limited(self, mock_sleep):
+        warm_live_assignment_content_metadata(batch_size=1, sleep_seconds=2)
+
+        # Sleeps between fetches, but not before the first one.
+        self.assertEqual(mock_sleep.call_args_list, [mock.call(2), mock.call(2)])
@@ -1,10 +1,17 @@
 """
 Tests for the ``content_metadata_api.py`` module of the content_assignments app.
 """
+from types import SimpleNamespace
+
 import ddt
 from django.test import TestCase
 
-from ..content_metadata_api import get_card_image_url, get_course_partners, get_human_readable_date
+from ..content_metadata_api import (
+    ContentMetadataLookup,
+    get_card_image_url,
+    get_course_partners,
+    get_human_readable_date
+)
 
 
 @ddt.ddt
@@ -77,3 +84,71 @@ class TestContentMetadataApi(TestCase):
     def test_get_course_partners_exception(self):
         with self.assertRaisesRegex(Exception, 'must have a partner'):
             get_course_partners({'foo': 'bar'})
+
+
+class TestContentMetadataLookup(TestCase):
+    """
+    Tests for ``ContentMetadataLookup``.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.advertised_run = {'key': 'course-v1:edX+DemoX+1T2024', 'uuid': 'advertised'}
+        self.other_run = {'key': 'course-v1:edX+DemoX+2T2024', 'uuid': 'other'}
+        self.course_metadata = {
+            'key': 'edX+DemoX',
+            'course_runs': [self.advertised_run, self.other_run],
+            'advertised_course_run_uuid': 'advertised',
+            'normalized_metadata': {'start_date': 'advertised-start'},
+            'normalized_metadata_by_run': {self.other_run['key']: {'start_date': 'other-start'}},
+        }
+        self.other_course_metadata = {'key': 'edX+OtherX', 'course_runs': []}
+        self.lookup = ContentMetadataLookup([self.other_course_metadata, self.course_metadata])
+
+    def _assignment(self, content_key, parent_content_key=None, preferred_course_run_key=None):
+        return SimpleNamespace(
+            uuid='an-assignment',
+            content_key=content_key,
+            parent_content_key=parent_content_key,
+            preferred_course_run_key=preferred_course_run_key,
+        )
+
+    def test_course_metadata(self):
+        for assignment in (
+            self._assignment('edX+DemoX'),
+            self._assignment(self.other_run['key'], parent_content_key='edX+DemoX'),
+            # Run keys resolve to their course even without a parent_content_key.
+            self._assignment(self.other_run['key']),
+        ):
+            self.assertIs(self.lookup.course_metadata(assignment), self.course_metadata)
+        self.assertIsNone(self.lookup.course_metadata(self._assignment('edX+MissingX')))
+
+    def test_course_run_metadata(self):
+        self.assertEqual(
+            self.lookup.course_run_metadata(
+                self._assignment(self.other_run['key'], preferred_course_run_key=self.other_run['key']),
+            ),
+            self.other_run,
+        )
+        # Course-based assignments, and missing preferred runs, fall back to the advertised run.
+        self.assertEqual(self.lookup.course_run_metadata(self._assignment('edX+DemoX')), self.advertised_run)
+        self.assertEqual(
+            self.lookup.course_run_metadata(
+                self._assignment('edX+DemoX', preferred_course_run_key='course-v1:edX+DemoX+3T2024'),
+            ),
+            self.advertised_run,
+        )
+        self.assertIsNone(self.lookup.course_run_metadata(self._assignment('edX+MissingX')))
+
+    def test_normalized_metadata(self):
+        self.assertEqual(
+            self.lookup.normalized_metadata(
+                self._assignment(self.other_run['key'], preferred_course_run_key=self.other_run['key']),
+            ),
+            {'start_date': 'other-start'},
+        )
+        self.assertEqual(
+            self.lookup.normalized_metadata(self._assignment('edX+DemoX')),
+            {'start_date': 'advertised-start'},
+        )
+        self.assertEqual(self.lookup.normalized_metadata(self._assignment('edX+MissingX')), {})
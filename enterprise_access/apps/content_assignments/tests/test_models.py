@@ -8,8 +8,8 @@ from django.utils import timezone
 
 from enterprise_access.apps.subsidy_access_policy.tests.factories import AssignedLearnerCreditAccessPolicyFactory
 
-from ..constants import RETIRED_EMAIL_ADDRESS_FORMAT, AssignmentActions
-from ..models import AssignmentConfiguration
+from ..constants import RETIRED_EMAIL_ADDRESS_FORMAT, AssignmentActions, LearnerContentAssignmentStateChoices
+from ..models import AssignmentConfiguration, LearnerContentAssignment
 from .factories import LearnerContentAssignmentFactory
 
 
@@ -165,3 +165,58 @@ class TestAssignmentActions(TestCase):
 
         for historical_record in self.assignment.history.all():
             self.assertIsNotNone(re.match(pattern, historical_record.learner_email))
+
+
+class TestLearnerAcknowledgedAnnotation(TestCase):
+    """
+    Tests for ``LearnerContentAssignment.annotate_learner_acknowledged_onto_queryset()``.
+    """
+
+    def _assignment(self, state, *action_types):
+        """
+        Creates an assignment in the given state, with successful actions of the given types completed in order.
+        """
+        assignment = LearnerContentAssignmentFactory.create(state=state)
+        completed_at = timezone.now() - timezone.timedelta(days=1)
+        for action_type in action_types:
+            completed_at += timezone.timedelta(minutes=1)
+            assignment.actions.create(action_type=action_type, completed_at=completed_at)
+        return assignment
+
+    def test_annotation_matches_property(self):
+        expected_by_uuid = {}
+        for expected, state, action_types in (
+            (None, LearnerContentAssignmentStateChoices.ALLOCATED, []),
+            (False, LearnerContentAssignmentStateChoices.EXPIRED, []),
+            (False, LearnerContentAssignmentStateChoices.EXPIRED, [AssignmentActions.EXPIRED]),
+            (
+                True,
+                LearnerContentAssignmentStateChoices.EXPIRED,
+                [AssignmentActions.EXPIRED, AssignmentActions.EXPIRED_ACKNOWLEDGED],
+            ),
+            (
+                False,
+                LearnerContentAssignmentStateChoices.CANCELLED,
+                [
+                    AssignmentActions.CANCELLED,
+                    AssignmentActions.CANCELLED_ACKNOWLEDGED,
+                    AssignmentActions.CANCELLED,
+                ],
+            ),
+            (
+                True,
+                LearnerContentAssignmentStateChoices.CANCELLED,
+                [AssignmentActions.CANCELLED, AssignmentActions.CANCELLED_ACKNOWLEDGED],
+            ),
+        ):
+            assignment = self._assignment(state, *action_types)
+            self.assertEqual(assignment.learner_acknowledged, expected)
+            expected_by_uuid[assignment.uuid] = expected
+
+        queryset = LearnerContentAssignment.annotate_learner_acknowledged_onto_queryset(
+            LearnerContentAssignment.objects.filter(uuid__in=expected_by_uuid),
+        )
+        with self.assertNumQueries(1):
+            actual_by_uuid = {assignment.uuid: assignment.learner_acknowledged for assignment in queryset}
+
+        self.assertEqual(actual_by_uuid, expected_by_uuid)
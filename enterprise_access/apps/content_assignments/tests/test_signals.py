@@ -1,11 +1,33 @@
 """
 Signals and handlers tests.
 """
+from unittest import mock
+from uuid import uuid4
+
+from celery.signals import task_prerun
 from django.test import TestCase
 from django.utils import timezone
 
+from enterprise_access.apps.content_assignments.api import (
+    allocated_quantity_cache_key,
+    get_allocated_quantity_for_configuration
+)
+from enterprise_access.apps.content_assignments.constants import (
+    ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE,
+    LearnerContentAssignmentStateChoices
+)
+from enterprise_access.apps.content_assignments.models import LearnerContentAssignment
+from enterprise_access.apps.content_assignments.signals import (
+    invalidate_cached_transactions_for_reversed_transaction,
+    update_policy_spend_snapshot_for_reversed_transaction
+)
 from enterprise_access.apps.content_assignments.tests.factories import LearnerContentAssignmentFactory
 from enterprise_access.apps.core.tests.factories import UserFactory
+from enterprise_access.apps.subsidy_access_policy.models import PolicySpendSnapshot
+from enterprise_access.apps.subsidy_access_policy.tests.factories import (
+    PerLearnerSpendCapLearnerCreditAccessPolicyFactory
+)
+from enterprise_access.cache_utils import request_cache
 
 TEST_EMAIL = 'test@example.com'
 
@@ -71,3 +93,82 @@ class SignalsTests(TestCase):
         for assignment in assignments_other_learner:
             assignment.refresh_from_db()
             assert assignment.lms_user_id is None
+
+    @mock.patch('enterprise_access.apps.content_assignments.signals.invalidate_transactions_for_learner')
+    def test_invalidate_cached_transactions_for_reversed_transaction(self, mock_invalidate):
+        """
+        Test that reversing a transaction invalidates its learner's cached transactions in the policy's subsidy.
+        """
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+        ledger_transaction = mock.Mock(uuid=uuid4(), subsidy_access_policy_uuid=policy.uuid, lms_user_id=42)
+
+        invalidate_cached_transactions_for_reversed_transaction(ledger_transaction=ledger_transaction)
+
+        mock_invalidate.assert_called_once_with(policy.subsidy_uuid, 42)
+
+    @mock.patch('enterprise_access.apps.content_assignments.signals.invalidate_transactions_for_learner')
+    def test_invalidate_cached_transactions_for_reversed_transaction_unknown_policy(self, mock_invalidate):
+        """
+        Test that reversed transactions of policies we don't know about are ignored.
+        """
+        ledger_transaction = mock.Mock(uuid=uuid4(), subsidy_access_policy_uuid=uuid4(), lms_user_id=42)
+
+        invalidate_cached_transactions_for_reversed_transaction(ledger_transaction=ledger_transaction)
+
+        self.assertFalse(mock_invalidate.called)
+
+    def test_update_policy_spend_snapshot_for_reversed_transaction_is_idempotent(self):
+        """
+        Test that a reversal delivered more than once only gives its quantity back to the policy's snapshot once.
+        """
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+        PolicySpendSnapshot.objects.create(subsidy_access_policy=policy, total_redeemed=-1000)
+        ledger_transaction = mock.Mock(uuid=uuid4(), subsidy_access_policy_uuid=policy.uuid, quantity=-300)
+
+        update_policy_spend_snapshot_for_reversed_transaction(ledger_transaction=ledger_transaction)
+        update_policy_spend_snapshot_for_reversed_transaction(ledger_transaction=ledger_transaction)
+
+        self.assertEqual(PolicySpendSnapshot.objects.get(subsidy_access_policy=policy).total_redeemed, -700)
+
+
+class AllocatedQuantityCacheTests(TestCase):
+    """
+    Tests that writes which bypass ``LearnerContentAssignment.save()``, and Celery tasks,
+    don't see allocated quantities memoized before them.
+    """
+    def setUp(self):
+        super().setUp()
+        self.assignment = LearnerContentAssignmentFactory(
+            content_quantity=-100,
+            state=LearnerContentAssignmentStateChoices.ALLOCATED,
+        )
+        self.assignment_configuration = self.assignment.assignment_configuration
+        self.addCleanup(LearnerContentAssignment.clear_allocated_quantity_cache)
+
+    def _allocated_quantity(self):
+        return get_allocated_quantity_for_configuration(self.assignment_configuration)
+
+    def test_queryset_update_clears_cache(self):
+        self.assertEqual(self._allocated_quantity(), -100)
+
+        LearnerContentAssignment.objects.filter(uuid=self.assignment.uuid).update(content_quantity=-300)
+
+        self.assertEqual(self._allocated_quantity(), -300)
+
+    def test_delete_clears_cache(self):
+        self.assertEqual(self._allocated_quantity(), -100)
+
+        LearnerContentAssignment.objects.filter(uuid=self.assignment.uuid).delete()
+
+        self.assertEqual(self._allocated_quantity(), 0)
+
+    def test_task_prerun_clears_cache(self):
+        # Simulate a value memoized by a previous task, before some write it doesn't know about.
+        request_cache(namespace=ALLOCATED_QUANTITY_REQUEST_CACHE_NAMESPACE).set(
+            allocated_quantity_cache_key(self.assignment_configuration.uuid), -999,
+        )
+        self.assertEqual(self._allocated_quantity(), -999)
+
+        task_prerun.send(sender=None, task_id=str(uuid4()), task=None)
+
+        self.assertEqual(self._allocated_quantity(), -100)
@@ -4,17 +4,97 @@ TODO: refactor subsidy_access_policy/content_metadata_api.py
 into this module.
 """
 import logging
+from collections import namedtuple
+from functools import partial
+from urllib.parse import urlencode
 
 from django.conf import settings
 from django.core.cache import cache
 from edx_django_utils.cache import TieredCache
+from edx_django_utils.cache.utils import CachedResponse
+from edx_django_utils.monitoring import increment, set_custom_attribute
+from requests import Response
+from requests.exceptions import HTTPError, RequestException
 
-from enterprise_access.cache_utils import versioned_cache_key
+from enterprise_access.cache_utils import (
+    LOCAL_CACHE_MISS,
+    process_local_cache,
+    refresh_many_with_single_flight,
+    refresh_with_single_flight,
+    schedule_revalidation,
+    unwrap_soft_expiring_value,
+    versioned_cache_key,
+    wrap_soft_expiring_value
+)
+from enterprise_access.concurrency_utils import deadline_from_now, fan_out
 
 from ..api_client.enterprise_catalog_client import EnterpriseCatalogApiClient, EnterpriseCatalogApiV1Client
+from .tasks import refresh_catalog_content_metadata_task, refresh_content_metadata_task
 
 logger = logging.getLogger(__name__)
 
+CATALOG_CONTENT_METADATA_LOCAL_CACHE_NAMESPACE = 'catalog_content_metadata'
+
+MissingContentMetadata = namedtuple('MissingContentMetadata', ['status_code'])
+MissingContentMetadata.__doc__ = """
+Cached, for ``settings.CONTENT_METADATA_NEGATIVE_CACHE_TIMEOUT`` seconds, in place of content metadata
+that the enterprise-catalog service didn't return (e.g. for restricted or retired runs), so that repeated
+requests for it don't each go back to the catalog service.
+
+status_code: The HTTP status code the catalog service responded with, or None if it responded without the content.
+"""
+
+
+def catalog_content_metadata_cache_key(enterprise_catalog_uuid, content_key):
+    return versioned_cache_key('get_catalog_content_metadata', enterprise_catalog_uuid, content_key)
+
+
+def content_metadata_cache_key(content_identifier, coerce_to_parent_course=False):
+    return versioned_cache_key(
+        'get_and_cache_content_metadata',
+        content_identifier,
+        f'coerce_to_parent_course={coerce_to_parent_course}',
+    )
+
+
+def _negative_timeout(timeout):
+    """
+    Helper to determine how long the absence of content metadata is cached, given the ``timeout`` of its records.
+    """
+    return min(settings.CONTENT_METADATA_NEGATIVE_CACHE_TIMEOUT, timeout)
+
+
+def _content_keys_of_record(record):
+    """
+    Helper to determine which requested content keys a catalog content metadata record answers for:
+    its own key, and for courses, the keys of each of their runs.
+    """
+    return {record.get('key'), *(run.get('key') for run in record.get('course_runs') or [])}
+
+
+def records_by_requested_content_key(records, content_keys):
+    """
+    Helper to map each of the requested ``content_keys`` to the catalog content metadata record that answers for it:
+    the record with that key or, for a course run key, the record of its course (see ``_content_keys_of_record()``).
+    Requested keys that no record answers for are left out.
+    """
+    requested_content_keys = set(content_keys)
+    records_by_content_key = {
+        record.get('key'): record for record in records if record.get('key') in requested_content_keys
+    }
+    for record in records:
+        for content_key in _content_keys_of_record(record) & requested_content_keys:
+            records_by_content_key.setdefault(content_key, record)
+    return records_by_content_key
+
+
+def _soft_timeout(timeout):
+    """
+    Helper to determine after how long a content metadata cache entry with the given (hard) ``timeout``
+    is stale, meaning it's still served, but revalidated in the background.
+    """
+    return min(settings.CONTENT_METADATA_CACHE_SOFT_TIMEOUT, timeout)
+
 
 def get_and_cache_catalog_content_metadata(
     enterprise_catalog_uuid,
@@ -28,6 +108,10 @@ def get_and_cache_catalog_content_metadata(
     that is, each combination of (enterprise_catalog_uuid, key) for key in content_keys
     is cached independently.
 
+    Cached records older than ``settings.CONTENT_METADATA_CACHE_SOFT_TIMEOUT`` are still
+    returned, and a background refresh of them is scheduled.  Keys that the catalog service recently
+    didn't return any metadata for are negatively cached (see ``MissingContentMetadata``), and aren't requested again.
+
     Returns: A list of dictionaries containing content metadata for the given keys.
     Raises: An HTTPError if there's a problem getting the content metadata
       via the enterprise-catalog service.
@@ -43,43 +127,105 @@ def get_and_cache_catalog_content_metadata(
     # Maintains a mapping of cache keys for each content key
     cache_keys_by_content_key = {}
     for content_key in content_keys:
-        cache_key = versioned_cache_key(
-            'get_catalog_content_metadata',
+        cache_keys_by_content_key[content_key] = catalog_content_metadata_cache_key(
             enterprise_catalog_uuid,
             content_key,
         )
-        cache_keys_by_content_key[content_key] = cache_key
+    content_keys_by_cache_key = {cache_key: key for key, cache_key in cache_keys_by_content_key.items()}
 
-    # Use our computed cache keys to do a bulk get from the Django cache
-    cached_content_metadata = cache.get_many(cache_keys_by_content_key.values())
+    # Check the process-local cache first, then do a bulk get from the Django cache for the rest
+    local_cache = process_local_cache()
+    cached_content_metadata = {}
+    for cache_key in cache_keys_by_content_key.values():
+        local_value = local_cache.get(CATALOG_CONTENT_METADATA_LOCAL_CACHE_NAMESPACE, cache_key)
+        if local_value is not LOCAL_CACHE_MISS:
+            cached_content_metadata[cache_key] = local_value
+    remotely_cached_content_metadata = cache.get_many([
+        cache_key for cache_key in cache_keys_by_content_key.values()
+        if cache_key not in cached_content_metadata
+    ])
+    for cache_key, value in remotely_cached_content_metadata.items():
+        local_cache.set(CATALOG_CONTENT_METADATA_LOCAL_CACHE_NAMESPACE, cache_key, value)
+    cached_content_metadata.update(remotely_cached_content_metadata)
 
     # Go through our cache hits, append data to results and prune
     # from the list of keys to fetch from the catalog service.
+    stale_content_keys = []
+    negatively_cached_content_keys = set()
     for content_key, cache_key in cache_keys_by_content_key.items():
         if cache_key in cached_content_metadata:
             logger.info(f'cache hit for catalog {enterprise_catalog_uuid} and content {content_key}')
-            metadata_results_list.append(cached_content_metadata[cache_key])
+            record, is_stale = unwrap_soft_expiring_value(cached_content_metadata[cache_key])
             keys_to_fetch.remove(content_key)
+            if isinstance(record, MissingContentMetadata):
+                negatively_cached_content_keys.add(content_key)
+                continue
+            metadata_results_list.append(record)
+            if is_stale:
+                stale_content_keys.append(content_key)
+
+    set_custom_attribute('catalog_content_metadata_negative_cache_hits', len(negatively_cached_content_keys))
+    if negatively_cached_content_keys:
+        increment('catalog_content_metadata.negative_cache.hit', len(negatively_cached_content_keys))
+
+    # Stale hits are still returned, but refreshed in the background.
+    if stale_content_keys:
+        schedule_revalidation(
+            [cache_keys_by_content_key[content_key] for content_key in stale_content_keys],
+            lambda cache_keys: refresh_catalog_content_metadata_task.delay(
+                str(enterprise_catalog_uuid),
+                [content_keys_by_cache_key[cache_key] for cache_key in cache_keys],
+                timeout,
+            ),
+        )
 
     # Here's the list of results fetched from the catalog service
     fetched_metadata = []
     if keys_to_fetch:
-        fetched_metadata = _fetch_catalog_content_metadata_with_client(enterprise_catalog_uuid, keys_to_fetch)
+        refreshed_cache_keys = set()
+
+        def fetch_and_cache(cache_keys):
+            requested_content_keys = [content_keys_by_cache_key[cache_key] for cache_key in cache_keys]
+            records = fetch_and_cache_catalog_content_metadata(
+                enterprise_catalog_uuid,
+                requested_content_keys,
+                timeout,
+            )
+            fetched_metadata.extend(records)
+            records_by_cache_key = {
+                cache_keys_by_content_key[content_key]: record
+                for content_key, record in records_by_requested_content_key(records, requested_content_keys).items()
+            }
+            refreshed_cache_keys.update(records_by_cache_key)
+            return records_by_cache_key
 
-    # Do a bulk set into the cache of everything we just had to fetch from the catalog service
-    content_metadata_to_cache = {}
-    for fetched_record in fetched_metadata:
-        cache_key = cache_keys_by_content_key.get(fetched_record.get('key'))
-        content_metadata_to_cache[cache_key] = fetched_record
+        def recheck(cache_keys):
+            return {
+                cache_key: unwrap_soft_expiring_value(value)[0]
+                for cache_key, value in cache.get_many(cache_keys).items()
+            }
 
-    cache.set_many(content_metadata_to_cache, timeout)
+        # Only one concurrent request fetches any given key, the others pick it up from the cache.
+        refreshed_content_metadata = refresh_many_with_single_flight(
+            [cache_keys_by_content_key[content_key] for content_key in keys_to_fetch],
+            recheck,
+            fetch_and_cache,
+        )
+        fetched_metadata.extend(
+            value for cache_key, value in refreshed_content_metadata.items()
+            if cache_key not in refreshed_cache_keys and not isinstance(value, MissingContentMetadata)
+        )
 
     # Add to our results list everything we just had to fetch
     metadata_results_list.extend(fetched_metadata)
 
+    # A course record may answer for several of the requested keys, e.g. for the course and some of its runs.
+    metadata_results_list = list({record.get('key'): record for record in metadata_results_list}.values())
+
     # Log a warning for any content key that the caller asked for metadata about,
     # but which was not found in cache OR from the catalog service.
-    missing_keys = set(content_keys) - {record.get('key') for record in metadata_results_list}
+    found_keys = set().union(*(_content_keys_of_record(record) for record in metadata_results_list))
+    missing_keys = set(content_keys) - found_keys - negatively_cached_content_keys
     if missing_keys:
         logger.warning(
             'Could not fetch content keys %s from catalog %s',
@@ -91,9 +237,102 @@ def get_and_cache_catalog_content_metadata(
     return metadata_results_list
 
 
-def _fetch_catalog_content_metadata_with_client(enterprise_catalog_uuid, content_keys):
+def get_uncached_catalog_content_keys(enterprise_catalog_uuid, content_keys):
     """
-    Helper to isolate the task of fetching content metadata via our client.
+    Returns those of ``content_keys`` within the provided ``enterprise_catalog_uuid`` that
+    ``get_and_cache_catalog_content_metadata()`` would request from the enterprise-catalog service,
+    or would serve stale: those without a cached record, nor a negatively cached one, or whose record is stale.
+    """
+    cache_keys_by_content_key = {
+        content_key: catalog_content_metadata_cache_key(enterprise_catalog_uuid, content_key)
+        for content_key in content_keys
+    }
+    cached_content_metadata = cache.get_many(list(cache_keys_by_content_key.values()))
+    return [
+        content_key for content_key, cache_key in cache_keys_by_content_key.items()
+        if cache_key not in cached_content_metadata or unwrap_soft_expiring_value(cached_content_metadata[cache_key])[1]
+    ]
+
+
+def fetch_and_cache_catalog_content_metadata(
+    enterprise_catalog_uuid,
+    content_keys,
+    timeout=settings.CONTENT_METADATA_CACHE_TIMEOUT,
+):
+    """
+    Fetches the metadata for ``content_keys`` within the provided ``enterprise_catalog_uuid``
+    from the enterprise-catalog service, regardless of what's cached, and caches each record
+    where ``get_and_cache_catalog_content_metadata()`` looks for it.  Requested keys that the
+    catalog service responded without are negatively cached, for a shorter timeout.
+
+    Returns: A list of dictionaries containing content metadata for the given keys.
+    Raises: An HTTPError if there's a problem getting the content metadata
+      via the enterprise-catalog service.
+    """
+    fetched_metadata, failed_content_keys = _fetch_catalog_content_metadata_with_client(
+        enterprise_catalog_uuid,
+        content_keys,
+    )
+
+    # Do a bulk set into the cache of everything we just had to fetch from the catalog service,
+    # under the key of each record, and under each requested key that a record answers for,
+    # e.g. a course run key answered for by the record of its course.
+    records_by_content_key = {record.get('key'): record for record in fetched_metadata}
+    answered_records = records_by_requested_content_key(fetched_metadata, content_keys)
+    records_by_content_key.update(answered_records)
+    content_metadata_to_cache = {
+        catalog_content_metadata_cache_key(enterprise_catalog_uuid, content_key): wrap_soft_expiring_value(
+            record, _soft_timeout(timeout),
+        )
+        for content_key, record in records_by_content_key.items()
+    }
+
+    # Keys of chunks that failed to be fetched aren't known to be missing, so aren't negatively cached.
+    missing_content_metadata_to_cache = {
+        catalog_content_metadata_cache_key(enterprise_catalog_uuid, content_key): MissingContentMetadata(None)
+        for content_key in set(content_keys) - set(answered_records) - set(failed_content_keys)
+    }
+
+    local_cache = process_local_cache()
+    for values_to_cache, cache_timeout in (
+        (content_metadata_to_cache, timeout),
+        (missing_content_metadata_to_cache, _negative_timeout(timeout)),
+    ):
+        if not values_to_cache:
+            continue
+        cache.set_many(values_to_cache, cache_timeout)
+        for cache_key, value in values_to_cache.items():
+            local_cache.set(CATALOG_CONTENT_METADATA_LOCAL_CACHE_NAMESPACE, cache_key, value, cache_timeout)
+    if missing_content_metadata_to_cache:
+        increment('catalog_content_metadata.negative_cache.set', len(missing_content_metadata_to_cache))
+    return fetched_metadata
+
+
+def url_safe_content_key_chunks(content_keys):
+    """
+    Helper to split ``content_keys`` into chunks of at most ``settings.CATALOG_CONTENT_METADATA_CHUNK_SIZE`` keys,
+    whose URL-encoded ``content_keys`` query parameters are at most
+    ``settings.CATALOG_CONTENT_METADATA_CHUNK_MAX_QUERY_LENGTH`` characters long.
+    A single key longer than that still gets a chunk of its own.
+    """
+    chunk, chunk_query_length = [], 0
+    for content_key in content_keys:
+        key_query_length = len(urlencode({'content_keys': content_key})) + 1
+        if chunk and (
+            len(chunk) >= settings.CATALOG_CONTENT_METADATA_CHUNK_SIZE or
+            chunk_query_length + key_query_length > settings.CATALOG_CONTENT_METADATA_CHUNK_MAX_QUERY_LENGTH
+        ):
+            yield chunk
+            chunk, chunk_query_length = [], 0
+        chunk.append(content_key)
+        chunk_query_length += key_query_length
+    if chunk:
+        yield chunk
+
+
+def _fetch_catalog_content_metadata_chunk(enterprise_catalog_uuid, content_keys):
+    """
+    Helper to isolate the task of fetching content metadata for one chunk of keys via our client.
     """
     client = EnterpriseCatalogApiClient()
     response_payload = client.catalog_content_metadata(
@@ -109,6 +348,72 @@ def _fetch_catalog_content_metadata_with_client(enterprise_catalog_uuid, content
     return results
 
 
+def _fetch_catalog_content_metadata_with_client(enterprise_catalog_uuid, content_keys):
+    """
+    Helper to isolate the task of fetching content metadata via our client.
+
+    Keys are requested in URL-safe chunks (see ``url_safe_content_key_chunks()``),
+    fetched concurrently via ``fan_out()``.
+    Each chunk that fails, or doesn't complete before the fan-out deadline, is retried on its own,
+    up to ``settings.CATALOG_CONTENT_METADATA_CHUNK_RETRIES`` times.  If chunks still fail after that,
+    the results of the others are returned; the error is only raised if every chunk failed.
+
+    Returns: A tuple of (list of content metadata records, list of the content keys of chunks that failed).
+    """
+    chunks = list(url_safe_content_key_chunks(list(dict.fromkeys(content_keys))))
+    outcome = fan_out(
+        {
+            index: partial(_fetch_catalog_content_metadata_chunk, enterprise_catalog_uuid, chunk)
+            for index, chunk in enumerate(chunks)
+        },
+        deadline=deadline_from_now(),
+    )
+    results_by_chunk = dict(outcome.results)
+    last_error = None
+    for index in sorted([*outcome.errors, *outcome.pending]):
+        last_error = outcome.errors.get(index)
+        for _ in range(settings.CATALOG_CONTENT_METADATA_CHUNK_RETRIES):
+            logger.warning(
+                f'Retrying content metadata chunk {index + 1} of {len(chunks)} in catalog {enterprise_catalog_uuid} '
+                f'after {last_error or "timeout"}'
+            )
+            try:
+                results_by_chunk[index] = _fetch_catalog_content_metadata_chunk(enterprise_catalog_uuid, chunks[index])
+                break
+            except RequestException as exc:
+                last_error = exc
+
+    failed_chunks = [chunk for index, chunk in enumerate(chunks) if index not in results_by_chunk]
+    set_custom_attribute('catalog_content_metadata_chunks', len(chunks))
+    set_custom_attribute('catalog_content_metadata_failed_chunks', len(failed_chunks))
+    if failed_chunks:
+        if not results_by_chunk and last_error:
+            raise last_error
+        logger.error(
+            f'Failed to fetch content metadata in catalog {enterprise_catalog_uuid} for {len(failed_chunks)} '
+            f'of {len(chunks)} chunks of content keys: {failed_chunks}'
+        )
+
+    records = [record for index in sorted(results_by_chunk) for record in results_by_chunk[index]]
+    return records, [content_key for chunk in failed_chunks for content_key in chunk]
+
+
+def _raise_for_missing_content_metadata(content_identifier, missing_content_metadata):
+    """
+    Helper that re-raises, for a negatively cached ``MissingContentMetadata``,
+    the HTTPError that the catalog service originally responded with.
+    Returns None for content that the catalog service responded without.
+    """
+    if missing_content_metadata.status_code is None:
+        return None
+    response = Response()
+    response.status_code = missing_content_metadata.status_code
+    raise HTTPError(
+        f'{missing_content_metadata.status_code} (negatively cached) for content {content_identifier}',
+        response=response,
+    )
+
+
 def get_and_cache_content_metadata(
     content_identifier,
     coerce_to_parent_course=False,
@@ -116,6 +421,9 @@ def get_and_cache_content_metadata(
 ):
     """
     Fetch & cache content metadata from the enterprise-catalog catalog-/customer-agnostic endoint.
+    Cached metadata older than ``settings.CONTENT_METADATA_CACHE_SOFT_TIMEOUT`` is still
+    returned, and a background refresh of it is scheduled.  Content that the catalog service
+    recently didn't find is negatively cached (see ``MissingContentMetadata``).
 
     Returns:
         dict: Serialized content metadata from the enterprise-catalog API.
@@ -123,25 +431,82 @@ def get_and_cache_content_metadata(
     Raises:
         HTTPError: If there's a problem calling the enterprise-catalog API.
     """
-    cache_key = versioned_cache_key(
-        'get_and_cache_content_metadata',
-        content_identifier,
-        f'coerce_to_parent_course={coerce_to_parent_course}',
-    )
+    cache_key = content_metadata_cache_key(content_identifier, coerce_to_parent_course)
     cached_response = TieredCache.get_cached_response(cache_key)
     if cached_response.is_found:
-        return cached_response.value
+        content_metadata, is_stale = unwrap_soft_expiring_value(cached_response.value)
+        if isinstance(content_metadata, MissingContentMetadata):
+            set_custom_attribute('content_metadata_negative_cache_hit', True)
+            increment('content_metadata.negative_cache.hit')
+            return _raise_for_missing_content_metadata(content_identifier, content_metadata)
+        if is_stale:
+            schedule_revalidation(
+                [cache_key],
+                lambda _: refresh_content_metadata_task.delay(content_identifier, coerce_to_parent_course, timeout),
+            )
+        return content_metadata
 
-    content_metadata = EnterpriseCatalogApiV1Client().content_metadata(
-        content_identifier,
-        coerce_to_parent_course=coerce_to_parent_course,
+    def recheck():
+        cached_response = TieredCache.get_cached_response(cache_key)
+        if not cached_response.is_found:
+            return cached_response
+        return CachedResponse(is_found=True, key=cache_key, value=unwrap_soft_expiring_value(cached_response.value)[0])
+
+    content_metadata = refresh_with_single_flight(
+        cache_key,
+        lambda: fetch_and_cache_content_metadata(content_identifier, coerce_to_parent_course, timeout),
+        recheck,
     )
+    if isinstance(content_metadata, MissingContentMetadata):
+        # Some concurrent caller found the content to be missing.
+        return _raise_for_missing_content_metadata(content_identifier, content_metadata)
+    return content_metadata
+
+
+def fetch_and_cache_content_metadata(
+    content_identifier,
+    coerce_to_parent_course=False,
+    timeout=settings.CONTENT_METADATA_CACHE_TIMEOUT,
+):
+    """
+    Fetches content metadata from the enterprise-catalog catalog-/customer-agnostic endpoint,
+    regardless of what's cached, and caches it where ``get_and_cache_content_metadata()`` looks for it.
+    Content that isn't found (including a 404, e.g. for restricted runs) is negatively cached, for a shorter timeout.
+
+    Returns:
+        dict: Serialized content metadata from the enterprise-catalog API.
+
+    Raises:
+        HTTPError: If there's a problem calling the enterprise-catalog API.
+    """
+    cache_key = content_metadata_cache_key(content_identifier, coerce_to_parent_course)
+    try:
+        content_metadata = EnterpriseCatalogApiV1Client().content_metadata(
+            content_identifier,
+            coerce_to_parent_course=coerce_to_parent_course,
+        )
+    except HTTPError as exc:
+        status_code = getattr(exc.response, 'status_code', None)
+        if status_code == 404:
+            TieredCache.set_all_tiers(
+                cache_key,
+                MissingContentMetadata(status_code),
+                django_cache_timeout=_negative_timeout(timeout),
+            )
+            increment('content_metadata.negative_cache.set')
+        raise
     if content_metadata:
         TieredCache.set_all_tiers(
             cache_key,
-            content_metadata,
+            wrap_soft_expiring_value(content_metadata, _soft_timeout(timeout)),
             django_cache_timeout=timeout,
         )
     else:
         logger.warning('Could not fetch metadata for content %s', content_identifier)
+        TieredCache.set_all_tiers(
+            cache_key,
+            MissingContentMetadata(None),
+            django_cache_timeout=_negative_timeout(timeout),
+        )
+        increment('content_metadata.negative_cache.set')
     return content_metadata
@@ -0,0 +1,34 @@
+"""
+Celery tasks for the content_metadata app.
+"""
+import logging
+
+from celery import shared_task
+
+from enterprise_access.tasks import LoggedTaskWithRetry
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(base=LoggedTaskWithRetry)
+def refresh_catalog_content_metadata_task(enterprise_catalog_uuid, content_keys, timeout):
+    """
+    Revalidates stale cache entries read by ``api.get_and_cache_catalog_content_metadata()``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from enterprise_access.apps.content_metadata.api import fetch_and_cache_catalog_content_metadata
+
+    logger.info(f'Refreshing stale content metadata in catalog {enterprise_catalog_uuid} for {content_keys}')
+    fetch_and_cache_catalog_content_metadata(enterprise_catalog_uuid, content_keys, timeout)
+
+
+@shared_task(base=LoggedTaskWithRetry)
+def refresh_content_metadata_task(content_identifier, coerce_to_parent_course, timeout):
+    """
+    Revalidates a stale cache entry read by ``api.get_and_cache_content_metadata()``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from enterprise_access.apps.content_metadata.api import fetch_and_cache_content_metadata
+
+    logger.info(f'Refreshing stale content metadata for {content_identifier}')
+    fetch_and_cache_content_metadata(content_identifier, coerce_to_parent_course, timeout)
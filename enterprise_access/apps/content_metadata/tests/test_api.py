@@ -5,8 +5,10 @@ Tests for the content_metadata/api.py functions.
 from unittest import mock
 from uuid import uuid4
 
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from edx_django_utils.cache import TieredCache
+from requests import Response
 from requests.exceptions import HTTPError
 
 from enterprise_access.apps.content_metadata import api
@@ -149,3 +151,176 @@ class TestContentMetadataApi(TestCase):
 
         call_args, _ = mock_client.content_metadata.call_args_list[0]
         self.assertEqual(call_args[0], content_key)
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.refresh_catalog_content_metadata_task')
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiClient', autospec=True)
+    def test_get_and_cache_catalog_content_metadata_stale_while_revalidate(self, mock_client_class, mock_task):
+        catalog_uuid = uuid4()
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.return_value = {
+            'count': 1,
+            'results': [{'key': 'course+A', 'data': 'things'}],
+        }
+
+        with override_settings(CONTENT_METADATA_CACHE_SOFT_TIMEOUT=0):
+            api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+A'])
+
+        # The cached record is now stale: it's still served, and a refresh is scheduled once.
+        for _ in range(2):
+            metadata_list = api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+A'])
+            self.assertEqual(metadata_list, [{'key': 'course+A', 'data': 'things'}])
+
+        self.assertEqual(mock_client.catalog_content_metadata.call_count, 1)
+        mock_task.delay.assert_called_once_with(
+            str(catalog_uuid), ['course+A'], settings.CONTENT_METADATA_CACHE_TIMEOUT,
+        )
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.refresh_content_metadata_task')
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiV1Client', autospec=True)
+    def test_get_and_cache_content_metadata_stale_while_revalidate(self, mock_client_class, mock_task):
+        mock_client = mock_client_class.return_value
+        mock_client.content_metadata.return_value = {'key': 'course+A', 'data': 'things'}
+
+        with override_settings(CONTENT_METADATA_CACHE_SOFT_TIMEOUT=0):
+            api.get_and_cache_content_metadata('course+A')
+        metadata = api.get_and_cache_content_metadata('course+A')
+
+        self.assertEqual(metadata, {'key': 'course+A', 'data': 'things'})
+        self.assertEqual(mock_client.content_metadata.call_count, 1)
+        mock_task.delay.assert_called_once_with('course+A', False, settings.CONTENT_METADATA_CACHE_TIMEOUT)
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiV1Client', autospec=True)
+    def test_fetch_and_cache_content_metadata(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.content_metadata.return_value = {'key': 'course+A', 'data': 'old'}
+        api.get_and_cache_content_metadata('course+A')
+
+        mock_client.content_metadata.return_value = {'key': 'course+A', 'data': 'new'}
+        api.fetch_and_cache_content_metadata('course+A')
+
+        self.assertEqual(api.get_and_cache_content_metadata('course+A'), {'key': 'course+A', 'data': 'new'})
+
+    @override_settings(CATALOG_CONTENT_METADATA_CHUNK_SIZE=2, CATALOG_CONTENT_METADATA_CHUNK_MAX_QUERY_LENGTH=60)
+    def test_url_safe_chunks(self):
+        # pylint: disable=protected-access
+        chunks = list(api.url_safe_content_key_chunks(['a', 'b', 'c', 'x' * 40, 'y' * 100, 'd']))
+
+        # Chunks are bounded by key count, and by encoded query length, except for single overlong keys.
+        self.assertEqual(chunks, [['a', 'b'], ['c'], ['x' * 40], ['y' * 100], ['d']])
+
+    @override_settings(CATALOG_CONTENT_METADATA_CHUNK_SIZE=1, CATALOG_CONTENT_METADATA_CHUNK_RETRIES=1)
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiClient', autospec=True)
+    def test_get_and_cache_catalog_content_metadata_retries_failed_chunks(self, mock_client_class):
+        catalog_uuid = uuid4()
+        failures_remaining = {'course+B': 1, 'course+C': 2}
+
+        def catalog_content_metadata(_, content_keys):
+            [content_key] = content_keys
+            if failures_remaining.get(content_key):
+                failures_remaining[content_key] -= 1
+                raise HTTPError(f'{content_key} is having a bad day')
+            return {'count': 1, 'results': [{'key': content_key}]}
+
+        mock_client_class.return_value.catalog_content_metadata.side_effect = catalog_content_metadata
+
+        metadata_list = api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+A', 'course+B', 'course+C'])
+
+        # B succeeds when retried, C fails both times, without failing the whole batch.
+        self.assertEqual(
+            sorted(record['key'] for record in metadata_list),
+            ['course+A', 'course+B'],
+        )
+        self.assertEqual(mock_client_class.return_value.catalog_content_metadata.call_count, 5)
+
+    @override_settings(CATALOG_CONTENT_METADATA_CHUNK_SIZE=1, CATALOG_CONTENT_METADATA_CHUNK_RETRIES=1)
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiClient', autospec=True)
+    def test_get_and_cache_catalog_content_metadata_every_chunk_fails(self, mock_client_class):
+        mock_client_class.return_value.catalog_content_metadata.side_effect = HTTPError('oh barnacles')
+
+        with self.assertRaisesRegex(HTTPError, 'oh barnacles'):
+            api.get_and_cache_catalog_content_metadata(uuid4(), ['course+A', 'course+B'])
+
+        self.assertEqual(mock_client_class.return_value.catalog_content_metadata.call_count, 4)
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiClient', autospec=True)
+    def test_get_and_cache_catalog_content_metadata_negative_caching(self, mock_client_class):
+        catalog_uuid = uuid4()
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.return_value = {
+            'count': 1,
+            'results': [{'key': 'course+A'}],
+        }
+
+        api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+A', 'course+B'])
+        metadata_list = api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+A', 'course+B'])
+
+        # course+B was missing, so isn't requested again.
+        self.assertEqual(mock_client.catalog_content_metadata.call_count, 1)
+        self.assertEqual(metadata_list, [{'key': 'course+A'}])
+
+        TieredCache.dangerous_clear_all_tiers()
+        with override_settings(CONTENT_METADATA_NEGATIVE_CACHE_TIMEOUT=0):
+            api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+B'])
+            api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+B'])
+        self.assertEqual(mock_client.catalog_content_metadata.call_count, 3)
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiClient', autospec=True)
+    def test_get_and_cache_catalog_content_metadata_run_key_answered_by_course(self, mock_client_class):
+        catalog_uuid = uuid4()
+        course_record = {'key': 'course+A', 'course_runs': [{'key': 'course-v1:A+1'}, {'key': 'course-v1:A+2'}]}
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.return_value = {'count': 1, 'results': [course_record]}
+
+        metadata_list = api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course-v1:A+1'])
+        self.assertEqual(metadata_list, [course_record])
+
+        # The run key is cached as answered by its course, as is the course key itself, and the record
+        # is only returned once when asked for by both.
+        metadata_list = api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course+A', 'course-v1:A+1'])
+        self.assertEqual(metadata_list, [course_record])
+        self.assertEqual(mock_client.catalog_content_metadata.call_count, 1)
+
+        # Other runs of the course weren't requested, so aren't cached.
+        api.get_and_cache_catalog_content_metadata(catalog_uuid, ['course-v1:A+2'])
+        self.assertEqual(mock_client.catalog_content_metadata.call_count, 2)
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiV1Client', autospec=True)
+    def test_get_and_cache_content_metadata_negative_caching_not_found(self, mock_client_class):
+        response = Response()
+        response.status_code = 404
+        mock_client = mock_client_class.return_value
+        mock_client.content_metadata.side_effect = HTTPError('restricted', response=response)
+
+        for _ in range(2):
+            with self.assertRaises(HTTPError) as context:
+                api.get_and_cache_content_metadata('course+A', coerce_to_parent_course=True)
+            self.assertEqual(context.exception.response.status_code, 404)
+
+        self.assertEqual(mock_client.content_metadata.call_count, 1)
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiV1Client', autospec=True)
+    def test_get_and_cache_content_metadata_negative_caching_empty(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.content_metadata.return_value = {}
+
+        self.assertEqual(api.get_and_cache_content_metadata('course+A'), {})
+        self.assertIsNone(api.get_and_cache_content_metadata('course+A'))
+        self.assertEqual(mock_client.content_metadata.call_count, 1)
+
+        # Content that turns up is cached as usual once it's fetched again.
+        mock_client.content_metadata.return_value = {'key': 'course+A'}
+        api.fetch_and_cache_content_metadata('course+A')
+        self.assertEqual(api.get_and_cache_content_metadata('course+A'), {'key': 'course+A'})
+
+    @mock.patch('enterprise_access.apps.content_metadata.api.EnterpriseCatalogApiV1Client', autospec=True)
+    def test_get_and_cache_content_metadata_server_errors_not_negatively_cached(self, mock_client_class):
+        response = Response()
+        response.status_code = 503
+        mock_client = mock_client_class.return_value
+        mock_client.content_metadata.side_effect = HTTPError('unavailable', response=response)
+
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                api.get_and_cache_content_metadata('course+A')
+
+        self.assertEqual(mock_client.content_metadata.call_count, 2)
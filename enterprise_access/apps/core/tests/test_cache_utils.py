@@ -0,0 +1,297 @@
+""" Tests for enterprise_access.cache_utils. """
+from unittest import mock
+from uuid import uuid4
+
+from django.core.cache import cache as django_cache
+from django.test import SimpleTestCase, override_settings
+from edx_django_utils.cache import RequestCache
+
+from enterprise_access.cache_utils import (
+    LOCAL_CACHE_MISS,
+    LocalTieredCache,
+    ProcessLocalCache,
+    _single_flight_lease_key,
+    process_local_cache,
+    refresh_many_with_single_flight,
+    refresh_with_single_flight,
+    request_cache_key,
+    schedule_revalidation,
+    unwrap_soft_expiring_value,
+    versioned_cache_key,
+    wrap_soft_expiring_value
+)
+
+
+class VersionedCacheKeyTests(SimpleTestCase):
+    """ Tests for cache_utils.versioned_cache_key """
+
+    def test_key_is_stable_and_short(self):
+        some_uuid = uuid4()
+        key = versioned_cache_key('some_function', some_uuid, 42)
+
+        self.assertEqual(key, versioned_cache_key('some_function', some_uuid, 42))
+        self.assertEqual(len(key), 64)
+        self.assertNotEqual(key, versioned_cache_key('some_function', some_uuid, 43))
+
+    def test_args_are_stringified(self):
+        some_uuid = uuid4()
+        self.assertEqual(
+            versioned_cache_key('some_function', some_uuid, 42),
+            versioned_cache_key('some_function', str(some_uuid), '42'),
+        )
+
+    def test_equal_args_of_different_types(self):
+        # 1 == 1.0 == True, but their string forms differ, and so should their keys.
+        keys = {versioned_cache_key('some_function', arg) for arg in (1, 1.0, True)}
+        self.assertEqual(len(keys), 3)
+
+    def test_unhashable_args(self):
+        self.assertEqual(
+            versioned_cache_key('some_function', ['a', 'b']),
+            versioned_cache_key('some_function', "['a', 'b']"),
+        )
+
+    def test_version_stamp_changes_key(self):
+        with override_settings(CACHE_KEY_VERSION_STAMP='first'):
+            first_key = versioned_cache_key('some_function', 42)
+        with override_settings(CACHE_KEY_VERSION_STAMP='second'):
+            second_key = versioned_cache_key('some_function', 42)
+        with override_settings(CACHE_KEY_VERSION_STAMP='first'):
+            self.assertEqual(versioned_cache_key('some_function', 42), first_key)
+        self.assertNotEqual(first_key, second_key)
+
+
+class RequestCacheKeyTests(SimpleTestCase):
+    """ Tests for cache_utils.request_cache_key """
+
+    def test_request_cache_key(self):
+        some_uuid = uuid4()
+        self.assertEqual(request_cache_key('some_function', some_uuid, 42), ('some_function', str(some_uuid), '42'))
+        self.assertEqual(
+            request_cache_key('some_function', some_uuid, 42),
+            request_cache_key('some_function', str(some_uuid), 42),
+        )
+
+
+class ProcessLocalCacheTests(SimpleTestCase):
+    """ Tests for cache_utils.ProcessLocalCache """
+
+    def _cache(self, max_entries=10, max_bytes=10000):
+        return ProcessLocalCache({'ns': 60, 'off': 0}, max_entries=max_entries, max_bytes=max_bytes)
+
+    def test_get_and_set(self):
+        cache = self._cache()
+        value = {'a': [1, 2]}
+        cache.set('ns', 'key', value)
+
+        cached_value = cache.get('ns', 'key')
+        self.assertEqual(cached_value, value)
+        # Each get returns a fresh copy, so callers can't mutate each other's values.
+        self.assertIsNot(cached_value, value)
+        self.assertIs(cache.get('ns', 'other-key'), LOCAL_CACHE_MISS)
+        self.assertEqual(
+            cache.stats()['namespaces']['ns'],
+            {'hits': 1, 'misses': 1, 'evictions': 0, 'expirations': 0},
+        )
+
+    def test_disabled_namespaces_are_bypassed(self):
+        cache = self._cache()
+        cache.set('off', 'key', 'value')
+        cache.set('unknown', 'key', 'value')
+
+        self.assertIs(cache.get('off', 'key'), LOCAL_CACHE_MISS)
+        self.assertIs(cache.get('unknown', 'key'), LOCAL_CACHE_MISS)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    @mock.patch('enterprise_access.cache_utils.time.monotonic')
+    def test_entries_expire(self, mock_monotonic):
+        cache = self._cache()
+        mock_monotonic.return_value = 1000
+        cache.set('ns', 'key', 'value', timeout=10)
+
+        mock_monotonic.return_value = 1009
+        self.assertEqual(cache.get('ns', 'key'), 'value')
+        mock_monotonic.return_value = 1011
+        self.assertIs(cache.get('ns', 'key'), LOCAL_CACHE_MISS)
+        # Expiry isn't an eviction, only removals to make room are.
+        self.assertEqual(cache.stats()['namespaces']['ns']['expirations'], 1)
+        self.assertEqual(cache.stats()['namespaces']['ns']['evictions'], 0)
+
+    @mock.patch('enterprise_access.cache_utils.time.monotonic')
+    def test_soft_expiring_values_are_cached_until_stale(self, mock_monotonic):
+        cache = self._cache()
+        mock_monotonic.return_value = 1000
+        cache.set('ns', 'fresh', wrap_soft_expiring_value('value', 30), timeout=300)
+        cache.set('ns', 'stale', wrap_soft_expiring_value('value', -1), timeout=300)
+
+        self.assertEqual(cache.get('ns', 'fresh').value, 'value')
+        self.assertIs(cache.get('ns', 'stale'), LOCAL_CACHE_MISS)
+        # Once stale, the value is read from the django cache again, where it may have been revalidated.
+        mock_monotonic.return_value = 1031
+        self.assertIs(cache.get('ns', 'fresh'), LOCAL_CACHE_MISS)
+
+    @mock.patch('enterprise_access.cache_utils.increment')
+    def test_metrics_are_reported_in_batches(self, mock_increment):
+        cache = ProcessLocalCache({'ns': 60}, max_entries=10, max_bytes=10000, metrics_batch_size=3)
+        cache.set('ns', 'key', 'value')
+        cache.get('ns', 'key')
+        cache.get('ns', 'other-key')
+        self.assertFalse(mock_increment.called)
+
+        cache.get('ns', 'key')
+        mock_increment.assert_has_calls(
+            [mock.call('process_local_cache.ns.hits', 2), mock.call('process_local_cache.ns.misses', 1)],
+            any_order=True,
+        )
+
+        mock_increment.reset_mock()
+        cache.get('ns', 'key')
+        cache.flush_metrics()
+        mock_increment.assert_called_once_with('process_local_cache.ns.hits', 1)
+
+    def test_least_recently_used_entry_is_evicted_at_max_entries(self):
+        cache = self._cache(max_entries=2)
+        cache.set('ns', 'a', 1)
+        cache.set('ns', 'b', 2)
+        cache.get('ns', 'a')
+        cache.set('ns', 'c', 3)
+
+        self.assertIs(cache.get('ns', 'b'), LOCAL_CACHE_MISS)
+        self.assertEqual(cache.get('ns', 'a'), 1)
+        self.assertEqual(cache.get('ns', 'c'), 3)
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_entries_are_evicted_at_max_bytes(self):
+        cache = self._cache(max_bytes=300)
+        cache.set('ns', 'a', 'x' * 100)
+        cache.set('ns', 'b', 'x' * 100)
+        cache.set('ns', 'c', 'x' * 100)
+        cache.set('ns', 'too-big', 'x' * 1000)
+
+        self.assertIs(cache.get('ns', 'a'), LOCAL_CACHE_MISS)
+        self.assertIs(cache.get('ns', 'too-big'), LOCAL_CACHE_MISS)
+        self.assertLessEqual(cache.stats()['bytes'], 300)
+        self.assertEqual(cache.stats()['namespaces']['ns']['evictions'], 1)
+
+
+@override_settings(PROCESS_LOCAL_CACHE_TIMEOUTS={'ns': 60})
+class LocalTieredCacheTests(SimpleTestCase):
+    """ Tests for cache_utils.LocalTieredCache """
+
+    def setUp(self):
+        super().setUp()
+        process_local_cache.cache_clear()
+        self.addCleanup(process_local_cache.cache_clear)
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(django_cache.clear)
+
+    def test_local_tier_serves_later_requests(self):
+        LocalTieredCache.set_all_tiers('key', 'value', 300, 'ns')
+        # Simulate a later request, after memcached has dropped the value.
+        RequestCache.clear_all_namespaces()
+        django_cache.clear()
+
+        self.assertEqual(LocalTieredCache.get_cached_response('key', 'ns').value, 'value')
+        self.assertEqual(process_local_cache().stats()['namespaces']['ns']['hits'], 1)
+
+    def test_django_cache_hits_fill_local_tier(self):
+        django_cache.set('key', 'value')
+
+        self.assertTrue(LocalTieredCache.get_cached_response('key', 'ns').is_found)
+        self.assertEqual(process_local_cache().get('ns', 'key'), 'value')
+
+    def test_delete_all_tiers(self):
+        LocalTieredCache.set_all_tiers('key', 'value', 300, 'ns')
+        LocalTieredCache.delete_all_tiers('key', 'ns')
+
+        self.assertFalse(LocalTieredCache.get_cached_response('key', 'ns').is_found)
+
+
+@override_settings(SINGLE_FLIGHT_WAIT_SECONDS=0.2, SINGLE_FLIGHT_POLL_INTERVAL=0.01)
+class SingleFlightTests(SimpleTestCase):
+    """ Tests for cache_utils.refresh_with_single_flight and refresh_many_with_single_flight """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(django_cache.clear)
+
+    def test_lease_holder_refreshes_and_releases_lease(self):
+        refresh = mock.Mock(return_value='fresh')
+
+        self.assertEqual(refresh_with_single_flight('key', refresh), 'fresh')
+        refresh.assert_called_once_with()
+        self.assertIsNone(django_cache.get(_single_flight_lease_key('key')))
+
+    def test_lease_is_released_when_refresh_fails(self):
+        with self.assertRaises(ValueError):
+            refresh_with_single_flight('key', mock.Mock(side_effect=ValueError))
+        self.assertIsNone(django_cache.get(_single_flight_lease_key('key')))
+
+    def test_waiter_picks_up_value_cached_by_lease_holder(self):
+        django_cache.set(_single_flight_lease_key('key'), 'someone-else')
+        recheck = mock.Mock(side_effect=[{}, {'key': 'theirs'}])
+        refresh = mock.Mock()
+
+        results = refresh_many_with_single_flight(['key'], recheck, refresh)
+
+        self.assertEqual(results, {'key': 'theirs'})
+        refresh.assert_not_called()
+
+    def test_waiter_refreshes_when_lease_holder_gives_up(self):
+        django_cache.set(_single_flight_lease_key('key'), 'someone-else')
+
+        def recheck(cache_keys):
+            # The lease holder finishes without caching anything.
+            django_cache.delete(_single_flight_lease_key('key'))
+            return {}
+
+        refresh = mock.Mock(return_value={'key': 'mine'})
+
+        results = refresh_many_with_single_flight(['key'], recheck, refresh)
+
+        self.assertEqual(results, {'key': 'mine'})
+        refresh.assert_called_once_with(['key'])
+
+    def test_waiter_refreshes_after_wait_budget(self):
+        django_cache.set(_single_flight_lease_key('stuck'), 'someone-else')
+        refresh = mock.Mock(side_effect=lambda cache_keys: {cache_key: 'mine' for cache_key in cache_keys})
+
+        results = refresh_many_with_single_flight(['stuck', 'free'], lambda cache_keys: {}, refresh)
+
+        self.assertEqual(results, {'stuck': 'mine', 'free': 'mine'})
+        self.assertEqual(refresh.call_args_list, [mock.call(['free']), mock.call(['stuck'])])
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+    """ Tests for cache_utils soft-expiring values and schedule_revalidation """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(django_cache.clear)
+
+    @mock.patch('enterprise_access.cache_utils.time.time')
+    def test_soft_expiring_value(self, mock_time):
+        mock_time.return_value = 1000
+        cached_value = wrap_soft_expiring_value({'a': 1}, 60)
+
+        self.assertEqual(unwrap_soft_expiring_value(cached_value), ({'a': 1}, False))
+        mock_time.return_value = 1060
+        self.assertEqual(unwrap_soft_expiring_value(cached_value), ({'a': 1}, True))
+
+    def test_plain_values_are_never_stale(self):
+        self.assertEqual(unwrap_soft_expiring_value({'a': 1}), ({'a': 1}, False))
+
+    def test_revalidation_is_scheduled_once_per_lease(self):
+        revalidate = mock.Mock()
+
+        self.assertEqual(schedule_revalidation(['a', 'b'], revalidate), ['a', 'b'])
+        self.assertEqual(schedule_revalidation(['a', 'c'], revalidate), ['c'])
+        self.assertEqual(revalidate.call_args_list, [mock.call(['a', 'b']), mock.call(['c'])])
+
+    def test_failure_to_schedule_releases_lease(self):
+        self.assertEqual(schedule_revalidation(['a'], mock.Mock(side_effect=Exception('broker down'))), [])
+
+        revalidate = mock.Mock()
+        self.assertEqual(schedule_revalidation(['a'], revalidate), ['a'])
+        revalidate.assert_called_once_with(['a'])
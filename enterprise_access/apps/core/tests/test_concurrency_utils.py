@@ -0,0 +1,240 @@
+""" Tests for enterprise_access.concurrency_utils. """
+import threading
+import time
+
+from django.test import TestCase, override_settings
+from edx_django_utils.cache import RequestCache
+
+from enterprise_access.cache_utils import request_cache
+from enterprise_access.concurrency_utils import deadline_from_now, fan_out, fetch_all_pages
+
+NAMESPACE = 'test-fan-out'
+
+
+class FanOutTests(TestCase):
+    """ Tests for concurrency_utils.fan_out """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+
+    def test_results_and_errors(self):
+        def fail():
+            raise ValueError('boom')
+
+        outcome = fan_out({'a': lambda: 1, 'b': lambda: 2, 'c': fail})
+
+        self.assertEqual(outcome.results, {'a': 1, 'b': 2})
+        self.assertEqual(list(outcome.errors), ['c'])
+        self.assertIsInstance(outcome.errors['c'], ValueError)
+        self.assertEqual(outcome.pending, [])
+
+    def test_calls_run_off_the_request_thread(self):
+        thread_ids = set()
+
+        def record_thread():
+            thread_ids.add(threading.get_ident())
+
+        fan_out({key: record_thread for key in range(3)}, max_workers=3)
+
+        self.assertNotIn(threading.get_ident(), thread_ids)
+
+    @override_settings(UPSTREAM_FAN_OUT_MAX_WORKERS=1)
+    def test_single_worker_runs_sequentially(self):
+        thread_ids = set()
+
+        def record_thread():
+            thread_ids.add(threading.get_ident())
+
+        fan_out({key: record_thread for key in range(3)})
+
+        self.assertEqual(thread_ids, {threading.get_ident()})
+
+    def test_nested_fan_outs_run_on_their_worker_thread(self):
+        def record_thread():
+            return threading.get_ident()
+
+        def fan_out_inner():
+            inner_outcome = fan_out({key: record_thread for key in range(3)}, max_workers=3)
+            return threading.get_ident(), set(inner_outcome.results.values())
+
+        outcome = fan_out({key: fan_out_inner for key in range(2)}, max_workers=2)
+
+        for outer_thread_id, inner_thread_ids in outcome.results.values():
+            self.assertEqual(inner_thread_ids, {outer_thread_id})
+
+    def test_nested_fan_outs_share_the_outer_deadline(self):
+        inner_outcomes, finished = [], threading.Event()
+
+        def fan_out_inner():
+            time.sleep(0.3)
+            inner_outcomes.append(fan_out({'a': lambda: 'a'}, deadline=deadline_from_now(10)))
+            finished.set()
+
+        fan_out({'outer': fan_out_inner, 'other': lambda: None}, deadline=deadline_from_now(0.2))
+
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(inner_outcomes[0].pending, ['a'])
+
+    def test_request_cache_is_shared_with_workers(self):
+        request_cache(NAMESPACE).set('seeded', 'parent-value')
+
+        def read_and_write():
+            request_cache(NAMESPACE).set('written', 'worker-value')
+            return request_cache(NAMESPACE).get_cached_response('seeded').value
+
+        outcome = fan_out({'a': read_and_write, 'b': lambda: None}, request_cache_namespaces=[NAMESPACE])
+
+        self.assertEqual(outcome.results['a'], 'parent-value')
+        self.assertEqual(request_cache(NAMESPACE).get_cached_response('written').value, 'worker-value')
+
+    def test_calls_missing_the_deadline_are_pending(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        outcome = fan_out(
+            {'fast': lambda: 'done', 'slow': release.wait},
+            deadline=deadline_from_now(0.2),
+        )
+
+        self.assertEqual(outcome.results, {'fast': 'done'})
+        self.assertEqual(outcome.pending, ['slow'])
+
+    def test_abandoned_calls_are_dropped(self):
+        release, finished = threading.Event(), threading.Event()
+        started = []
+        self.addCleanup(release.set)
+
+        def slow():
+            started.append('slow')
+            release.wait()
+            request_cache(NAMESPACE).set('written', 'abandoned-value')
+            finished.set()
+
+        outcome = fan_out(
+            {'slow': slow, 'also-slow': release.wait, 'queued': lambda: started.append('queued')},
+            max_workers=2,
+            deadline=deadline_from_now(0.2),
+            request_cache_namespaces=[NAMESPACE],
+        )
+        release.set()
+        finished.wait(5)
+
+        self.assertEqual(outcome.pending, ['slow', 'also-slow', 'queued'])
+        # Abandoned calls that hadn't started never do, and what the others cache never reaches the caller.
+        self.assertEqual(started, ['slow'])
+        self.assertFalse(request_cache(NAMESPACE).get_cached_response('written').is_found)
+
+    def test_expired_deadline_skips_sequential_calls(self):
+        deadline = time.monotonic() - 1
+
+        outcome = fan_out({'a': lambda: 1}, deadline=deadline)
+
+        self.assertEqual(outcome.results, {})
+        self.assertEqual(outcome.pending, ['a'])
+
+
+class FetchAllPagesTests(TestCase):
+    """ Tests for concurrency_utils.fetch_all_pages """
+
+    base_url = 'http://example.com/api/items/'
+
+    def _pages(self, count, page_size, url_for_page):
+        """
+        Returns a dict mapping URL -> page of a paginated response with ``count`` items.
+        """
+        items = list(range(count))
+        num_pages = (count + page_size - 1) // page_size
+        pages = {}
+        for index in range(num_pages):
+            pages[url_for_page(index)] = {
+                'count': count,
+                'next': url_for_page(index + 1) if index + 1 < num_pages else None,
+                'results': items[index * page_size:(index + 1) * page_size],
+            }
+        return pages
+
+    def _fetch_all(self, pages, first_url, max_workers=None):
+        requested_urls = []
+
+        def get_page(url):
+            requested_urls.append(url)
+            return pages[url]
+
+        fetched = fetch_all_pages(pages[first_url], get_page, max_workers=max_workers)
+        return [item for page in fetched for item in page['results']], requested_urls
+
+    def test_page_number_pagination(self):
+        pages = self._pages(10, 3, lambda index: f'{self.base_url}?page={index + 1}&page_size=3')
+
+        items, requested_urls = self._fetch_all(pages, f'{self.base_url}?page=1&page_size=3')
+
+        self.assertEqual(items, list(range(10)))
+        self.assertEqual(
+            sorted(requested_urls),
+            [f'{self.base_url}?page={page}&page_size=3' for page in (2, 3, 4)],
+        )
+
+    def test_limit_offset_pagination(self):
+        pages = self._pages(7, 2, lambda index: f'{self.base_url}?limit=2&offset={index * 2}')
+
+        items, requested_urls = self._fetch_all(pages, f'{self.base_url}?limit=2&offset=0')
+
+        self.assertEqual(items, list(range(7)))
+        self.assertEqual(len(requested_urls), 3)
+
+    def test_cursor_pagination_is_followed_sequentially(self):
+        pages = self._pages(5, 2, lambda index: f'{self.base_url}?cursor=c{index}')
+
+        items, requested_urls = self._fetch_all(pages, f'{self.base_url}?cursor=c0', max_workers=4)
+
+        self.assertEqual(items, list(range(5)))
+        self.assertEqual(requested_urls, [f'{self.base_url}?cursor=c1', f'{self.base_url}?cursor=c2'])
+
+    def test_single_page(self):
+        single_page = {self.base_url: {'count': 1, 'next': None, 'results': [0]}}
+        items, requested_urls = self._fetch_all(single_page, self.base_url)
+
+        self.assertEqual(items, [0])
+        self.assertEqual(requested_urls, [])
+
+    def test_pages_added_meanwhile_are_followed(self):
+        pages = self._pages(6, 2, lambda index: f'{self.base_url}?page={index + 1}')
+        first_page = dict(pages[f'{self.base_url}?page=1'], count=4)
+        pages[f'{self.base_url}?page=1'] = first_page
+
+        items, _ = self._fetch_all(pages, f'{self.base_url}?page=1')
+
+        self.assertEqual(items, list(range(6)))
+
+    def test_pages_removed_meanwhile_are_dropped(self):
+        pages = self._pages(6, 2, lambda index: f'{self.base_url}?page={index + 1}')
+        pages[f'{self.base_url}?page=2']['next'] = None
+
+        items, _ = self._fetch_all(pages, f'{self.base_url}?page=1')
+
+        self.assertEqual(items, list(range(4)))
+
+    def test_concurrent_pages_get_page_getters_of_their_own(self):
+        pages = self._pages(6, 2, lambda index: f'{self.base_url}?page={index + 1}')
+        page_getters = []
+
+        def new_get_page():
+            page_getters.append(object())
+            return pages.__getitem__
+
+        fetched = fetch_all_pages(pages[f'{self.base_url}?page=1'], pages.__getitem__, new_get_page=new_get_page)
+
+        self.assertEqual([item for page in fetched for item in page['results']], list(range(6)))
+        self.assertEqual(len(page_getters), 2)
+
+    def test_earliest_error_is_raised(self):
+        pages = self._pages(6, 2, lambda index: f'{self.base_url}?page={index + 1}')
+
+        def get_page(url):
+            if url.endswith('page=2'):
+                raise ValueError('boom')
+            return pages[url]
+
+        with self.assertRaisesRegex(ValueError, 'boom'):
+            fetch_all_pages(pages[f'{self.base_url}?page=1'], get_page)
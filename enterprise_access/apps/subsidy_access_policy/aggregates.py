@@ -0,0 +1,121 @@
+"""
+Bulk loading of the aggregates that admin-facing policy listings display,
+for many policies at once.
+"""
+import logging
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from requests.exceptions import HTTPError
+
+from enterprise_access.apps.content_assignments import api as assignments_api
+from enterprise_access.cache_utils import request_cache
+from enterprise_access.concurrency_utils import deadline_from_now, fan_out
+
+from .models import PolicySpendSnapshot, spend_snapshot_cache_key
+from .subsidy_api import REQUEST_CACHE_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+PolicyAggregates = namedtuple('PolicyAggregates', ['total_redeemed', 'total_allocated', 'spend_available'])
+PolicyAggregates.__doc__ = """
+The aggregates of a single policy, as loaded by ``PolicyAggregatesLoader``.
+
+total_redeemed: int <= 0 of USD cents, or None if the subsidy service failed to provide it.
+total_allocated: int <= 0 of USD cents.
+spend_available: int >= 0 of USD cents, or None if the subsidy service failed to provide it.
+"""
+
+
+class PolicyAggregatesLoader:
+    """
+    Loads ``PolicyAggregates`` for many policies at once, e.g. for a page of an admin policy listing.
+
+    Rather than each policy fetching its own subsidy record, transaction aggregates and allocated total,
+    ``load()``:
+
+    * fetches the spend snapshots of every policy in one query,
+    * fetches subsidy records once per distinct (customer, subsidy), and transaction aggregates
+      once per policy without a fresh spend snapshot, concurrently,
+    * computes the allocated totals of every policy in one grouped query.
+
+    Those are request cached where the policies' own properties look for them,
+    so aggregates are identical to computing them policy by policy.
+    """
+
+    def __init__(self, policies):
+        self.policies = list(policies)
+
+    def load(self):
+        """
+        Returns a dict mapping policy uuid -> ``PolicyAggregates``.
+        """
+        self._prefetch_spend_snapshots()
+        self._prefetch_subsidy_data()
+        self._prefetch_total_allocated()
+
+        aggregates_by_policy_uuid = {}
+        for policy in self.policies:
+            try:
+                total_redeemed = policy.total_redeemed
+                spend_available = policy.spend_available
+            except HTTPError as exc:
+                logger.exception(f"HTTPError from subsidy service: {exc}")
+                total_redeemed, spend_available = None, None
+            aggregates_by_policy_uuid[policy.uuid] = PolicyAggregates(
+                total_redeemed=total_redeemed,
+                total_allocated=policy.total_allocated,
+                spend_available=spend_available,
+            )
+        return aggregates_by_policy_uuid
+
+    def _prefetch_spend_snapshots(self):
+        """
+        Fetches the spend snapshots of every policy in one query, request caching them where ``spend_snapshot()``
+        looks for them.  Policies without a fresh snapshot are request cached as having none.
+        """
+        if not settings.POLICY_SPEND_SNAPSHOT_MAX_AGE:
+            return
+        snapshots_by_policy_uuid = PolicySpendSnapshot.objects.in_bulk(
+            [policy.uuid for policy in self.policies],
+        )
+        _cache = request_cache(namespace=REQUEST_CACHE_NAMESPACE)
+        for policy in self.policies:
+            snapshot = snapshots_by_policy_uuid.get(policy.uuid)
+            _cache.set(spend_snapshot_cache_key(policy.uuid), snapshot if snapshot and snapshot.is_fresh else None)
+
+    def _prefetch_subsidy_data(self):
+        """
+        Warms the request caches of ``subsidy_record()`` and ``aggregates_for_policy()`` for every policy.
+        Upstream errors encountered here are logged and swallowed; the same call is made again
+        (and the error handled as usual) when ``load()`` needs the data.
+        """
+        policies_by_subsidy = defaultdict(list)
+        for policy in self.policies:
+            policies_by_subsidy[(policy.enterprise_customer_uuid, policy.subsidy_uuid)].append(policy)
+
+        calls = {
+            ('subsidy_record', subsidy_key): subsidy_policies[0].subsidy_record
+            for subsidy_key, subsidy_policies in policies_by_subsidy.items()
+        }
+        for policy in self.policies:
+            # Policies with a fresh spend snapshot don't need their aggregates.
+            if not policy.spend_snapshot():
+                calls[('aggregates_for_policy', policy.uuid)] = policy.aggregates_for_policy
+
+        outcome = fan_out(calls, deadline=deadline_from_now(), request_cache_namespaces=[REQUEST_CACHE_NAMESPACE])
+        for key, exc in outcome.errors.items():
+            logger.warning(f'{exc} when prefetching {key} for policy aggregates')
+        for key in outcome.pending:
+            logger.warning(f'Timed out when prefetching {key} for policy aggregates')
+
+    def _prefetch_total_allocated(self):
+        """
+        Computes the allocated totals of every policy with an assignment configuration in one grouped query,
+        memoizing them for the rest of the request.
+        """
+        assignment_configuration_uuids = [
+            policy.assignment_configuration_id for policy in self.policies if policy.assignment_configuration_id
+        ]
+        if assignment_configuration_uuids:
+            assignments_api.get_allocated_quantities_for_configurations(assignment_configuration_uuids)
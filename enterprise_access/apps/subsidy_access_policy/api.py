@@ -1,7 +1,44 @@
 """
 Python API for interacting with SubsidyAccessPolicy records.
 """
-from .models import SubsidyAccessPolicy
+import logging
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db.models import Prefetch
+from edx_django_utils.monitoring import set_custom_attribute
+from requests.exceptions import RequestException
+
+from enterprise_access.cache_utils import LOCAL_CACHE_MISS, process_local_cache, versioned_cache_key
+
+from .models import PolicyGroupAssociation, PolicySpendSnapshot, SubsidyAccessPolicy
+
+logger = logging.getLogger(__name__)
+
+REDEEMABLE_POLICIES_LOCAL_CACHE_NAMESPACE = 'redeemable_policies'
+
+
+def redeemable_policies_cache_key(enterprise_customer_uuid, policies_version):
+    return versioned_cache_key('get_redeemable_policies_for_customer', enterprise_customer_uuid, policies_version)
+
+
+def redeemable_policies_version_cache_key(enterprise_customer_uuid):
+    return versioned_cache_key('redeemable_policies_version', enterprise_customer_uuid)
+
+
+def get_redeemable_policies_version(enterprise_customer_uuid):
+    """
+    Returns the current version of the given customer's policies, as shared by all processes via the django cache.
+    A version that's missing (never set, or evicted) is replaced by a new one, since which policies were cached
+    under the missing one is unknown.
+    """
+    cache_key = redeemable_policies_version_cache_key(enterprise_customer_uuid)
+    version = django_cache.get(cache_key)
+    if version is None:
+        django_cache.add(cache_key, uuid4().hex, None)
+        version = django_cache.get(cache_key)
+    return version
 
 
 def get_subsidy_access_policy(uuid):
@@ -13,3 +50,86 @@ def get_subsidy_access_policy(uuid):
         return SubsidyAccessPolicy.objects.get(uuid=uuid)
     except SubsidyAccessPolicy.DoesNotExist:
         return None
+
+
+def redeemable_policies_for_customer(enterprise_customer_uuid):
+    """
+    Returns a queryset of the given customer's policies which have redemption enabled, most recent first.
+    Each policy's assignment configuration and group associations are loaded along with it,
+    so that evaluating the policies doesn't query for those one policy at a time.
+    """
+    return SubsidyAccessPolicy.policies_with_redemption_enabled().filter(
+        enterprise_customer_uuid=enterprise_customer_uuid,
+    ).select_related(
+        'assignment_configuration',
+    ).prefetch_related(
+        Prefetch('groups', queryset=PolicyGroupAssociation.objects.order_by('id')),
+    ).order_by('-created')
+
+
+def get_redeemable_policies_for_customer(enterprise_customer_uuid):
+    """
+    Returns a list of the given customer's policies which have redemption enabled, most recent first,
+    as loaded by ``redeemable_policies_for_customer()``.
+
+    The list is kept in the process-local cache for up to ``settings.PROCESS_LOCAL_CACHE_TIMEOUTS``
+    seconds for its namespace, if any, under the customer's current policies version
+    (see ``get_redeemable_policies_version()``).  Saving or deleting a policy, group association
+    or assignment configuration bumps that version (see signals.py), so every process stops using its cached
+    list on its next call, not only the one that made the change.
+    """
+    local_cache = process_local_cache()
+    cache_key = redeemable_policies_cache_key(
+        enterprise_customer_uuid,
+        get_redeemable_policies_version(enterprise_customer_uuid),
+    )
+    policies = local_cache.get(REDEEMABLE_POLICIES_LOCAL_CACHE_NAMESPACE, cache_key)
+    if policies is LOCAL_CACHE_MISS:
+        policies = list(redeemable_policies_for_customer(enterprise_customer_uuid))
+        local_cache.set(REDEEMABLE_POLICIES_LOCAL_CACHE_NAMESPACE, cache_key, policies)
+    return policies
+
+
+def invalidate_redeemable_policies_for_customer(enterprise_customer_uuid):
+    django_cache.set(redeemable_policies_version_cache_key(enterprise_customer_uuid), uuid4().hex, None)
+
+
+def reconcile_policy_spend_snapshots(policy_uuids=None):
+    """
+    Reconciles the ``PolicySpendSnapshot`` of each of the given policies (by default, every active policy)
+    with the subsidy service.  Snapshots found to be off by more than
+    ``settings.POLICY_SPEND_SNAPSHOT_DRIFT_WARNING_THRESHOLD`` USD cents are logged as warnings.
+
+    Returns:
+        dict: The number of policies which were reconciled, which drifted beyond the threshold,
+        and which failed to reconcile.
+    """
+    policies = SubsidyAccessPolicy.objects.filter(active=True)
+    if policy_uuids is not None:
+        policies = SubsidyAccessPolicy.objects.filter(uuid__in=policy_uuids)
+
+    results = {'reconciled': 0, 'drifted': 0, 'failed': 0}
+    max_drift = 0
+    for policy in policies:
+        try:
+            snapshot = PolicySpendSnapshot.reconcile(policy)
+        except RequestException as exc:
+            logger.exception(f'[POLICY SPEND SNAPSHOT] Failed to reconcile policy {policy.uuid}: {exc}')
+            results['failed'] += 1
+            continue
+
+        results['reconciled'] += 1
+        drift = abs(snapshot.redeemed_drift)
+        max_drift = max(max_drift, drift)
+        if drift > settings.POLICY_SPEND_SNAPSHOT_DRIFT_WARNING_THRESHOLD:
+            results['drifted'] += 1
+            logger.warning(
+                f'[POLICY SPEND SNAPSHOT] Policy {policy.uuid} drifted by {snapshot.redeemed_drift} redeemed '
+                f'USD cents since it was last reconciled'
+            )
+
+    for name, count in results.items():
+        set_custom_attribute(f'policy_spend_snapshots_{name}', count)
+    set_custom_attribute('policy_spend_snapshots_max_drift', max_drift)
+    logger.info(f'[POLICY SPEND SNAPSHOT] Reconciliation results: {results}, max drift: {max_drift} USD cents')
+    return results
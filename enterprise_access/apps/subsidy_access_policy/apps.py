@@ -6,3 +6,9 @@ from django.apps import AppConfig
 class SubsidyAccessPolicyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'enterprise_access.apps.subsidy_access_policy'
+
+    def ready(self):
+        super().ready()
+
+        # pylint: disable=unused-import, import-outside-toplevel
+        import enterprise_access.apps.subsidy_access_policy.signals
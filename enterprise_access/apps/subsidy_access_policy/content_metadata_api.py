@@ -4,16 +4,20 @@ for use in the domain of SubsidyAccessPolicies.
 """
 import logging
 from decimal import Decimal
+from functools import partial
 
 import requests
 from django.conf import settings
+from django.core.cache import cache as django_cache
 from django.utils.dateparse import parse_datetime
-from edx_django_utils.cache import TieredCache
-from requests.exceptions import HTTPError
+from edx_django_utils.cache import RequestCache
+from requests.exceptions import RequestException
 
-from enterprise_access.cache_utils import versioned_cache_key
+from enterprise_access.cache_utils import refresh_many_with_single_flight, versioned_cache_key
+from enterprise_access.concurrency_utils import FanOutResult, fan_out
 
 from ..api_client.enterprise_catalog_client import EnterpriseCatalogApiClient
+from ..content_metadata.api import records_by_requested_content_key, url_safe_content_key_chunks
 from .exceptions import ContentPriceNullException
 from .utils import get_versioned_subsidy_client
 
@@ -22,6 +26,10 @@ logger = logging.getLogger(__name__)
 DEFAULT_CACHE_TIMEOUT = getattr(settings, 'CONTENT_METADATA_CACHE_TIMEOUT', 60 * 5)
 
 
+def content_metadata_cache_key(enterprise_customer_uuid, content_key):
+    return versioned_cache_key('get_subsidy_content_metadata', enterprise_customer_uuid, content_key)
+
+
 def get_and_cache_content_metadata(enterprise_customer_uuid, content_key, timeout=None):
     """
     Returns the metadata for some customer and content key,
@@ -31,28 +39,147 @@ def get_and_cache_content_metadata(enterprise_customer_uuid, content_key, timeou
     Raises: An HTTPError if there's a problem getting the content metadata
       via the subsidy service.
     """
-    cache_key = versioned_cache_key('get_subsidy_content_metadata', enterprise_customer_uuid, content_key)
-    cached_response = TieredCache.get_cached_response(cache_key)
-    if cached_response.is_found:
+    outcome = get_and_cache_content_metadata_for_keys(enterprise_customer_uuid, [content_key], timeout)
+    if content_key in outcome.errors:
+        raise outcome.errors[content_key]
+    return outcome.results[content_key]
+
+
+def get_and_cache_content_metadata_for_keys(enterprise_customer_uuid, content_keys, timeout=None):
+    """
+    Returns the metadata for each of the given content keys for the given customer,
+    as told by the enterprise-subsidy service.  Each value is cached in the same tiers, and under the
+    same keys, as ``get_and_cache_content_metadata()``, but every tier is read and written in bulk.
+
+    The subsidy service has no bulk content metadata endpoint, so misses are fetched concurrently,
+    via ``fan_out()``.  One key failing doesn't fail the others: it's up to callers to decide what to do
+    about keys that errored, or whose fetch didn't complete before the fan-out deadline.
+
+    Returns: A ``FanOutResult`` whose ``results`` map content keys to their metadata, whose ``errors`` map
+      content keys to the exception raised while fetching their metadata, and whose ``pending`` list holds
+      content keys that weren't fetched in time.  Metadata that was successfully fetched is cached.
+    """
+    content_keys = list(dict.fromkeys(content_keys))
+    cache_keys_by_content_key = {
+        content_key: content_metadata_cache_key(enterprise_customer_uuid, content_key)
+        for content_key in content_keys
+    }
+    results = _get_many_from_tiered_cache(cache_keys_by_content_key)
+    for content_key in results:
         logger.info(f'cache hit for customer {enterprise_customer_uuid} and content {content_key}')
-        return cached_response.value
 
-    client = get_versioned_subsidy_client()
-    try:
-        metadata = client.get_subsidy_content_data(
-            enterprise_customer_uuid,
-            content_key,
-        )
-    except HTTPError as exc:
-        raise exc
+    errors, pending = {}, []
+    keys_to_fetch = [key for key in content_keys if key not in results]
+    if keys_to_fetch:
+        results.update(_refresh_with_single_flight(
+            cache_keys_by_content_key,
+            keys_to_fetch,
+            partial(
+                _fetch_and_cache_content_metadata,
+                enterprise_customer_uuid, cache_keys_by_content_key, timeout, errors, pending,
+            ),
+        ))
+    return FanOutResult(results, errors, pending)
+
+
+def _fetch_subsidy_content_data(enterprise_customer_uuid, content_key):
+    """
+    Helper to fetch content metadata for a single key from the subsidy service, with a client of its own.
+    """
+    return get_versioned_subsidy_client().get_subsidy_content_data(enterprise_customer_uuid, content_key)
+
+
+def _fetch_and_cache_content_metadata(
+    enterprise_customer_uuid, cache_keys_by_content_key, timeout, errors, pending, content_keys,
+):
+    """
+    Helper to concurrently fetch, and then cache, content metadata for the given keys from the subsidy service.
+    Returns a dict of the metadata that was fetched, and adds the keys that failed, or missed the fan-out
+    deadline, to the given ``errors`` dict and ``pending`` list.
+    """
+    outcome = fan_out({
+        content_key: partial(_fetch_subsidy_content_data, enterprise_customer_uuid, content_key)
+        for content_key in content_keys
+    })
+    errors.update(outcome.errors)
+    pending.extend(outcome.pending)
 
     logger.info(
-        'Fetched content metadata for customer %s and content_key %s',
+        'Fetched content metadata for customer %s and content_keys %s',
         enterprise_customer_uuid,
-        content_key,
+        list(outcome.results),
+    )
+    _set_many_in_tiered_cache(
+        {cache_keys_by_content_key[content_key]: metadata for content_key, metadata in outcome.results.items()},
+        timeout or DEFAULT_CACHE_TIMEOUT,
+    )
+    return outcome.results
+
+
+def _refresh_with_single_flight(cache_keys_by_content_key, content_keys, fetch_and_cache):
+    """
+    Helper to fetch the given (missed) content keys via ``refresh_many_with_single_flight()``,
+    so that concurrent requests missing the same keys don't all go upstream for them.
+    ``fetch_and_cache`` takes a list of content keys and returns a dict of content key -> value.
+
+    Returns: A dict mapping each content key to its fetched (or concurrently cached) value.
+    """
+    content_keys_by_cache_key = {cache_key: key for key, cache_key in cache_keys_by_content_key.items()}
+
+    def recheck(cache_keys):
+        return _get_many_from_tiered_cache({cache_key: cache_key for cache_key in cache_keys})
+
+    def refresh(cache_keys):
+        fetched = fetch_and_cache([content_keys_by_cache_key[cache_key] for cache_key in cache_keys])
+        return {cache_keys_by_content_key[key]: value for key, value in fetched.items()}
+
+    refreshed = refresh_many_with_single_flight(
+        [cache_keys_by_content_key[key] for key in content_keys],
+        recheck,
+        refresh,
     )
-    TieredCache.set_all_tiers(cache_key, metadata, timeout or DEFAULT_CACHE_TIMEOUT)
-    return metadata
+    return {content_keys_by_cache_key[cache_key]: value for cache_key, value in refreshed.items()}
+
+
+def _get_many_from_tiered_cache(cache_keys_by_key):
+    """
+    Helper to read many keys out of the same tiers that ``TieredCache`` uses: the request cache first,
+    then a single ``get_many()`` against the django cache for the remainder.  Values found only in
+    the django cache are copied into the request cache.
+
+    Returns: A dict mapping each key whose cache key was found to the cached value.
+    """
+    results = {}
+    tiered_request_cache = RequestCache()
+    for key, cache_key in cache_keys_by_key.items():
+        cached_response = tiered_request_cache.get_cached_response(cache_key)
+        if cached_response.is_found:
+            results[key] = cached_response.value
+
+    keys_to_check = [key for key in cache_keys_by_key if key not in results]
+    if keys_to_check:
+        cached_values = django_cache.get_many([cache_keys_by_key[key] for key in keys_to_check])
+        for key in keys_to_check:
+            cache_key = cache_keys_by_key[key]
+            if cache_key in cached_values:
+                results[key] = cached_values[cache_key]
+                tiered_request_cache.set(cache_key, cached_values[cache_key])
+    return results
+
+
+def _set_many_in_tiered_cache(values_by_cache_key, timeout):
+    """
+    Helper to write many values into both the request cache and, via one ``set_many()``, the django cache.
+    """
+    tiered_request_cache = RequestCache()
+    for cache_key, value in values_by_cache_key.items():
+        tiered_request_cache.set(cache_key, value)
+    if values_by_cache_key:
+        django_cache.set_many(values_by_cache_key, timeout)
+
+
+def catalog_contains_content_cache_key(enterprise_catalog_uuid, content_key):
+    return versioned_cache_key('contains_content_key', enterprise_catalog_uuid, content_key)
 
 
 def get_and_cache_catalog_contains_content(enterprise_catalog_uuid, content_key, timeout=None):
@@ -61,28 +188,109 @@ def get_and_cache_catalog_contains_content(enterprise_catalog_uuid, content_key,
     This value is cached in a ``TieredCache`` (meaning in both the RequestCache,
     _and_ the django cache for the configured expiration period).
     """
-    cache_key = versioned_cache_key('contains_content_key', enterprise_catalog_uuid, content_key)
-    cached_response = TieredCache.get_cached_response(cache_key)
-    if cached_response.is_found:
+    return get_and_cache_catalog_contains_content_keys(enterprise_catalog_uuid, [content_key], timeout)[content_key]
+
+
+def get_and_cache_catalog_contains_content_keys(enterprise_catalog_uuid, content_keys, timeout=None):
+    """
+    Returns a dict mapping each of the given content keys to a boolean indicating
+    if that content is in the given catalog.  Each value is cached in the same tiers, and under
+    the same keys, as ``get_and_cache_catalog_contains_content()``, but every tier is read and
+    written in bulk: the RequestCache first, then one ``get_many()`` against the django cache,
+    then one ``set_many()`` for everything that had to be fetched.
+
+    The enterprise-catalog ``contains_content_items`` endpoint only tells us whether *any*
+    of the requested keys is in the catalog, so inclusion of all misses is first decided, per key,
+    from the catalog's bulk content metadata.  Only keys whose inclusion that leaves unknown
+    fall back to ``contains_content_items`` (see ``_fetch_catalog_contains_content_keys()``).
+
+    Raises: An HTTPError if there's a problem checking catalog inclusion
+      via the enterprise-catalog service.
+    """
+    content_keys = list(dict.fromkeys(content_keys))
+    cache_keys_by_content_key = {
+        content_key: catalog_contains_content_cache_key(enterprise_catalog_uuid, content_key)
+        for content_key in content_keys
+    }
+
+    results = _get_many_from_tiered_cache(cache_keys_by_content_key)
+    for content_key in results:
         logger.info(f'cache hit for catalog {enterprise_catalog_uuid} and content {content_key}')
-        return cached_response.value
 
-    try:
-        result = EnterpriseCatalogApiClient().contains_content_items(
+    keys_to_fetch = [key for key in content_keys if key not in results]
+    if not keys_to_fetch:
+        return results
+
+    def fetch_and_cache(keys):
+        fetched = _fetch_catalog_contains_content_keys(enterprise_catalog_uuid, keys)
+        logger.info(
+            'Fetched catalog inclusion for catalog %s and content_keys %s. Result = %s',
             enterprise_catalog_uuid,
-            [content_key],
+            keys,
+            fetched,
         )
-    except HTTPError as exc:
+        _set_many_in_tiered_cache(
+            {cache_keys_by_content_key[content_key]: result for content_key, result in fetched.items()},
+            timeout or DEFAULT_CACHE_TIMEOUT,
+        )
+        return fetched
+
+    results.update(_refresh_with_single_flight(cache_keys_by_content_key, keys_to_fetch, fetch_and_cache))
+    return results
+
+
+def _fetch_catalog_contains_content_keys(enterprise_catalog_uuid, content_keys):
+    """
+    Helper to determine catalog inclusion of each of the given content keys
+    with as few requests to the enterprise-catalog service as possible.
+
+    A single key is checked with one ``contains_content_items`` request.  Otherwise, the catalog's
+    bulk content metadata endpoint, which only responds with records of content in the catalog,
+    decides inclusion of every key that a record answers for (see ``records_by_requested_content_key()``).
+    Only the remaining keys, whose inclusion is unknown, are checked with ``contains_content_items``:
+    once for all of them, then once per key only if that answer is positive for more than one key.
+    """
+    client = EnterpriseCatalogApiClient()
+    if len(content_keys) == 1:
+        return {content_keys[0]: client.contains_content_items(enterprise_catalog_uuid, content_keys)}
+
+    results = {}
+    for chunk in url_safe_content_key_chunks(content_keys):
+        try:
+            records = client.catalog_content_metadata(enterprise_catalog_uuid, chunk)['results']
+        except RequestException as exc:
+            logger.warning(
+                f'{exc} when fetching content metadata in catalog {enterprise_catalog_uuid} for {chunk}, '
+                'falling back to checking catalog inclusion'
+            )
+            continue
+        results.update(dict.fromkeys(records_by_requested_content_key(records, chunk), True))
+
+    unknown_content_keys = [content_key for content_key in content_keys if content_key not in results]
+    if not unknown_content_keys:
+        return results
+    any_contained = client.contains_content_items(enterprise_catalog_uuid, unknown_content_keys)
+    if not any_contained or len(unknown_content_keys) == 1:
+        results.update(dict.fromkeys(unknown_content_keys, any_contained))
+        return results
+
+    outcome = fan_out({
+        content_key: partial(_fetch_catalog_contains_content_key, enterprise_catalog_uuid, content_key)
+        for content_key in unknown_content_keys
+    })
+    for exc in outcome.errors.values():
         raise exc
+    results.update(outcome.results)
+    for content_key in outcome.pending:
+        results[content_key] = client.contains_content_items(enterprise_catalog_uuid, [content_key])
+    return results
 
-    logger.info(
-        'Fetched catalog inclusion for catalog %s and content_key %s. Result = %s',
-        enterprise_catalog_uuid,
-        content_key,
-        result,
-    )
-    TieredCache.set_all_tiers(cache_key, result, timeout or DEFAULT_CACHE_TIMEOUT)
-    return result
+
+def _fetch_catalog_contains_content_key(enterprise_catalog_uuid, content_key):
+    """
+    Helper to check catalog inclusion of a single content key, with a client of its own.
+    """
+    return EnterpriseCatalogApiClient().contains_content_items(enterprise_catalog_uuid, [content_key])
 
 
 def get_list_price_for_content(enterprise_customer_uuid, content_key, content_metadata=None):
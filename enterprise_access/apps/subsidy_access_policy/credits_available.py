@@ -0,0 +1,70 @@
+"""
+Bulk loading of the learner content assignments that the credits_available endpoint displays,
+for many assignable policies at once.
+"""
+from collections import defaultdict, namedtuple
+
+from enterprise_access.apps.content_assignments import api as assignments_api
+from enterprise_access.apps.content_assignments.content_metadata_api import get_content_metadata_for_assignments
+
+PolicyAssignments = namedtuple('PolicyAssignments', ['assignments', 'content_metadata'])
+PolicyAssignments.__doc__ = """
+The assignments of a single policy, as loaded by ``LearnerAssignmentsLoader``.
+
+assignments: list of the learner's unacknowledged LearnerContentAssignment records, with their actions prefetched.
+content_metadata: dict mapping the content key of each assignment to its content metadata, or None.
+"""
+
+
+class LearnerAssignmentsLoader:
+    """
+    Loads the unacknowledged ``PolicyAssignments`` of one learner for many policies at once.
+
+    Rather than each assignable policy querying its own assignments, checking acknowledgement
+    action by action, and fetching content metadata from its catalog, ``load()``:
+
+    * fetches the learner's unacknowledged assignments across every policy in one query,
+      with acknowledgement computed in SQL,
+    * prefetches the actions of all of those assignments in one more query,
+    * fetches content metadata once per distinct catalog.
+    """
+
+    def __init__(self, policies, lms_user_id):
+        self.policies = [policy for policy in policies if policy.is_assignable and policy.assignment_configuration_id]
+        self.lms_user_id = lms_user_id
+
+    def load(self):
+        """
+        Returns a dict mapping policy uuid -> ``PolicyAssignments``, for every assignable policy.
+        """
+        policies_by_configuration_uuid = {policy.assignment_configuration_id: policy for policy in self.policies}
+        if not policies_by_configuration_uuid:
+            return {}
+
+        assignments = assignments_api.get_unacknowledged_assignments_for_learner(
+            list(policies_by_configuration_uuid),
+            self.lms_user_id,
+        ).prefetch_related('actions')
+
+        assignments_by_policy_uuid = defaultdict(list)
+        assignments_by_catalog_uuid = defaultdict(list)
+        for assignment in assignments:
+            policy = policies_by_configuration_uuid[assignment.assignment_configuration_id]
+            # Share the policy's already-loaded configuration, so that serializing the assignment
+            # (e.g. its earliest possible expiration) doesn't query for it again.
+            assignment.assignment_configuration = policy.assignment_configuration
+            assignments_by_policy_uuid[policy.uuid].append(assignment)
+            assignments_by_catalog_uuid[policy.catalog_uuid].append(assignment)
+
+        content_metadata_by_catalog_uuid = {
+            catalog_uuid: get_content_metadata_for_assignments(catalog_uuid, catalog_assignments)
+            for catalog_uuid, catalog_assignments in assignments_by_catalog_uuid.items()
+        }
+
+        return {
+            policy.uuid: PolicyAssignments(
+                assignments=assignments_by_policy_uuid[policy.uuid],
+                content_metadata=content_metadata_by_catalog_uuid.get(policy.catalog_uuid, {}),
+            )
+            for policy in self.policies
+        }
@@ -9,7 +9,7 @@ from edx_django_utils.cache import TieredCache
 from requests.exceptions import HTTPError
 
 from enterprise_access.apps.api_client.lms_client import LmsApiClient
-from enterprise_access.cache_utils import versioned_cache_key
+from enterprise_access.cache_utils import refresh_with_single_flight, versioned_cache_key
 
 logger = logging.getLogger(__name__)
 
@@ -34,19 +34,22 @@ def get_and_cache_enterprise_learner_record(
         logger.info(f'Cache hit for customer {enterprise_customer_uuid} and learner id {learner_id}')
         return cached_response.value
 
-    lms_client = LmsApiClient()
-    try:
-        enterprise_learner_record = lms_client.get_enterprise_user(
-            enterprise_customer_uuid=enterprise_customer_uuid,
-            learner_id=learner_id
+    def fetch_and_cache():
+        lms_client = LmsApiClient()
+        try:
+            enterprise_learner_record = lms_client.get_enterprise_user(
+                enterprise_customer_uuid=enterprise_customer_uuid,
+                learner_id=learner_id
+            )
+        except HTTPError as exc:
+            raise exc
+
+        logger.info(
+            'Fetched enterprise customer learner record for customer %s and learner_id %s',
+            enterprise_customer_uuid,
+            learner_id
         )
-    except HTTPError as exc:
-        raise exc
-
-    logger.info(
-        'Fetched enterprise customer learner record for customer %s and learner_id %s',
-        enterprise_customer_uuid,
-        learner_id
-    )
-    TieredCache.set_all_tiers(cache_key, enterprise_learner_record, timeout)
-    return enterprise_learner_record
+        TieredCache.set_all_tiers(cache_key, enterprise_learner_record, timeout)
+        return enterprise_learner_record
+
+    return refresh_with_single_flight(cache_key, fetch_and_cache)
@@ -30,6 +30,13 @@ class SubsidyAccessPolicyLockAttemptFailed(SubsidyAccessPolicyException):
     """
 
 
+class SubsidyAccessPolicySpendReservationFailed(SubsidyAccessPolicyLockAttemptFailed):
+    """
+    Raised when spend for a redemption could not be reserved against a SubsidyAccessPolicy's
+    spend_limit, because concurrent, in-flight redemptions have reserved what remains of it.
+    """
+
+
 class SubsidyAPIHTTPError(requests.exceptions.HTTPError):
     """
     Exception that distinguishes HTTPErrors that arise from
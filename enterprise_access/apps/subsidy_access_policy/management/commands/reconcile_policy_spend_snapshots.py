@@ -0,0 +1,47 @@
+"""
+Management command to reconcile policy spend snapshots with the subsidy service.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from enterprise_access.apps.subsidy_access_policy.api import reconcile_policy_spend_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Reconcile the ``PolicySpendSnapshot`` of every active policy, or of the given policies,
+    with the subsidy service.
+
+    This command is intended to run from a crontab, more often than ``settings.POLICY_SPEND_SNAPSHOT_MAX_AGE``,
+    since snapshots which weren't reconciled within that window are no longer used to answer spend checks.
+    Snapshots are only used at all once ``settings.POLICY_SPEND_SNAPSHOT_MAX_AGE`` is set, which it isn't
+    by default, so schedule this command before setting it.
+    """
+    help = (
+        'Reconcile policy spend snapshots with the subsidy service'
+    )
+
+    def add_arguments(self, parser):
+        """
+        Entry point to add arguments.
+        """
+        parser.add_argument(
+            '--policy-uuid',
+            action='append',
+            dest='policy_uuids',
+            default=None,
+            help='Only reconcile the snapshot of this policy. May be given multiple times.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Reconciles policy spend snapshots, and reports how many were reconciled, drifted, or failed.
+        """
+        results = reconcile_policy_spend_snapshots(options['policy_uuids'])
+        self.stdout.write(
+            f"Reconciled {results['reconciled']} policy spend snapshots, "
+            f"{results['drifted']} of which had drifted, {results['failed']} failed."
+        )
@@ -0,0 +1,40 @@
+"""
+Tests for `reconcile_policy_spend_snapshots` management command.
+"""
+from io import StringIO
+from unittest import TestCase, mock
+from uuid import uuid4
+
+from django.core.management import call_command
+
+COMMAND_PATH = 'enterprise_access.apps.subsidy_access_policy.management.commands.reconcile_policy_spend_snapshots'
+
+
+class TestReconcilePolicySpendSnapshotsCommand(TestCase):
+    """
+    Tests `reconcile_policy_spend_snapshots` management command.
+    """
+
+    @mock.patch(f'{COMMAND_PATH}.reconcile_policy_spend_snapshots')
+    def test_command(self, mock_reconcile):
+        mock_reconcile.return_value = {'reconciled': 3, 'drifted': 1, 'failed': 0}
+        out = StringIO()
+
+        call_command('reconcile_policy_spend_snapshots', stdout=out)
+
+        mock_reconcile.assert_called_once_with(None)
+        self.assertIn('Reconciled 3 policy spend snapshots, 1 of which had drifted, 0 failed.', out.getvalue())
+
+    @mock.patch(f'{COMMAND_PATH}.reconcile_policy_spend_snapshots')
+    def test_command_with_policy_uuids(self, mock_reconcile):
+        mock_reconcile.return_value = {'reconciled': 2, 'drifted': 0, 'failed': 0}
+        policy_uuids = [str(uuid4()), str(uuid4())]
+
+        call_command(
+            'reconcile_policy_spend_snapshots',
+            '--policy-uuid', policy_uuids[0],
+            '--policy-uuid', policy_uuids[1],
+            stdout=StringIO(),
+        )
+
+        mock_reconcile.assert_called_once_with(policy_uuids)
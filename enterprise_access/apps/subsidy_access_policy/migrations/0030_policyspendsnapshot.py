@@ -0,0 +1,45 @@
+# Generated by Django 4.2.20 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subsidy_access_policy', '0029_historicalsubsidyaccesspolicy_learner_credit_request_config_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolicySpendSnapshotReversal',
+            fields=[
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('transaction_uuid', models.UUIDField(help_text='The uuid of the reversed ledger transaction.', primary_key=True, serialize=False)),
+                ('subsidy_access_policy_uuid', models.UUIDField(db_index=True, help_text='The uuid of the SubsidyAccessPolicy which the reversed transaction was redeemed via.')),
+                ('quantity', models.BigIntegerField(help_text='The quantity, in USD cents (<= 0), of the reversed transaction.')),
+            ],
+            options={
+                'get_latest_by': 'modified',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PolicySpendSnapshot',
+            fields=[
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('subsidy_access_policy', models.OneToOneField(help_text='The SubsidyAccessPolicy whose spend this snapshot records.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='spend_snapshot', serialize=False, to='subsidy_access_policy.subsidyaccesspolicy')),
+                ('total_redeemed', models.BigIntegerField(default=0, help_text='Total quantity, in USD cents (<= 0), redeemed via the policy.')),
+                ('reconciled_at', models.DateTimeField(blank=True, help_text='The last time total_redeemed was reconciled with the subsidy service.', null=True)),
+                ('redeemed_drift', models.BigIntegerField(default=0, help_text='How much total_redeemed was off by, in USD cents, when it was last reconciled.')),
+                ('redeemed_increments', models.BigIntegerField(default=0, help_text='Running sum, in USD cents, of the incremental adjustments made to total_redeemed, which tells reconciliation what changed while it fetched live totals.')),
+            ],
+            options={
+                'get_latest_by': 'modified',
+                'abstract': False,
+            },
+        ),
+    ]
@@ -6,24 +6,31 @@ Models for subsidy_access_policy
 # pylint: skip-file
 
 import logging
-import sys
-from contextlib import contextmanager
+import random
+import threading
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from functools import lru_cache
 from uuid import UUID, uuid4
 
 import requests
 from django.conf import settings
 from django.core.cache import cache as django_cache
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
-from edx_django_utils.cache.utils import get_cache_key
+from edx_django_utils.cache.utils import CachedResponse, get_cache_key
+from edx_django_utils.monitoring import increment, set_custom_attribute
 from simple_history.models import HistoricalRecords
 
 from enterprise_access.apps.api_client.lms_client import LmsApiClient
 from enterprise_access.apps.content_assignments import api as assignments_api
 from enterprise_access.apps.content_assignments.constants import LearnerContentAssignmentStateChoices
-from enterprise_access.cache_utils import request_cache, versioned_cache_key
+from enterprise_access.cache_utils import refresh_with_single_flight, request_cache, request_cache_key
 from enterprise_access.utils import format_traceback, is_none, is_not_none, localized_utcnow
 
 from ..content_assignments.models import AssignmentConfiguration
@@ -53,7 +60,9 @@ from .constants import (
 from .content_metadata_api import (
     enroll_by_datetime,
     get_and_cache_catalog_contains_content,
+    get_and_cache_catalog_contains_content_keys,
     get_and_cache_content_metadata,
+    get_and_cache_content_metadata_for_keys,
     get_list_price_for_content,
     make_list_price_dict
 )
@@ -63,13 +72,18 @@ from .exceptions import (
     MissingAssignment,
     PriceValidationError,
     SubsidyAccessPolicyLockAttemptFailed,
+    SubsidyAccessPolicySpendReservationFailed,
     SubsidyAPIHTTPError
 )
 from .subsidy_api import (
     CACHE_MISS,
     get_and_cache_transactions_for_learner,
+    get_learner_redemption_index,
+    get_request_cached_subsidy_can_redeem,
     get_tiered_cache_subsidy_record,
-    set_tiered_cache_subsidy_record
+    invalidate_transactions_for_learner,
+    set_tiered_cache_subsidy_record,
+    subsidy_record_cache_key
 )
 from .utils import ProxyAwareHistoricalRecords, create_idempotency_key_for_transaction, get_versioned_subsidy_client
 
@@ -79,9 +93,84 @@ ALLOW_LATE_ENROLLMENT_KEY = 'allow_late_enrollment'
 
 REQUEST_CACHE_NAMESPACE = 'subsidy_access_policy'
 POLICY_LOCK_RESOURCE_NAME = 'subsidy_access_policy'
+POLICY_SPEND_RESERVATION_RESOURCE_NAME = 'subsidy_access_policy_spend_reservation'
 logger = logging.getLogger(__name__)
 
 
+def spend_snapshot_cache_key(policy_uuid):
+    return request_cache_key('spend_snapshot', policy_uuid)
+
+
+def policy_group_uuids_cache_key(enterprise_customer_uuid):
+    return request_cache_key('group_uuids_by_policy_uuid', enterprise_customer_uuid)
+
+
+def _normalized_uuid(value):
+    """
+    Helper to normalize a uuid, given either as a ``UUID`` or as a string in any format that ``UUID`` accepts.
+    Returns None for values that aren't uuids.
+    """
+    if value is None or isinstance(value, UUID):
+        return value
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_policy_classes_by_type():
+    """
+    Returns a dict mapping each policy_type to its ``SubsidyAccessPolicy`` proxy class.
+    Computed once per process, since proxy classes are only ever defined at import time.
+    """
+    return {policy_class.__name__: policy_class for policy_class in SubsidyAccessPolicy.__subclasses__()}
+
+
+@lru_cache(maxsize=None)
+def _policy_type_field_index(policy_class):
+    return policy_class._meta.fields.index(policy_class._meta.get_field(policy_class.POLICY_FIELD_NAME))
+
+
+class PolicyResolutionFacts(
+    namedtuple('PolicyResolutionFacts', ['policy', 'priority', 'expiration_datetime', 'balance']),
+):
+    """
+    The facts ``SubsidyAccessPolicy.resolve_policy()`` scores a policy by, read from its subsidy record once.
+
+    policy: the SubsidyAccessPolicy these facts describe.
+    priority: int type priority of the policy, lower first (see ``*_POLICY_TYPE_PRIORITY``).
+    expiration_datetime: when the policy's subsidy expires, sooner first.
+    balance: int USD cents remaining in the policy's subsidy, smaller first.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def for_policy(cls, policy):
+        subsidy_record = policy.subsidy_record()
+        return cls(
+            policy=policy,
+            priority=policy.priority,
+            expiration_datetime=subsidy_record.get('expiration_datetime'),
+            balance=int(subsidy_record.get('current_balance') or 0),
+        )
+
+    @property
+    def score(self):
+        """
+        The sort key of these facts; the policy with the lowest score is resolved.
+        """
+        return (self.priority, self.expiration_datetime, self.balance)
+
+    def as_trace_entry(self):
+        return {
+            'policy_uuid': str(self.policy.uuid),
+            'priority': self.priority,
+            'expiration_datetime': str(self.expiration_datetime),
+            'balance': self.balance,
+        }
+
+
 class PolicyManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(policy_type=self.model.__name__)
@@ -322,10 +411,7 @@ class SubsidyAccessPolicy(TimeStampedModel):
         """
         Given a policy_type str, return the appropriate subclass of SubsidyAccessPolicy.
         """
-        for policy_class in SubsidyAccessPolicy.__subclasses__():
-            if policy_type == policy_class.__name__:
-                return policy_class
-        return None
+        return get_policy_classes_by_type().get(policy_type)
 
     @property
     def total_spend_limit_for_all_policies_associated_to_subsidy(self):
@@ -416,12 +502,9 @@ class SubsidyAccessPolicy(TimeStampedModel):
             # get proxy name, either from kwargs or from args
             policy_type = kwargs.get(cls.POLICY_FIELD_NAME)
             if policy_type is None:
-                policy_name_field_index = cls._meta.fields.index(
-                    cls._meta.get_field(cls.POLICY_FIELD_NAME)
-                )
-                policy_type = args[policy_name_field_index]
-            # get proxy class, by name, from current module
-            proxy_class = getattr(sys.modules[__name__], policy_type)
+                policy_type = args[_policy_type_field_index(cls)]
+            # get proxy class, by name, from the registry of policy types
+            proxy_class = get_policy_classes_by_type().get(policy_type, cls)
 
         except Exception:  # pylint: disable=broad-except
             pass
@@ -432,7 +515,7 @@ class SubsidyAccessPolicy(TimeStampedModel):
         """
         Retrieve this policy's corresponding subsidy record
         """
-        cache_key = versioned_cache_key(
+        cache_key = request_cache_key(
             'get_subsidy_record',
             self.enterprise_customer_uuid,
             self.subsidy_uuid,
@@ -460,9 +543,18 @@ class SubsidyAccessPolicy(TimeStampedModel):
         cached_value = get_tiered_cache_subsidy_record(self.subsidy_uuid, *cache_key_args)
         if cached_value is not CACHE_MISS:
             return cached_value
-        record = self.subsidy_record()
-        set_tiered_cache_subsidy_record(record, *cache_key_args)
-        return record
+
+        def fetch_and_cache():
+            record = self.subsidy_record()
+            set_tiered_cache_subsidy_record(record, *cache_key_args)
+            return record
+
+        def recheck():
+            cached_value = get_tiered_cache_subsidy_record(self.subsidy_uuid, *cache_key_args)
+            return CachedResponse(is_found=cached_value is not CACHE_MISS, key=cache_key, value=cached_value)
+
+        cache_key = subsidy_record_cache_key(self.subsidy_uuid, *cache_key_args)
+        return refresh_with_single_flight(cache_key, fetch_and_cache, recheck)
 
     def enterprise_user_record(self, lms_user_id):
         """
@@ -520,9 +612,14 @@ class SubsidyAccessPolicy(TimeStampedModel):
         Returns:
             int: quantity <= 0 of USD Cents.
 
+        Answered from this policy's ``PolicySpendSnapshot`` while it's fresh, otherwise from the Subsidy API.
+
         Raises:
             requests.exceptions.HTTPError if the request to Subsidy API (to fetch aggregates) fails.
         """
+        snapshot = self.spend_snapshot()
+        if snapshot:
+            return snapshot.total_redeemed
         return self.aggregates_for_policy().get('total_quantity') or 0
 
     @property
@@ -548,12 +645,44 @@ class SubsidyAccessPolicy(TimeStampedModel):
             content_key,
         )
 
+    def catalog_contains_content_keys(self, content_keys):
+        """
+        Returns a dict mapping each of the given content_keys to a boolean
+        indicating if it is part of this policy's catalog.
+        """
+        return get_and_cache_catalog_contains_content_keys(
+            self.catalog_uuid,
+            content_keys,
+        )
+
+    def subsidy_can_redeem(self, lms_user_id, content_key):
+        """
+        Returns the enterprise-subsidy ``can_redeem`` payload for the given learner and content.
+        Uses a payload prefetched into the request cache (e.g. by the batch redeemability
+        evaluator) if one exists, otherwise calls the subsidy service directly.
+        """
+        prefetched_payload = get_request_cached_subsidy_can_redeem(self.subsidy_uuid, lms_user_id, content_key)
+        if prefetched_payload is not CACHE_MISS:
+            return prefetched_payload
+        return self.subsidy_client.can_redeem(
+            self.subsidy_uuid,
+            lms_user_id,
+            content_key,
+        )
+
     def get_content_metadata(self, content_key):
         """
         Returns a dict of content metadata for the given key.
         """
         return get_and_cache_content_metadata(self.enterprise_customer_uuid, content_key)
 
+    def get_content_metadata_for_keys(self, content_keys):
+        """
+        Returns a ``FanOutResult`` of the content metadata for each of the given content keys
+        (see ``get_and_cache_content_metadata_for_keys()``).
+        """
+        return get_and_cache_content_metadata_for_keys(self.enterprise_customer_uuid, content_keys)
+
     def get_content_price(self, content_key, content_metadata=None):
         """
         Returns the price for some content key, as told by the enterprise-subsidy service.
@@ -589,21 +718,66 @@ class SubsidyAccessPolicy(TimeStampedModel):
         if not learner_record:
             return False, REASON_LEARNER_NOT_IN_ENTERPRISE
 
-        associated_group_uuids = set(learner_record.get('enterprise_group', []))
+        policy_group_uuids = self.group_uuids()
         # if there are no policy groups, return early
-        if not PolicyGroupAssociation.objects.filter(subsidy_access_policy=self).exists():
+        if not policy_group_uuids:
             return True, None
 
+        # Compare normalized UUIDs, since group uuids from the group service may be formatted differently
+        # (e.g. without hyphens, or upper-cased) than those stored on our associations.
+        associated_group_uuids = {
+            _normalized_uuid(group_uuid) for group_uuid in learner_record.get('enterprise_group', [])
+        }
+        associated_group_uuids.discard(None)
+
         # if no association for this learner's group(s), return false
-        if not PolicyGroupAssociation.objects.filter(
-            subsidy_access_policy=self,
-            enterprise_group_uuid__in=associated_group_uuids,
-        ).exists():
+        if not any(
+            _normalized_uuid(group_uuid) in associated_group_uuids
+            for group_uuid in policy_group_uuids
+        ):
             return False, REASON_LEARNER_NOT_IN_ENTERPRISE_GROUP
 
         # otherwise, return true
         return True, None
 
+    def group_uuids(self):
+        """
+        Returns a tuple of the uuids of the groups associated with this policy, as prefetched along with it,
+        or otherwise as found in the index of group associations that's loaded once per request for all of
+        this policy's customer's policies.
+        """
+        # Group associations loaded along with this policy (see api.redeemable_policies_for_customer()) are used as-is.
+        prefetched_groups = getattr(self, '_prefetched_objects_cache', {}).get('groups')
+        if prefetched_groups is not None:
+            return tuple(association.enterprise_group_uuid for association in prefetched_groups)
+
+        group_uuids_by_policy_uuid = get_group_uuids_by_policy_uuid(self.enterprise_customer_uuid)
+        if str(self.uuid) in group_uuids_by_policy_uuid:
+            return group_uuids_by_policy_uuid[str(self.uuid)]
+        # This policy was created after the index was loaded.
+        return tuple(self.groups.order_by('id').values_list('enterprise_group_uuid', flat=True))
+
+    def spend_snapshot(self):
+        """
+        Returns this policy's ``PolicySpendSnapshot`` if it was reconciled recently enough to answer
+        spend checks from, otherwise None.  The result is cached via ``RequestCache``.
+        """
+        if not settings.POLICY_SPEND_SNAPSHOT_MAX_AGE:
+            return None
+
+        _cache = request_cache(namespace=REQUEST_CACHE_NAMESPACE)
+        cache_key = spend_snapshot_cache_key(self.uuid)
+        cached_response = _cache.get_cached_response(cache_key)
+        if cached_response.is_found:
+            return cached_response.value
+
+        snapshot = PolicySpendSnapshot.objects.filter(subsidy_access_policy_id=self.uuid).first()
+        if snapshot and not snapshot.is_fresh:
+            snapshot = None
+        set_custom_attribute('policy_spend_snapshot_fresh', snapshot is not None)
+        _cache.set(cache_key, snapshot)
+        return snapshot
+
     def aggregates_for_policy(self):
         """
         Returns aggregate transaction data for this policy. The result is cached via ``RequestCache``
@@ -613,7 +787,7 @@ class SubsidyAccessPolicy(TimeStampedModel):
             requests.exceptions.HTTPError if the request to Subsidy API fails.
         """
         _cache = request_cache(namespace=REQUEST_CACHE_NAMESPACE)
-        cache_key = versioned_cache_key('aggregates_for_policy', self.subsidy_uuid, self.uuid)
+        cache_key = request_cache_key('aggregates_for_policy', self.subsidy_uuid, self.uuid)
 
         cached_response = _cache.get_cached_response(cache_key)
         if cached_response.is_found:
@@ -641,16 +815,12 @@ class SubsidyAccessPolicy(TimeStampedModel):
         subsidy_transactions = get_and_cache_transactions_for_learner(
             self.subsidy_uuid, lms_user_id
         )['transactions']
-        policy_transactions = [
-            transaction for transaction in subsidy_transactions
-            if str(transaction['subsidy_access_policy_uuid']) == str(self.uuid)
-        ]
-        policy_aggregates = {
-            'total_quantity': sum(tx['quantity'] for tx in policy_transactions),
-        }
+        redemption_index = get_learner_redemption_index(self.subsidy_uuid, lms_user_id, subsidy_transactions)
         return {
-            'transactions': policy_transactions,
-            'aggregates': policy_aggregates,
+            'transactions': redemption_index.for_policy(self.uuid),
+            'aggregates': {
+                'total_quantity': redemption_index.total_quantity_for_policy(self.uuid),
+            },
         }
 
     def transactions_for_learner_and_content(self, lms_user_id, content_key):
@@ -766,11 +936,7 @@ class SubsidyAccessPolicy(TimeStampedModel):
 
         # We want to wait to do these checks that might require a call
         # to the enterprise-subsidy service until we *know* we'll need the data.
-        subsidy_can_redeem_payload = self.subsidy_client.can_redeem(
-            self.subsidy_uuid,
-            lms_user_id,
-            content_key,
-        )
+        subsidy_can_redeem_payload = self.subsidy_can_redeem(lms_user_id, content_key)
 
         # Refers to a computed property of an EnterpriseSubsidy record
         # that takes into account the start/expiration dates of the subsidy record.
@@ -809,7 +975,7 @@ class SubsidyAccessPolicy(TimeStampedModel):
             return True
 
         # Verify that spend against the policy has not exceeded the spend limit.
-        spent_amount = self.aggregates_for_policy().get('total_quantity') or 0
+        spent_amount = self.total_redeemed
         if spent_amount > 0:
             raise Exception('[SubsidyAccessPolicy.credit_available] Expected a sum of transaction quantities <= 0')
         positive_spent_amount = spent_amount * -1
@@ -944,12 +1110,28 @@ class SubsidyAccessPolicy(TimeStampedModel):
                 requested_price_cents = kwargs.get('requested_price_cents')
                 if requested_price_cents is not None:
                     creation_payload['requested_price_cents'] = requested_price_cents
-                return self.subsidy_client.create_subsidy_transaction(**creation_payload)
+                with self.reserve_spend(content_key, requested_price_cents):
+                    ledger_transaction = self.subsidy_client.create_subsidy_transaction(**creation_payload)
+                self._record_redemption_in_spend_snapshot(ledger_transaction, all_transactions)
+                return ledger_transaction
             except requests.exceptions.HTTPError as exc:
                 raise SubsidyAPIHTTPError('HTTPError occurred in Subsidy API request.') from exc
+            finally:
+                # Even a failed request may have created a transaction, so never trust cached ones after this.
+                invalidate_transactions_for_learner(self.subsidy_uuid, lms_user_id)
         else:
             raise ValueError(f"unknown access method {self.access_method}")
 
+    def _record_redemption_in_spend_snapshot(self, ledger_transaction, all_transactions):
+        """
+        Helper to count a new redemption towards this policy's ``PolicySpendSnapshot``.
+        """
+        # Redeeming is idempotent, so the "new" transaction may be an existing one that's already counted.
+        existing_transaction_uuids = {str(existing.get('uuid')) for existing in all_transactions}
+        if str(ledger_transaction.get('uuid')) in existing_transaction_uuids:
+            return
+        PolicySpendSnapshot.record_redemption(self.uuid, int(ledger_transaction.get('quantity') or 0))
+
     def has_redeemed(self, lms_user_id, content_key):
         """
         Check if any existing transactions are present in the subsidy
@@ -985,38 +1167,121 @@ class SubsidyAccessPolicy(TimeStampedModel):
         cache_key_inputs.update({"content_key": content_key} if content_key else {})
         return get_cache_key(**cache_key_inputs)
 
-    def acquire_lock(self, lms_user_id=None, content_key=None) -> str:
+    def acquire_lock(self, lms_user_id=None, content_key=None, wait_seconds=0) -> str:
         """
         Acquire an exclusive lock on this SubsidyAccessPolicy instance.
 
         Memcached devs recommend using add() for locking instead of get()+set(), which rules out TieredCache which only
         exposes get()+set() from django cache.  See: https://github.com/memcached/memcached/issues/163
 
+        The lock is a lease that expires after ``settings.POLICY_LOCK_LEASE_TIMEOUT`` seconds, unless renewed
+        (see ``renew_lock()``).  If the lock is held by someone else, retries with jittered exponential backoff
+        for up to ``wait_seconds``.  Randomized backoff keeps waiters from retrying in lockstep, and from
+        consistently losing to one another.
+
         Returns:
             str: lock ID if a lock was successfully acquired, None otherwise.
         """
         lock_id = str(uuid4())
-        if django_cache.add(self.lock_resource_key(lms_user_id, content_key), lock_id):
-            return lock_id
-        else:
-            return None
+        lock_key = self.lock_resource_key(lms_user_id, content_key)
+        started_at = time.monotonic()
+        deadline = started_at + wait_seconds
+        failed_attempts = 0
+        while True:
+            if django_cache.add(lock_key, lock_id, settings.POLICY_LOCK_LEASE_TIMEOUT):
+                self._record_lock_wait(started_at, failed_attempts, acquired=True)
+                return lock_id
+            failed_attempts += 1
+            remaining_seconds = deadline - time.monotonic()
+            if remaining_seconds <= 0:
+                self._record_lock_wait(started_at, failed_attempts, acquired=False)
+                return None
+            backoff_seconds = min(
+                settings.POLICY_LOCK_MAX_POLL_INTERVAL,
+                settings.POLICY_LOCK_POLL_INTERVAL * 2 ** (failed_attempts - 1),
+            )
+            time.sleep(min(remaining_seconds, random.uniform(0, backoff_seconds)))
+
+    def _record_lock_wait(self, started_at, failed_attempts, acquired):
+        """
+        Helper to emit monitoring data about how long, and how contended, a lock acquisition was.
+        """
+        wait_ms = int((time.monotonic() - started_at) * 1000)
+        set_custom_attribute('policy_lock_wait_ms', wait_ms)
+        set_custom_attribute('policy_lock_failed_attempts', failed_attempts)
+        if not failed_attempts:
+            return
+        set_custom_attribute('policy_lock_contended_policy_uuid', str(self.uuid))
+        increment('policy_lock_contended')
+        if not acquired:
+            increment('policy_lock_wait_timeouts')
+        logger.info(
+            f'[POLICY LOCK] Contended lock on policy {self.uuid}: acquired={acquired}, '
+            f'failed_attempts={failed_attempts}, wait_ms={wait_ms}'
+        )
 
-    def release_lock(self, lms_user_id=None, content_key=None) -> None:
+    def renew_lock(self, lock_id, lms_user_id=None, content_key=None) -> bool:
+        """
+        Extend the lease of a lock on this SubsidyAccessPolicy instance, if ``lock_id`` still holds it.
+
+        Django's cache API has no compare-and-set, so checking who holds the lock and extending its lease aren't
+        atomic: if our lease expired, and someone else took the lock, right between the two, we'd extend their
+        lease instead.  We accept that risk, since leases are renewed when a third of their timeout has elapsed
+        (see ``_renewing_lock_leases()``), so ours can only expire in between if renewal stalls for longer
+        than the remaining two thirds.  Even then, the other holder's lease only lasts longer than it should.
+
+        Returns:
+            bool: True if the lease was renewed.
+        """
+        lock_key = self.lock_resource_key(lms_user_id, content_key)
+        if django_cache.get(lock_key) != lock_id:
+            return False
+        return django_cache.touch(lock_key, settings.POLICY_LOCK_LEASE_TIMEOUT)
+
+    def release_lock(self, lms_user_id=None, content_key=None, lock_id=None) -> None:
         """
         Release an exclusive lock on this SubsidyAccessPolicy instance.
+        If a ``lock_id`` is given, only release the lock if it's still held by that ID,
+        i.e. if the lease hasn't expired and been taken by someone else in the meantime.
+
+        As with ``renew_lock()``, that check and the release aren't atomic.  We accept the risk of releasing
+        someone else's lock, which requires our lease to expire, and the lock to be taken, right between the two,
+        while the lease is being renewed in the background until just before it's released.
         """
-        django_cache.delete(self.lock_resource_key(lms_user_id, content_key))
+        lock_key = self.lock_resource_key(lms_user_id, content_key)
+        if lock_id and django_cache.get(lock_key) != lock_id:
+            logger.warning(f'[POLICY LOCK] Lock {lock_id} on policy {self.uuid} expired before it was released')
+            return
+        django_cache.delete(lock_key)
 
     @contextmanager
-    def lock(self, lms_user_id=None, content_key=None):
+    def _renewing_lock_leases(self, leases):
         """
-        Context manager for locking this SubsidyAccessPolicy instance.
+        Context manager that keeps renewing the given leases, each a tuple of the ``lock_id``, ``lms_user_id`` and
+        ``content_key`` of a lock on this policy, from a single background thread, so that the locks don't expire
+        during slow work (e.g. subsidy API requests) that they guard.
+        """
+        done = threading.Event()
 
-        Raises:
-            SubsidyAccessPolicyLockAttemptFailed:
-                Raises this if there's another distributed process locking this SubsidyAccessPolicy.
+        def renew_until_done():
+            remaining_leases = list(leases)
+            while remaining_leases and not done.wait(settings.POLICY_LOCK_LEASE_TIMEOUT / 3):
+                remaining_leases = [lease for lease in remaining_leases if self.renew_lock(*lease)]
+
+        renewer = threading.Thread(target=renew_until_done, name='policy-lock-renewal', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            done.set()
+
+    @contextmanager
+    def _held_lock(self, lms_user_id=None, content_key=None, wait_seconds=0):
+        """
+        Context manager that acquires a lock on this policy, releases it on exit, and yields its ``lock_id``.
+        Its lease isn't renewed, see ``_renewing_lock_leases()``.
         """
-        lock_id = self.acquire_lock(lms_user_id, content_key)
+        lock_id = self.acquire_lock(lms_user_id, content_key, wait_seconds=wait_seconds)
         if not lock_id:
             raise SubsidyAccessPolicyLockAttemptFailed(
                 f"Failed to acquire lock on SubsidyAccessPolicy {self} with lms_user_id={lms_user_id}, "
@@ -1025,10 +1290,173 @@ class SubsidyAccessPolicy(TimeStampedModel):
         try:
             yield lock_id
         finally:
-            self.release_lock(lms_user_id, content_key)
+            self.release_lock(lms_user_id, content_key, lock_id=lock_id)
+
+    @contextmanager
+    def lock(self, lms_user_id=None, content_key=None, wait_seconds=0):
+        """
+        Context manager for locking this SubsidyAccessPolicy instance.
+        The lock's lease is renewed for as long as the context is active.
+
+        Args:
+            wait_seconds (float): How long to wait for a lock held by someone else to become available.
+
+        Raises:
+            SubsidyAccessPolicyLockAttemptFailed:
+                Raises this if there's another distributed process locking this SubsidyAccessPolicy.
+        """
+        with self._held_lock(lms_user_id, content_key, wait_seconds=wait_seconds) as lock_id:
+            with self._renewing_lock_leases([(lock_id, lms_user_id, content_key)]):
+                yield lock_id
+
+    @contextmanager
+    def lock_for_redemption(self, lms_user_id, wait_seconds=0):
+        """
+        Context manager for the locks a redemption by ``lms_user_id`` must hold.
+        The leases of all of them are renewed by one thread for as long as the context is active.
+
+        Redemptions by different learners only exclude each other via ``reserve_spend()``, so only this learner
+        is locked within the policy.  Assignable policies are also locked as a whole, like allocation does:
+        redeeming an assignment moves its spend from allocated to redeemed, and allocation has to observe
+        both totals consistently to enforce the ``spend_limit``.
+
+        Raises:
+            SubsidyAccessPolicyLockAttemptFailed:
+                Raises this if another distributed process holds either lock for longer than ``wait_seconds``.
+        """
+        with ExitStack() as stack:
+            leases = []
+            if self.is_assignable:
+                leases.append((stack.enter_context(self._held_lock(wait_seconds=wait_seconds)), None, None))
+            learner_lock_id = stack.enter_context(self._held_lock(lms_user_id=lms_user_id, wait_seconds=wait_seconds))
+            leases.append((learner_lock_id, lms_user_id, None))
+            stack.enter_context(self._renewing_lock_leases(leases))
+            yield learner_lock_id
+
+    def _spend_reservation_stripe_key(self, bucket, stripe) -> str:
+        """
+        Get a string that can be used as a cache key for one of the counters of USD Cents reserved on this
+        policy's spend within the given time ``bucket`` (see ``_spend_reservation_bucket()``).
+        """
+        return get_cache_key(
+            resource=POLICY_SPEND_RESERVATION_RESOURCE_NAME,
+            uuid=self.uuid,
+            bucket=bucket,
+            stripe=stripe,
+        )
+
+    @staticmethod
+    def _spend_reservation_bucket():
+        """
+        Helper to number the current ``settings.POLICY_SPEND_RESERVATION_TIMEOUT``-long window of time,
+        within which reservations are added to the same set of counters.
+        """
+        return int(time.time() // settings.POLICY_SPEND_RESERVATION_TIMEOUT)
+
+    def _take_spend_reservation(self, quantity):
+        """
+        Adds ``quantity`` USD Cents to one of this policy's ``settings.POLICY_SPEND_RESERVATION_STRIPES``
+        reservation counters for the current time bucket, picked at random to spread out contention.
+
+        Returns:
+            str: The cache key of the counter, which releasing the reservation subtracts ``quantity`` from.
+
+        Raises:
+            SubsidyAccessPolicySpendReservationFailed:
+                Raises this if the counter keeps getting evicted before it can be incremented.
+        """
+        stripe = random.randrange(settings.POLICY_SPEND_RESERVATION_STRIPES)
+        stripe_key = self._spend_reservation_stripe_key(self._spend_reservation_bucket(), stripe)
+        for _ in range(2):
+            # The counter outlives every reservation added to it, even on hosts whose clocks are a bucket apart.
+            django_cache.add(stripe_key, 0, settings.POLICY_SPEND_RESERVATION_TIMEOUT * 3)
+            try:
+                django_cache.incr(stripe_key, quantity)
+                return stripe_key
+            except ValueError:
+                # The counter was evicted between add() and incr(), so create it again.
+                continue
+        raise SubsidyAccessPolicySpendReservationFailed(
+            f"Failed to reserve {quantity} USD Cents on SubsidyAccessPolicy {self}, "
+            f"reservation counter {stripe_key} could not be incremented."
+        )
+
+    @staticmethod
+    def _release_spend_reservation(stripe_key, quantity):
+        """
+        Subtracts a reservation of ``quantity`` USD Cents from the counter it was added to.
+        A counter that has already expired is not created again.
+        """
+        try:
+            django_cache.decr(stripe_key, quantity)
+        except ValueError:
+            logger.info(f'Spend reservation counter {stripe_key} expired before {quantity} could be released.')
+
+    def total_reserved_spend(self) -> int:
+        """
+        Total USD Cents of this policy's spend that is reserved by in-flight redemptions.
+
+        Reservations are at most one bucket old, or one bucket ahead on hosts with clocks that are, so only
+        the counters of the previous, current, and next buckets are read, in a single ``get_many()`` of
+        ``3 * settings.POLICY_SPEND_RESERVATION_STRIPES`` keys, regardless of how many redemptions are in flight.
+        """
+        bucket = self._spend_reservation_bucket()
+        stripe_keys = [
+            self._spend_reservation_stripe_key(other_bucket, stripe)
+            for other_bucket in (bucket - 1, bucket, bucket + 1)
+            for stripe in range(settings.POLICY_SPEND_RESERVATION_STRIPES)
+        ]
+        # Some cache backends don't let counters go below zero, so clamp each one in case others can.
+        return sum(max(reserved, 0) for reserved in django_cache.get_many(stripe_keys).values())
+
+    @contextmanager
+    def reserve_spend(self, content_key, quantity=None):
+        """
+        Context manager for reserving spend against this policy's ``spend_limit`` while a redemption is in flight.
+        Together with per-learner locks, this replaces the need to lock the whole policy during redemption:
+        each concurrent redemption checks its reservation, plus every other in-flight reservation, against
+        spend that is already committed, and refuses to proceed if that would exceed the spend_limit.
+
+        Each reservation is added to one of a fixed number of counters, and subtracted from it on exit.
+        Counters expire ``3 * settings.POLICY_SPEND_RESERVATION_TIMEOUT`` seconds after they are created,
+        so that reservations leaked by a crashed process don't block redemption indefinitely.
+
+        Args:
+            content_key (str): The content being redeemed.
+            quantity (int): The (positive) USD Cents to reserve. Defaults to the content's price.
+
+        Raises:
+            SubsidyAccessPolicySpendReservationFailed:
+                Raises this if the reservation would exceed this policy's spend_limit.
+        """
+        if self.spend_limit is None:
+            yield 0
+            return
+
+        if quantity is None:
+            quantity = self.get_content_price(content_key)
+
+        stripe_key = self._take_spend_reservation(quantity)
+        try:
+            total_reserved = self.total_reserved_spend()
+            # Re-read committed spend *after* reserving, so that any redemption that released its reservation
+            # before we took ours is already reflected here.
+            request_cache(namespace=REQUEST_CACHE_NAMESPACE).delete(
+                request_cache_key('aggregates_for_policy', self.subsidy_uuid, self.uuid),
+            )
+            # This is the last line of defense against overspending, so don't trust the spend snapshot here.
+            live_total_redeemed = self.aggregates_for_policy().get('total_quantity') or 0
+            if self.content_would_exceed_limit(live_total_redeemed, self.spend_limit, total_reserved):
+                raise SubsidyAccessPolicySpendReservationFailed(
+                    f"Failed to reserve {quantity} USD Cents on SubsidyAccessPolicy {self} for "
+                    f"content_key={content_key}, {total_reserved} USD Cents are reserved by in-flight redemptions."
+                )
+            yield total_reserved
+        finally:
+            self._release_spend_reservation(stripe_key, quantity)
 
     @classmethod
-    def resolve_policy(cls, redeemable_policies):
+    def resolve_policy(cls, redeemable_policies, policy_facts=None):
         """
         Select one out of multiple policies which have already been deemed redeemable.
 
@@ -1045,28 +1473,56 @@ class SubsidyAccessPolicy(TimeStampedModel):
 
         Args:
             redeemable_policies (list of SubsidyAccessPolicy): A list of subsidy access policies to select one from.
+            policy_facts (dict): Optional mapping of policy uuid -> ``PolicyResolutionFacts`` to read from,
+              and fill in for policies missing from it.
 
         Returns:
            SubsidyAccessPolicy: one policy selected from the input list.
         """
+        resolved_policy, _ = cls.resolve_policy_with_trace(redeemable_policies, policy_facts=policy_facts)
+        return resolved_policy
+
+    @classmethod
+    def resolve_policy_with_trace(cls, redeemable_policies, policy_facts=None):
+        """
+        Same as ``resolve_policy()``, but also returns a trace of how the policy was resolved, for debugging.
+
+        Each policy's ``PolicyResolutionFacts`` are computed at most once, and only when there are
+        multiple policies to choose from, so resolution itself never looks a subsidy record up more than once.
+
+        Returns:
+            tuple of (SubsidyAccessPolicy, dict): The selected policy, and a trace containing
+            ``resolved_by`` (why the policy was selected) and ``ranked`` (the facts of every
+            candidate policy, in the order they were ranked).
+        """
         # gate for experimental functionality to resolve multiple policies
         if not getattr(settings, 'MULTI_POLICY_RESOLUTION_ENABLED', False):
             logger.info('resolve_policy MULTI_POLICY_RESOLUTION_ENABLED disabled')
-            return redeemable_policies[0]
+            return redeemable_policies[0], {'resolved_by': 'multi_policy_resolution_disabled', 'ranked': []}
 
         if len(redeemable_policies) == 1:
-            return redeemable_policies[0]
+            return redeemable_policies[0], {'resolved_by': 'single_policy', 'ranked': []}
+
+        if policy_facts is None:
+            policy_facts = {}
+        for policy in redeemable_policies:
+            if policy.uuid not in policy_facts:
+                policy_facts[policy.uuid] = PolicyResolutionFacts.for_policy(policy)
 
         # resolve policies by:
         # - priority (of type)
         # - expiration, sooner to expire first
         # - balance, lower balance first
-        sorted_policies = sorted(
-            redeemable_policies,
-            key=lambda p: (p.priority, p.subsidy_expiration_datetime, p.subsidy_balance()),
+        ranked_facts = sorted(
+            (policy_facts[policy.uuid] for policy in redeemable_policies),
+            key=lambda facts: facts.score,
         )
-        logger.info('resolve_policy multiple policies resolved')
-        return sorted_policies[0]
+        trace = {
+            'resolved_by': 'score',
+            'ranked': [facts.as_trace_entry() for facts in ranked_facts],
+        }
+        logger.info(f'resolve_policy multiple policies resolved: {trace}')
+        return ranked_facts[0].policy, trace
 
     def create_deposit(
         self,
@@ -1348,9 +1804,10 @@ class AssignedLearnerCreditAccessPolicy(AssignedCreditPolicyMixin, SubsidyAccess
         Returns:
             int: Negative USD cents representing the total amount of currently allocated assignments.
         """
-        return assignments_api.get_allocated_quantity_for_configuration(
-            self.assignment_configuration,
-        )
+        # Look the configuration up by id, so that policies listed in bulk don't each fetch their configuration.
+        return assignments_api.get_allocated_quantities_for_configurations(
+            [self.assignment_configuration_id],
+        ).get(self.assignment_configuration_id, 0)
 
     @property
     def spend_available(self):
@@ -1369,7 +1826,7 @@ class AssignedLearnerCreditAccessPolicy(AssignedCreditPolicyMixin, SubsidyAccess
         Helper to get a ``LearnerContentAssignment`` for the given learner/content identifier pair
         in this policy's assignment configuration.  Returns None if no such pair is assigned.
         """
-        cache_key = versioned_cache_key('get_assignment', self.uuid, lms_user_id, content_key)
+        cache_key = request_cache_key('get_assignment', self.uuid, lms_user_id, content_key)
         cached_response = request_cache(namespace=REQUEST_CACHE_NAMESPACE).get_cached_response(cache_key)
         if cached_response.is_found:
             logger.info(
@@ -1464,16 +1921,10 @@ class AssignedLearnerCreditAccessPolicy(AssignedCreditPolicyMixin, SubsidyAccess
             return False
 
         # Validate whether learner has assignments available for this policy.
-        assignments = assignments_api.get_assignments_for_configuration(
-            self.assignment_configuration,
-            lms_user_id=lms_user_id,
-        )
-        unacknowledged_assignments_uuids = [
-            assignment.uuid
-            for assignment in assignments
-            if not assignment.learner_acknowledged
-        ]
-        return len(unacknowledged_assignments_uuids) > 0
+        return assignments_api.get_unacknowledged_assignments_for_learner(
+            [self.assignment_configuration_id],
+            lms_user_id,
+        ).exists()
 
     def redeem(self, lms_user_id, content_key, all_transactions, metadata=None, **kwargs):
         """
@@ -1575,15 +2026,17 @@ class AssignedLearnerCreditAccessPolicy(AssignedCreditPolicyMixin, SubsidyAccess
         # Determine total cost, in cents, of content to potentially allocated
         positive_total_price_cents = number_of_learners * content_price_cents
 
-        # Determine total amount, in cents, already transacted via this policy.
-        # This is a number <= 0
-        spent_amount_cents = self.aggregates_for_policy().get('total_quantity') or 0
-
         # Determine total amount, in cents, of assignments already
         # allocated via this policy. This is a number <= 0
+        # Redemption moves spend from allocated to redeemed (committing the transaction before accepting the
+        # assignment), so reading allocated first can't miss spend in flight, even without the policy lock.
         total_allocated_assignments_cents = assignments_api.get_allocated_quantity_for_configuration(
             self.assignment_configuration,
         )
+
+        # Determine total amount, in cents, already transacted via this policy.
+        # This is a number <= 0
+        spent_amount_cents = self.total_redeemed
         total_allocated_and_spent_cents = spent_amount_cents + total_allocated_assignments_cents
 
         # Use all of these pieces to ensure that the assignments to potentially
@@ -1669,6 +2122,199 @@ class PolicyGroupAssociation(TimeStampedModel):
     )
 
 
+class PolicySpendSnapshot(TimeStampedModel):
+    """
+    A locally persisted snapshot of a policy's redeemed total, so that policy-level spend checks
+    can be answered from a single row, instead of asking the subsidy service for aggregates
+    on every request.  Allocated totals are always computed from assignments, which are local already.
+
+    The total is adjusted incrementally by this service's own redemptions and reversals,
+    and periodically reconciled with the subsidy service (see ``reconcile()``).
+    Writes made anywhere else are only picked up by reconciliation, so a snapshot is only trusted
+    for ``settings.POLICY_SPEND_SNAPSHOT_MAX_AGE`` seconds after it was last reconciled.
+
+    .. no_pii: This model has no PII
+    """
+    subsidy_access_policy = models.OneToOneField(
+        SubsidyAccessPolicy,
+        primary_key=True,
+        related_name='spend_snapshot',
+        on_delete=models.CASCADE,
+        help_text='The SubsidyAccessPolicy whose spend this snapshot records.',
+    )
+    total_redeemed = models.BigIntegerField(
+        default=0,
+        help_text='Total quantity, in USD cents (<= 0), redeemed via the policy.',
+    )
+    reconciled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='The last time total_redeemed was reconciled with the subsidy service.',
+    )
+    redeemed_drift = models.BigIntegerField(
+        default=0,
+        help_text='How much total_redeemed was off by, in USD cents, when it was last reconciled.',
+    )
+    redeemed_increments = models.BigIntegerField(
+        default=0,
+        help_text=(
+            'Running sum, in USD cents, of the incremental adjustments made to total_redeemed, '
+            'which tells reconciliation what changed while it fetched live totals.'
+        ),
+    )
+
+    def __str__(self):
+        return (
+            f'<{self.__class__.__name__} policy={self.subsidy_access_policy_id}, '
+            f'total_redeemed={self.total_redeemed}, reconciled_at={self.reconciled_at}>'
+        )
+
+    @property
+    def is_fresh(self):
+        """
+        Whether this snapshot was reconciled recently enough to answer spend checks from.
+        """
+        max_age = settings.POLICY_SPEND_SNAPSHOT_MAX_AGE
+        if not max_age or not self.reconciled_at:
+            return False
+        return timezone.now() - self.reconciled_at < timedelta(seconds=max_age)
+
+    @staticmethod
+    def _clear_request_cached_snapshot(policy_uuid):
+        request_cache(namespace=REQUEST_CACHE_NAMESPACE).delete(spend_snapshot_cache_key(policy_uuid))
+
+    @classmethod
+    def record_redemption(cls, policy_uuid, quantity):
+        """
+        Atomically adds ``quantity`` USD cents (negative for redemptions, positive for reversals)
+        to the given policy's redeemed total.  A no-op for policies which were never reconciled.
+        """
+        cls.objects.filter(subsidy_access_policy_id=policy_uuid).update(
+            total_redeemed=F('total_redeemed') + quantity,
+            redeemed_increments=F('redeemed_increments') + quantity,
+            modified=timezone.now(),
+        )
+        cls._clear_request_cached_snapshot(policy_uuid)
+
+    @classmethod
+    def record_reversal(cls, policy_uuid, transaction_uuid, quantity):
+        """
+        Gives the (negative) ``quantity`` of the reversed transaction back to the given policy's redeemed total,
+        at most once per transaction, even if the reversal is reported more than once.
+
+        Returns:
+            bool: False if the reversal of this transaction was already recorded.
+        """
+        with transaction.atomic():
+            _, created = PolicySpendSnapshotReversal.objects.get_or_create(
+                transaction_uuid=transaction_uuid,
+                defaults={'subsidy_access_policy_uuid': policy_uuid, 'quantity': quantity},
+            )
+            if created:
+                cls.record_redemption(policy_uuid, -quantity)
+        return created
+
+    @classmethod
+    def reconcile(cls, policy):
+        """
+        Replaces the given policy's snapshot total with one computed from the subsidy service,
+        recording how far off the snapshot was.
+
+        The live redeemed total is fetched from the subsidy service before the snapshot row is locked,
+        so that the lock is never held across a network request.  Incremental updates made while it was
+        being fetched (see ``redeemed_increments``) are then applied on top of it, rather than lost.
+        At worst they're counted twice, which overstates spend until the next reconciliation.
+
+        Returns:
+            The reconciled ``PolicySpendSnapshot``.
+
+        Raises:
+            requests.exceptions.RequestException if the request to Subsidy API (to fetch aggregates) fails.
+        """
+        increments_before_fetch = cls.objects.filter(subsidy_access_policy=policy).values_list(
+            'redeemed_increments', flat=True,
+        ).first() or 0
+
+        # Never compute live totals from values memoized earlier, e.g. by a previous task in this worker.
+        request_cache(namespace=REQUEST_CACHE_NAMESPACE).delete(
+            request_cache_key('aggregates_for_policy', policy.subsidy_uuid, policy.uuid),
+        )
+        fetched_total_redeemed = policy.aggregates_for_policy().get('total_quantity') or 0
+
+        with transaction.atomic():
+            snapshot, created = cls.objects.select_for_update().get_or_create(subsidy_access_policy=policy)
+
+            live_total_redeemed = fetched_total_redeemed + snapshot.redeemed_increments - increments_before_fetch
+            if not created:
+                snapshot.redeemed_drift = live_total_redeemed - snapshot.total_redeemed
+            snapshot.total_redeemed = live_total_redeemed
+            snapshot.reconciled_at = timezone.now()
+            snapshot.save()
+
+        cls._clear_request_cached_snapshot(policy.uuid)
+        return snapshot
+
+
+class PolicySpendSnapshotReversal(TimeStampedModel):
+    """
+    Records each ledger transaction whose reversal was given back to its policy's ``PolicySpendSnapshot``,
+    so that reversal events delivered more than once are only counted once.
+
+    .. no_pii: This model has no PII
+    """
+    transaction_uuid = models.UUIDField(
+        primary_key=True,
+        help_text='The uuid of the reversed ledger transaction.',
+    )
+    subsidy_access_policy_uuid = models.UUIDField(
+        db_index=True,
+        help_text='The uuid of the SubsidyAccessPolicy which the reversed transaction was redeemed via.',
+    )
+    quantity = models.BigIntegerField(
+        help_text='The quantity, in USD cents (<= 0), of the reversed transaction.',
+    )
+
+    def __str__(self):
+        return (
+            f'<{self.__class__.__name__} transaction={self.transaction_uuid}, '
+            f'policy={self.subsidy_access_policy_uuid}, quantity={self.quantity}>'
+        )
+
+
+def get_group_uuids_by_policy_uuid(enterprise_customer_uuid):
+    """
+    Returns a dict mapping the uuid (as a str) of each of the given customer's policies to a tuple of the uuids
+    of the groups associated with that policy.  The associations of all of the customer's policies are loaded
+    in one query, and cached via ``RequestCache`` until any of them change (see signals.py).
+    """
+    _cache = request_cache(namespace=REQUEST_CACHE_NAMESPACE)
+    cache_key = policy_group_uuids_cache_key(enterprise_customer_uuid)
+    cached_response = _cache.get_cached_response(cache_key)
+    if cached_response.is_found:
+        return cached_response.value
+
+    rows = SubsidyAccessPolicy.objects.filter(
+        enterprise_customer_uuid=enterprise_customer_uuid,
+    ).values_list(
+        'uuid', 'groups__id', 'groups__enterprise_group_uuid',
+    ).order_by('groups__id')
+    group_uuids_by_policy_uuid = {}
+    for policy_uuid, association_id, group_uuid in rows:
+        group_uuids = group_uuids_by_policy_uuid.setdefault(str(policy_uuid), [])
+        # Policies without any group associations still get a row, with a null association.
+        if association_id is not None:
+            group_uuids.append(group_uuid)
+    group_uuids_by_policy_uuid = {
+        policy_uuid: tuple(group_uuids) for policy_uuid, group_uuids in group_uuids_by_policy_uuid.items()
+    }
+    _cache.set(cache_key, group_uuids_by_policy_uuid)
+    return group_uuids_by_policy_uuid
+
+
+def clear_request_cached_group_uuids(enterprise_customer_uuid):
+    request_cache(namespace=REQUEST_CACHE_NAMESPACE).delete(policy_group_uuids_cache_key(enterprise_customer_uuid))
+
+
 class ForcedPolicyRedemption(TimeStampedModel):
     """
     There is frequently a need to force through a redemption
@@ -1806,7 +2452,8 @@ class ForcedPolicyRedemption(TimeStampedModel):
             self.create_assignment()
 
         try:
-            with self.subsidy_access_policy.lock():
+            # Lock the whole policy, as well as the learner, since ordinary redemptions only lock the latter.
+            with self.subsidy_access_policy.lock(), self.subsidy_access_policy.lock(lms_user_id=self.lms_user_id):
                 can_redeem, reason, existing_transactions = self.subsidy_access_policy.can_redeem(
                     self.lms_user_id, self.course_run_key, skip_enrollment_deadline_check=True,
                 )
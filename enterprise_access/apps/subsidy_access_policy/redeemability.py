@@ -0,0 +1,223 @@
+"""
+Batch evaluation of redeemability across many policies and many content keys
+for a single learner.
+"""
+import logging
+from collections import defaultdict
+from functools import partial
+
+from enterprise_access.concurrency_utils import deadline_from_now, fan_out
+
+from .models import SubsidyAccessPolicy
+from .subsidy_api import REQUEST_CACHE_NAMESPACE, set_request_cached_subsidy_can_redeem
+
+logger = logging.getLogger(__name__)
+
+
+class PolicyRedeemabilityEvaluator:
+    """
+    Evaluates the full (policies x content_keys) redeemability matrix for one learner.
+
+    ``prefetch()`` resolves every upstream dependency of ``SubsidyAccessPolicy.can_redeem()``
+    exactly once per distinct input, rather than once per (policy, content_key) pair:
+
+    * the enterprise learner record, once per customer,
+    * catalog inclusion, in bulk once per catalog,
+    * content metadata, in bulk once per customer,
+    * subsidy ``can_redeem`` payloads, once per (subsidy, content_key).
+
+    Those upstream calls are independent of each other, so they are made concurrently.
+
+    ``evaluate()`` then runs each policy's own ``can_redeem()`` against those warmed caches,
+    so verdicts and reason codes are identical to evaluating each policy individually,
+    but no further upstream calls are needed to compute them.
+
+    ``resolve_policy()`` selects one of the redeemable policies, computing each policy's
+    ``PolicyResolutionFacts`` once per evaluator no matter how many content keys it is resolved for.
+    """
+
+    def __init__(self, policies, lms_user_id, skip_customer_user_check=False):
+        self.policies = list(policies)
+        self.lms_user_id = lms_user_id
+        self.skip_customer_user_check = skip_customer_user_check
+        self.policy_facts = {}
+
+    @staticmethod
+    def _policies_by(policies, attribute_name):
+        """
+        Helper to group the given policies by the value of some attribute.
+        """
+        grouped = defaultdict(list)
+        for policy in policies:
+            grouped[getattr(policy, attribute_name)].append(policy)
+        return grouped
+
+    def prefetch(self, content_keys):
+        """
+        Warms the request-scoped and tiered caches that ``can_redeem()`` reads from
+        for every policy and each of the given ``content_keys``.
+
+        Independent upstream calls are fanned out concurrently, bounded by
+        ``settings.UPSTREAM_FAN_OUT_MAX_WORKERS`` and by a single deadline shared by every phase.
+        Upstream errors (and calls that miss the deadline) encountered here are logged and swallowed;
+        the same call is made again (and any error surfaced as usual) when ``evaluate()`` needs the data.
+        """
+        content_keys = list(dict.fromkeys(content_keys))
+        enabled_policies = [policy for policy in self.policies if policy.is_redemption_enabled]
+        if not content_keys or not enabled_policies:
+            return
+
+        deadline = deadline_from_now()
+
+        # Phase 1: learner records, catalog inclusion and content metadata are independent of each other.
+        calls = {}
+        if not self.skip_customer_user_check:
+            calls.update(self._learner_record_calls(enabled_policies))
+        calls.update(self._catalog_inclusion_calls(enabled_policies, content_keys))
+        calls.update(self._content_metadata_calls(enabled_policies, content_keys))
+        results = self._fan_out(calls, deadline)
+
+        # Phase 2: subsidy can_redeem payloads, only where catalog inclusion and metadata allow.
+        calls = self._subsidy_can_redeem_calls(enabled_policies, content_keys, results)
+        for (_, subsidy_uuid, content_key), payload in self._fan_out(calls, deadline).items():
+            set_request_cached_subsidy_can_redeem(subsidy_uuid, self.lms_user_id, content_key, payload)
+
+    def prefetch_credit_available(self):
+        """
+        Warms the caches that ``credit_available()`` reads from for every policy:
+        learner records per customer, subsidy records per subsidy, and transaction
+        aggregates for policies with a spend limit.
+        """
+        enabled_policies = [policy for policy in self.policies if policy.is_redemption_enabled]
+        if not enabled_policies:
+            return
+
+        calls = {}
+        if not self.skip_customer_user_check:
+            calls.update(self._learner_record_calls(enabled_policies))
+        for subsidy_uuid, subsidy_policies in self._policies_by(enabled_policies, 'subsidy_uuid').items():
+            calls[('subsidy_record', subsidy_uuid)] = subsidy_policies[0].subsidy_record
+        for policy in enabled_policies:
+            if policy.spend_limit is not None:
+                calls[('aggregates_for_policy', policy.uuid)] = policy.aggregates_for_policy
+        self._fan_out(calls, deadline_from_now())
+
+    def _fan_out(self, calls, deadline):
+        """
+        Executes the given calls via ``fan_out()``, logging any that failed or missed the deadline.
+        Returns a dict of results for the calls that succeeded.
+        """
+        outcome = fan_out(calls, deadline=deadline, request_cache_namespaces=[REQUEST_CACHE_NAMESPACE])
+        for key, exc in outcome.errors.items():
+            logger.warning(f'{exc} when prefetching {key} for learner {self.lms_user_id}')
+        for key in outcome.pending:
+            logger.warning(f'Timed out when prefetching {key} for learner {self.lms_user_id}')
+        return outcome.results
+
+    def _learner_record_calls(self, policies):
+        return {
+            ('learner_record', customer_uuid): partial(customer_policies[0].enterprise_user_record, self.lms_user_id)
+            for customer_uuid, customer_policies in self._policies_by(policies, 'enterprise_customer_uuid').items()
+        }
+
+    def _catalog_inclusion_calls(self, policies, content_keys):
+        return {
+            ('catalog_inclusion', catalog_uuid): partial(
+                catalog_policies[0].catalog_contains_content_keys, content_keys,
+            )
+            for catalog_uuid, catalog_policies in self._policies_by(policies, 'catalog_uuid').items()
+        }
+
+    def _content_metadata_calls(self, policies, content_keys):
+        return {
+            ('content_metadata', customer_uuid): partial(
+                self._content_metadata_for_keys, customer_policies[0], content_keys,
+            )
+            for customer_uuid, customer_policies in self._policies_by(policies, 'enterprise_customer_uuid').items()
+        }
+
+    def _content_metadata_for_keys(self, policy, content_keys):
+        """
+        Fetches content metadata for the given keys, logging the keys that couldn't be fetched rather than
+        failing the rest, so that phase 2 still prefetches whatever their metadata allows.
+        """
+        outcome = policy.get_content_metadata_for_keys(content_keys)
+        for content_key, exc in outcome.errors.items():
+            logger.warning(f'{exc} when prefetching content metadata for {content_key} for learner {self.lms_user_id}')
+        for content_key in outcome.pending:
+            logger.warning(
+                f'Timed out when prefetching content metadata for {content_key} for learner {self.lms_user_id}'
+            )
+        return outcome.results
+
+    def _subsidy_can_redeem_calls(self, policies, content_keys, phase_one_results):
+        """
+        Builds subsidy ``can_redeem`` calls only for (subsidy, content_key) pairs that at least
+        one policy could plausibly reach in its ``can_redeem()`` checks.
+        """
+        calls = {}
+        for subsidy_uuid, subsidy_policies in self._policies_by(policies, 'subsidy_uuid').items():
+            for content_key in content_keys:
+                is_reachable = any(
+                    phase_one_results.get(('catalog_inclusion', policy.catalog_uuid), {}).get(content_key) and
+                    phase_one_results.get(('content_metadata', policy.enterprise_customer_uuid), {}).get(content_key)
+                    for policy in subsidy_policies
+                )
+                if is_reachable:
+                    calls[('subsidy_can_redeem', subsidy_uuid, content_key)] = partial(
+                        subsidy_policies[0].subsidy_can_redeem, self.lms_user_id, content_key,
+                    )
+        return calls
+
+    def evaluate(self, content_key):
+        """
+        Evaluate every policy against the given ``content_key``.
+
+        Returns:
+            tuple of (list of SubsidyAccessPolicy, dict mapping str -> list of SubsidyAccessPolicy): The
+            redeemable policies, and a mapping of reason strings to non-redeemable policies.
+
+        Raises:
+            ContentPriceNullException if the price of the content could not be determined.
+        """
+        redeemable_policies = []
+        non_redeemable_policies = defaultdict(list)
+        for policy in self.policies:
+            redeemable, reason, _ = policy.can_redeem(
+                self.lms_user_id, content_key, skip_customer_user_check=self.skip_customer_user_check,
+            )
+            logger.info(
+                f'[can_redeem] {policy} inputs: (lms_user_id={self.lms_user_id}, content_key={content_key}) results: '
+                f'redeemable={redeemable}, reason={reason}.'
+            )
+            if redeemable:
+                redeemable_policies.append(policy)
+            else:
+                # Aggregate the reasons for policies not being redeemable.  This really only works if the reason string
+                # is short and generic because the bucketing logic simply treats entire string as the bucket key.
+                non_redeemable_policies[reason].append(policy)
+        return redeemable_policies, non_redeemable_policies
+
+    def resolve_policy(self, redeemable_policies):
+        """
+        Select one of the given redeemable policies, as ``SubsidyAccessPolicy.resolve_policy()`` does,
+        sharing policy facts across every content key evaluated by this evaluator.
+        """
+        resolved_policy, _ = self.resolve_policy_with_trace(redeemable_policies)
+        return resolved_policy
+
+    def resolve_policy_with_trace(self, redeemable_policies):
+        """
+        Same as ``resolve_policy()``, but also returns the resolution trace, for debugging.
+        """
+        return SubsidyAccessPolicy.resolve_policy_with_trace(redeemable_policies, policy_facts=self.policy_facts)
+
+    def evaluate_all(self, content_keys):
+        """
+        Prefetch and evaluate every policy against every one of the given ``content_keys``.
+
+        Returns:
+            dict mapping each content_key to the tuple returned by ``evaluate()``.
+        """
+        self.prefetch(content_keys)
+        return {content_key: self.evaluate(content_key) for content_key in content_keys}
@@ -0,0 +1,60 @@
+"""
+Signal handlers for subsidy_access_policy app.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from enterprise_access.apps.content_assignments.models import AssignmentConfiguration
+from enterprise_access.apps.subsidy_access_policy.api import invalidate_redeemable_policies_for_customer
+from enterprise_access.apps.subsidy_access_policy.models import (
+    PolicyGroupAssociation,
+    SubsidyAccessPolicy,
+    clear_request_cached_group_uuids,
+    get_policy_classes_by_type
+)
+
+
+@receiver(post_save, sender=PolicyGroupAssociation)
+@receiver(post_delete, sender=PolicyGroupAssociation)
+def clear_request_cached_group_uuids_for_association(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Post save/delete hook to drop the request cached group associations of the changed association's customer.
+    """
+    association = kwargs['instance']
+    enterprise_customer_uuid = SubsidyAccessPolicy.objects.filter(
+        uuid=association.subsidy_access_policy_id,
+    ).values_list('enterprise_customer_uuid', flat=True).first()
+    if enterprise_customer_uuid:
+        clear_request_cached_group_uuids(enterprise_customer_uuid)
+        invalidate_redeemable_policies_for_customer(enterprise_customer_uuid)
+
+
+def invalidate_redeemable_policies_for_changed_policy(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Post save/delete hook to drop the locally cached redeemable policies of the changed policy's customer.
+    """
+    invalidate_redeemable_policies_for_customer(kwargs['instance'].enterprise_customer_uuid)
+
+
+# Saved and deleted policies are instances of the proxy classes, which are the senders of their signals.
+for policy_class in (SubsidyAccessPolicy, *get_policy_classes_by_type().values()):
+    post_save.connect(invalidate_redeemable_policies_for_changed_policy, sender=policy_class)
+    post_delete.connect(invalidate_redeemable_policies_for_changed_policy, sender=policy_class)
+
+
+@receiver(post_save, sender=AssignmentConfiguration)
+@receiver(post_delete, sender=AssignmentConfiguration)
+def invalidate_redeemable_policies_for_assignment_configuration(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Post save/delete hook to drop the locally cached redeemable policies of the changed assignment
+    configuration's customer, since they're cached along with their assignment configurations.
+    """
+    assignment_configuration = kwargs['instance']
+    enterprise_customer_uuids = {assignment_configuration.enterprise_customer_uuid}
+    enterprise_customer_uuids.update(
+        SubsidyAccessPolicy.objects.filter(
+            assignment_configuration_id=assignment_configuration.uuid,
+        ).values_list('enterprise_customer_uuid', flat=True)
+    )
+    for enterprise_customer_uuid in enterprise_customer_uuids:
+        invalidate_redeemable_policies_for_customer(enterprise_customer_uuid)
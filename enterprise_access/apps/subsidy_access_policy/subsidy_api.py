@@ -8,16 +8,30 @@ from collections import defaultdict
 
 import requests
 from django.conf import settings
+from django.core.cache import cache
 from edx_django_utils.cache import TieredCache
 
-from enterprise_access.cache_utils import request_cache, versioned_cache_key
-
+from enterprise_access.cache_utils import (
+    LocalTieredCache,
+    refresh_with_single_flight,
+    request_cache,
+    request_cache_key,
+    schedule_revalidation,
+    unwrap_soft_expiring_value,
+    versioned_cache_key,
+    wrap_soft_expiring_value
+)
+from enterprise_access.concurrency_utils import fetch_all_pages
+
+from .constants import TransactionStateChoices
 from .exceptions import SubsidyAPIHTTPError
+from .tasks import refresh_subsidy_record_task
 from .utils import get_versioned_subsidy_client
 
 logger = logging.getLogger(__name__)
 
 REQUEST_CACHE_NAMESPACE = 'subsidy_access_policy'
+SUBSIDY_RECORD_LOCAL_CACHE_NAMESPACE = 'subsidy_record'
 
 CACHE_MISS = object()
 
@@ -46,30 +60,59 @@ def get_and_cache_subsidy_learners_aggregate_data(subsidy_uuid, policy_uuid=None
         )
         return cached_response.value
 
-    client = get_versioned_subsidy_client(version=1)
-    try:
-        response_payload = client.get_subsidy_aggregates_by_learner_data(
-            subsidy_uuid,
-            policy_uuid,
-        )
-    except requests.exceptions.HTTPError as exc:
-        raise SubsidyAPIHTTPError('HTTPError occurred in Subsidy API request.') from exc
+    def fetch_and_cache():
+        client = get_versioned_subsidy_client(version=1)
+        try:
+            response_payload = client.get_subsidy_aggregates_by_learner_data(
+                subsidy_uuid,
+                policy_uuid,
+            )
+        except requests.exceptions.HTTPError as exc:
+            raise SubsidyAPIHTTPError('HTTPError occurred in Subsidy API request.') from exc
 
-    results = {}
-    for aggregated_data in response_payload:
-        results[aggregated_data.get('lms_user_id')] = aggregated_data.get('total')
-    TieredCache.set_all_tiers(cache_key, results, settings.SUBSIDY_AGGREGATES_CACHE_TIMEOUT)
-    return results
+        results = {}
+        for aggregated_data in response_payload:
+            results[aggregated_data.get('lms_user_id')] = aggregated_data.get('total')
+        TieredCache.set_all_tiers(cache_key, results, settings.SUBSIDY_AGGREGATES_CACHE_TIMEOUT)
+        return results
+
+    return refresh_with_single_flight(cache_key, fetch_and_cache)
 
 
 def learner_transaction_cache_key(subsidy_uuid, lms_user_id):
-    return versioned_cache_key('get_transactions_for_learner', subsidy_uuid, lms_user_id)
+    return request_cache_key('get_transactions_for_learner', subsidy_uuid, lms_user_id)
+
+
+def learner_redemption_index_cache_key(subsidy_uuid, lms_user_id):
+    return request_cache_key('learner_redemption_index', subsidy_uuid, lms_user_id)
+
+
+def learner_transaction_generation_cache_key(subsidy_uuid, lms_user_id):
+    return versioned_cache_key('learner_transaction_generation', subsidy_uuid, lms_user_id)
+
+
+def learner_transaction_shared_cache_key(subsidy_uuid, lms_user_id, generation):
+    return versioned_cache_key('get_transactions_for_learner', subsidy_uuid, lms_user_id, generation)
+
+
+def _learner_transaction_generation_timeout():
+    """
+    Generations must outlive any entry cached under them, or a counter that expired and
+    started over could make an entry cached before an invalidation visible again.
+    """
+    return settings.LEARNER_TRANSACTIONS_CACHE_TIMEOUT * 100
 
 
 def get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id):
     """
     Get all transactions for a learner in a given subsidy.  This can
     include transactions from multiple access policies.
+
+    Transactions are cached for the rest of the request, and shared across requests
+    for ``settings.LEARNER_TRANSACTIONS_CACHE_TIMEOUT`` seconds, under a key that includes
+    the (subsidy, learner) generation that ``invalidate_transactions_for_learner()`` bumps.
+    That way, a fetch that was in flight during an invalidation can't cache outdated transactions
+    where later reads would find them.
     """
     cache_key = learner_transaction_cache_key(subsidy_uuid, lms_user_id)
     cached_response = request_cache(namespace=REQUEST_CACHE_NAMESPACE).get_cached_response(cache_key)
@@ -77,6 +120,32 @@ def get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id):
         logger.info(f'cache hit for subsidy {subsidy_uuid} and user {lms_user_id}')
         return cached_response.value
 
+    generation = cache.get(learner_transaction_generation_cache_key(subsidy_uuid, lms_user_id), 0)
+    shared_cache_key = learner_transaction_shared_cache_key(subsidy_uuid, lms_user_id, generation)
+    result = cache.get(shared_cache_key, CACHE_MISS)
+    if result is not CACHE_MISS:
+        logger.info(f'shared cache hit for subsidy {subsidy_uuid} and user {lms_user_id}')
+    else:
+        result = refresh_with_single_flight(
+            shared_cache_key,
+            lambda: _fetch_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id, shared_cache_key),
+        )
+    request_cache(namespace=REQUEST_CACHE_NAMESPACE).set(cache_key, result)
+    return result
+
+
+def _transactions_page_getter(client):
+    """
+    Helper to fetch pages of transactions via the session of the given subsidy client, for ``fetch_all_pages()``.
+    """
+    return lambda page_url: client.client.get(page_url).json()
+
+
+def _fetch_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id, shared_cache_key):
+    """
+    Helper to list all of a learner's transactions in a given subsidy from the subsidy service,
+    and share them with other requests under ``shared_cache_key``.
+    """
     client = get_versioned_subsidy_client()
     try:
         response_payload = client.list_subsidy_transactions(
@@ -87,18 +156,17 @@ def get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id):
     except requests.exceptions.HTTPError as exc:
         raise SubsidyAPIHTTPError('HTTPError occurred in Subsidy API request.') from exc
 
+    pages = fetch_all_pages(
+        response_payload,
+        _transactions_page_getter(client),
+        new_get_page=lambda: _transactions_page_getter(get_versioned_subsidy_client()),
+    )
     result = {
-        'transactions': response_payload['results'],
+        'transactions': [transaction for page in pages for transaction in page['results']],
         # TODO: this is some tech. debt  we're going to live with
         # for the moment in pursuit of https://2u-internal.atlassian.net/browse/ENT-7222
         'aggregates': {},
     }
-    next_page = response_payload.get('next')
-    while next_page:
-        next_response = client.client.get(next_page)
-        next_payload = next_response.json()
-        result['transactions'].extend(next_payload['results'])
-        next_page = next_payload.get('next')
 
     logger.info(
         'Fetched transactions for subsidy %s and lms_user_id %s. Number transactions = %s',
@@ -106,10 +174,141 @@ def get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id):
         lms_user_id,
         len(result['transactions']),
     )
-    request_cache(namespace=REQUEST_CACHE_NAMESPACE).set(cache_key, result)
+    cache.set(shared_cache_key, result, settings.LEARNER_TRANSACTIONS_CACHE_TIMEOUT)
     return result
 
 
+def invalidate_transactions_for_learner(subsidy_uuid, lms_user_id):
+    """
+    Invalidates any cached transactions for a learner in a given subsidy, in this request and
+    across requests.  Call this whenever a transaction for the learner is created or reversed.
+    """
+    _cache = request_cache(namespace=REQUEST_CACHE_NAMESPACE)
+    _cache.delete(learner_transaction_cache_key(subsidy_uuid, lms_user_id))
+    _cache.delete(learner_redemption_index_cache_key(subsidy_uuid, lms_user_id))
+    generation_cache_key = learner_transaction_generation_cache_key(subsidy_uuid, lms_user_id)
+    try:
+        cache.incr(generation_cache_key)
+    except ValueError:
+        if not cache.add(generation_cache_key, 1, _learner_transaction_generation_timeout()):
+            cache.incr(generation_cache_key)
+    logger.info(f'Invalidated cached transactions for subsidy {subsidy_uuid} and user {lms_user_id}')
+
+
+def subsidy_can_redeem_cache_key(subsidy_uuid, lms_user_id, content_key):
+    return request_cache_key('subsidy_can_redeem', subsidy_uuid, lms_user_id, content_key)
+
+
+def get_request_cached_subsidy_can_redeem(subsidy_uuid, lms_user_id, content_key):
+    """
+    Returns a subsidy ``can_redeem`` payload for the given (subsidy, learner, content) that was
+    prefetched earlier in this request, or a ``CACHE_MISS`` object if no such payload was prefetched.
+    """
+    cache_key = subsidy_can_redeem_cache_key(subsidy_uuid, lms_user_id, content_key)
+    cached_response = request_cache(namespace=REQUEST_CACHE_NAMESPACE).get_cached_response(cache_key)
+    if cached_response.is_found:
+        logger.info(f'subsidy can_redeem cache hit for subsidy {subsidy_uuid}, user {lms_user_id}, {content_key}')
+        return cached_response.value
+    return CACHE_MISS
+
+
+def set_request_cached_subsidy_can_redeem(subsidy_uuid, lms_user_id, content_key, payload):
+    """
+    Stores a subsidy ``can_redeem`` payload in the request cache, so that every policy
+    tied to the same subsidy can evaluate redeemability without another call to the subsidy service.
+    """
+    cache_key = subsidy_can_redeem_cache_key(subsidy_uuid, lms_user_id, content_key)
+    request_cache(namespace=REQUEST_CACHE_NAMESPACE).set(cache_key, payload)
+
+
+def is_successful_redemption(transaction):
+    """
+    Just because a transaction has state='committed' doesn't mean it counts as a successful redemption;
+    it must also NOT have a committed reversal.
+    """
+    return transaction['state'] == TransactionStateChoices.COMMITTED and (
+        not transaction['reversal'] or
+        transaction['reversal'].get('state') != TransactionStateChoices.COMMITTED
+    )
+
+
+class LearnerRedemptionIndex:
+    """
+    A learner's transactions in a subsidy, indexed by policy uuid, so that each
+    policy's share of the learner's ledger is a dict lookup rather than a scan.
+    """
+    def __init__(self, transactions):
+        self.transactions = transactions
+        self.transactions_by_policy_uuid = defaultdict(list)
+        for transaction in transactions:
+            self.transactions_by_policy_uuid[str(transaction['subsidy_access_policy_uuid'])].append(transaction)
+        self._total_quantity_by_policy_uuid = {}
+
+    def for_policy(self, policy_uuid):
+        return self.transactions_by_policy_uuid.get(str(policy_uuid), [])
+
+    def total_quantity_for_policy(self, policy_uuid):
+        policy_uuid = str(policy_uuid)
+        if policy_uuid not in self._total_quantity_by_policy_uuid:
+            self._total_quantity_by_policy_uuid[policy_uuid] = sum(
+                transaction['quantity'] for transaction in self.for_policy(policy_uuid)
+            )
+        return self._total_quantity_by_policy_uuid[policy_uuid]
+
+
+def get_learner_redemption_index(subsidy_uuid, lms_user_id, transactions):
+    """
+    Returns a ``LearnerRedemptionIndex`` of the given learner's ``transactions`` in the given subsidy,
+    as returned by ``get_and_cache_transactions_for_learner()``.  The index is request cached under the same
+    (subsidy, learner) key as those transactions, and invalidated along with them, so every policy tied
+    to the subsidy shares the same index.
+    """
+    cache_key = learner_redemption_index_cache_key(subsidy_uuid, lms_user_id)
+    cached_response = request_cache(namespace=REQUEST_CACHE_NAMESPACE).get_cached_response(cache_key)
+    # Transactions that were fetched again since the index was built get an index of their own.
+    if cached_response.is_found and cached_response.value.transactions is transactions:
+        return cached_response.value
+
+    index = LearnerRedemptionIndex(transactions)
+    request_cache(namespace=REQUEST_CACHE_NAMESPACE).set(cache_key, index)
+    return index
+
+
+class RedemptionsByContentAndPolicy(defaultdict):
+    """
+    A mapping of content keys to mappings of policies to lists of a learner's transactions,
+    with constant-time lookups of what the redemption paths ask of it.
+    """
+    def __init__(self):
+        super().__init__(lambda: defaultdict(list))
+        self._policy_by_redemption_uuid = {}
+
+    def add(self, policy, redemption):
+        self[redemption['content_key']][policy].append(redemption)
+        self._policy_by_redemption_uuid[redemption['uuid']] = policy
+
+    def redemptions_for_content(self, content_key):
+        """
+        Returns the flattened list of redemptions of ``content_key``, across policies.
+        """
+        if content_key not in self:
+            return []
+        return [
+            redemption
+            for redemptions in self[content_key].values()
+            for redemption in redemptions
+        ]
+
+    def successful_redemptions_for_content(self, content_key):
+        return [
+            redemption for redemption in self.redemptions_for_content(content_key)
+            if is_successful_redemption(redemption)
+        ]
+
+    def policy_for_redemption(self, redemption_uuid):
+        return self._policy_by_redemption_uuid.get(redemption_uuid)
+
+
 def get_redemptions_by_content_and_policy_for_learner(policies, lms_user_id):
     """
     Returns a mapping of content keys to a mapping of policy uuids to lists of transactions
@@ -131,50 +330,61 @@ def get_redemptions_by_content_and_policy_for_learner(policies, lms_user_id):
     with a policy uuid that’s *not* currently associated with the subsidy we requested transactions for,
     we don’t want it the mapping, because we’ll later compute aggregates for the policies’
     spend caps and learner limits based on that mapping.
+
+    Returns:
+        RedemptionsByContentAndPolicy
     """
     policies_by_subsidy_uuid = defaultdict(set)
     for policy in policies:
         policies_by_subsidy_uuid[policy.subsidy_uuid].add(policy)
 
-    result = defaultdict(lambda: defaultdict(list))
+    result = RedemptionsByContentAndPolicy()
 
     for subsidy_uuid, policies_with_subsidy in policies_by_subsidy_uuid.items():
         logger.info(f'Fetching learner transactions for subsidy {subsidy_uuid} via policies {policies_with_subsidy}')
         transactions_in_subsidy = get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id)['transactions']
-        for redemption in transactions_in_subsidy:
-            transaction_uuid = redemption['uuid']
-            content_key = redemption['content_key']
-            subsidy_access_policy_uuid = redemption['subsidy_access_policy_uuid']
-
-            matching_policies = [
-                policy for policy in policies_with_subsidy
-                if str(policy.uuid) == subsidy_access_policy_uuid
-            ]
-            # We can assume there's at most one matching policy because the ``policies`` arg passed into this function
-            # should not contain duplicates.
-            matching_policy = matching_policies[0] if matching_policies else None
-            if matching_policy:
-                result[content_key][matching_policy].append(redemption)
-            else:
-                logger.warning(
-                    f"Transaction {transaction_uuid} has unmatched policy uuid for subsidy {subsidy_uuid}: "
-                    f"Found policy uuid {subsidy_access_policy_uuid} that is no longer tied to this subsidy."
-                )
+        # We can assume there's at most one matching policy per uuid because the ``policies`` arg passed into this
+        # function should not contain duplicates.
+        policies_by_uuid = {str(policy.uuid): policy for policy in policies_with_subsidy}
+        redemption_index = get_learner_redemption_index(transactions_in_subsidy)
+        for subsidy_access_policy_uuid, redemptions in redemption_index.transactions_by_policy_uuid.items():
+            matching_policy = policies_by_uuid.get(subsidy_access_policy_uuid)
+            for redemption in redemptions:
+                if matching_policy:
+                    result.add(matching_policy, redemption)
+                else:
+                    logger.warning(
+                        f"Transaction {redemption['uuid']} has unmatched policy uuid for subsidy {subsidy_uuid}: "
+                        f"Found policy uuid {subsidy_access_policy_uuid} that is no longer tied to this subsidy."
+                    )
 
     return result
 
 
+def subsidy_record_cache_key(subsidy_uuid, *cache_key_args):
+    return versioned_cache_key('get_subsidy_record', subsidy_uuid, *cache_key_args)
+
+
 def get_tiered_cache_subsidy_record(subsidy_uuid, *cache_key_args):
     """
     Gets the subsidy record (a dictionary) with the given ``subsidy_uuid``
-    from the TieredCache (meaning memcache) if present.
+    from the TieredCache (meaning memcache, fronted by a process-local cache) if present.
     If not present, returns a ``CACHE_MISS`` object.
+
+    A record cached longer ago than ``settings.SUBSIDY_RECORD_CACHE_SOFT_TIMEOUT`` is still returned,
+    but a background refresh of it is scheduled.
     """
-    cache_key = versioned_cache_key('get_subsidy_record', subsidy_uuid, *cache_key_args)
-    cached_response = TieredCache.get_cached_response(cache_key)
+    cache_key = subsidy_record_cache_key(subsidy_uuid, *cache_key_args)
+    cached_response = LocalTieredCache.get_cached_response(cache_key, SUBSIDY_RECORD_LOCAL_CACHE_NAMESPACE)
     if cached_response.is_found:
         logger.info(f"cache hit for subsidy record {subsidy_uuid} record")
-        return cached_response.value
+        subsidy_record, is_stale = unwrap_soft_expiring_value(cached_response.value)
+        if is_stale:
+            schedule_revalidation(
+                [cache_key],
+                lambda _: refresh_subsidy_record_task.delay(str(subsidy_uuid), *cache_key_args),
+            )
+        return subsidy_record
 
     logger.info(f"cache miss for subsidy record {subsidy_uuid}")
     return CACHE_MISS
@@ -186,6 +396,21 @@ def set_tiered_cache_subsidy_record(subsidy_record, *cache_key_args):
     provided args.
     """
     subsidy_uuid = subsidy_record['uuid']
-    cache_key = versioned_cache_key('get_subsidy_record', subsidy_uuid, *cache_key_args)
+    cache_key = subsidy_record_cache_key(subsidy_uuid, *cache_key_args)
     logger.info(f"cache set for subsidy record {subsidy_uuid}")
-    TieredCache.set_all_tiers(cache_key, subsidy_record, settings.SUBSIDY_RECORD_CACHE_TIMEOUT)
+    LocalTieredCache.set_all_tiers(
+        cache_key,
+        wrap_soft_expiring_value(subsidy_record, settings.SUBSIDY_RECORD_CACHE_SOFT_TIMEOUT),
+        settings.SUBSIDY_RECORD_CACHE_TIMEOUT,
+        SUBSIDY_RECORD_LOCAL_CACHE_NAMESPACE,
+    )
+
+
+def fetch_and_cache_subsidy_record(subsidy_uuid, *cache_key_args):
+    """
+    Fetches the subsidy record with the given ``subsidy_uuid`` from the subsidy service,
+    regardless of what's cached, and sets it in the TieredCache by uuid and any additional provided args.
+    """
+    subsidy_record = get_versioned_subsidy_client().retrieve_subsidy(subsidy_uuid=subsidy_uuid)
+    set_tiered_cache_subsidy_record(subsidy_record, *cache_key_args)
+    return subsidy_record
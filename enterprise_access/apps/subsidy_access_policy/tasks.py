@@ -0,0 +1,34 @@
+"""
+Celery tasks for the subsidy_access_policy app.
+"""
+import logging
+
+from celery import shared_task
+
+from enterprise_access.tasks import LoggedTaskWithRetry
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(base=LoggedTaskWithRetry)
+def refresh_subsidy_record_task(subsidy_uuid, *cache_key_args):
+    """
+    Revalidates a stale cache entry read by ``subsidy_api.get_tiered_cache_subsidy_record()``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from enterprise_access.apps.subsidy_access_policy.subsidy_api import fetch_and_cache_subsidy_record
+
+    logger.info(f'Refreshing stale subsidy record {subsidy_uuid}')
+    fetch_and_cache_subsidy_record(subsidy_uuid, *cache_key_args)
+
+
+@shared_task(base=LoggedTaskWithRetry)
+def reconcile_policy_spend_snapshots_task(policy_uuids=None):
+    """
+    Reconciles policy spend snapshots with the subsidy service,
+    see ``api.reconcile_policy_spend_snapshots()``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from enterprise_access.apps.subsidy_access_policy.api import reconcile_policy_spend_snapshots
+
+    return reconcile_policy_spend_snapshots(policy_uuids)
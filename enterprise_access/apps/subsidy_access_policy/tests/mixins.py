@@ -4,7 +4,9 @@ Defines shared subsidy access policy test mixins.
 from unittest.mock import patch
 
 from django.core.cache import cache as django_cache
+from edx_django_utils.cache import RequestCache
 
+from enterprise_access.concurrency_utils import FanOutResult
 from test_utils import TEST_USER_RECORD
 
 from ..models import SubsidyAccessPolicy
@@ -35,11 +37,33 @@ class MockPolicyDependenciesMixin:
         )
         self.mock_catalog_contains_content_key = catalog_contains_content_key_patcher.start()
 
+        # The bulk lookup answers per-key, from whatever the single-key mock is configured to return.
+        catalog_contains_content_keys_patcher = patch.object(
+            SubsidyAccessPolicy, 'catalog_contains_content_keys',
+            side_effect=lambda content_keys: {
+                content_key: self.mock_catalog_contains_content_key(content_key) for content_key in content_keys
+            },
+        )
+        catalog_contains_content_keys_patcher.start()
+
         get_content_metadata_patcher = patch(
             'enterprise_access.apps.subsidy_access_policy.models.get_and_cache_content_metadata'
         )
         self.mock_get_content_metadata = get_content_metadata_patcher.start()
 
+        get_content_metadata_for_keys_patcher = patch(
+            'enterprise_access.apps.subsidy_access_policy.models.get_and_cache_content_metadata_for_keys',
+            side_effect=lambda customer_uuid, content_keys: FanOutResult(
+                {
+                    content_key: self.mock_get_content_metadata(customer_uuid, content_key)
+                    for content_key in content_keys
+                },
+                {},
+                [],
+            ),
+        )
+        get_content_metadata_for_keys_patcher.start()
+
         lms_api_client_patcher = patch.object(
             SubsidyAccessPolicy, 'lms_api_client'
         )
@@ -56,7 +80,10 @@ class MockPolicyDependenciesMixin:
         self.addCleanup(subsidy_client_patcher.stop)
         self.addCleanup(transactions_cache_for_learner_patcher.stop)
         self.addCleanup(catalog_contains_content_key_patcher.stop)
+        self.addCleanup(catalog_contains_content_keys_patcher.stop)
         self.addCleanup(get_content_metadata_patcher.stop)
+        self.addCleanup(get_content_metadata_for_keys_patcher.stop)
         self.addCleanup(lms_api_client_patcher.stop)
         self.addCleanup(enterprise_user_record_patcher.stop)
         self.addCleanup(django_cache.clear)  # clear any leftover policy locks.
+        self.addCleanup(RequestCache.clear_all_namespaces)
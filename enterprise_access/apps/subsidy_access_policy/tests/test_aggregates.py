@@ -0,0 +1,109 @@
+"""
+Tests for the aggregates module.
+"""
+from uuid import uuid4
+
+from django.test import TestCase, override_settings
+from edx_django_utils.cache import RequestCache
+from requests.exceptions import HTTPError
+
+from enterprise_access.apps.content_assignments.constants import LearnerContentAssignmentStateChoices
+from enterprise_access.apps.content_assignments.tests.factories import LearnerContentAssignmentFactory
+
+from ..aggregates import PolicyAggregates, PolicyAggregatesLoader
+from ..models import PolicySpendSnapshot
+from .factories import AssignedLearnerCreditAccessPolicyFactory, PerLearnerSpendCapLearnerCreditAccessPolicyFactory
+from .mixins import MockPolicyDependenciesMixin
+
+
+class PolicyAggregatesLoaderTests(MockPolicyDependenciesMixin, TestCase):
+    """
+    Tests for ``PolicyAggregatesLoader``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.customer_uuid = uuid4()
+        self.subsidy_uuid = uuid4()
+        self.assigned_policies = [
+            AssignedLearnerCreditAccessPolicyFactory(
+                enterprise_customer_uuid=self.customer_uuid,
+                subsidy_uuid=self.subsidy_uuid,
+                spend_limit=10000,
+            )
+            for _ in range(2)
+        ]
+        self.spend_cap_policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(
+            enterprise_customer_uuid=self.customer_uuid,
+            subsidy_uuid=self.subsidy_uuid,
+            spend_limit=None,
+        )
+        for quantity, state in (
+            (-100, LearnerContentAssignmentStateChoices.ALLOCATED),
+            (-200, LearnerContentAssignmentStateChoices.ALLOCATED),
+            (-400, LearnerContentAssignmentStateChoices.CANCELLED),
+        ):
+            LearnerContentAssignmentFactory(
+                assignment_configuration=self.assigned_policies[0].assignment_configuration,
+                content_quantity=quantity,
+                state=state,
+            )
+        self.mock_subsidy_client.retrieve_subsidy.return_value = {'current_balance': 5000}
+        self.mock_subsidy_client.list_subsidy_transactions.return_value = {
+            'results': [], 'aggregates': {'total_quantity': -1000},
+        }
+        self.addCleanup(RequestCache.clear_all_namespaces)
+
+    def _policies(self):
+        return [*self.assigned_policies, self.spend_cap_policy]
+
+    def test_load(self):
+        # One query for spend snapshots, one for allocated totals.
+        with self.assertNumQueries(2):
+            aggregates = PolicyAggregatesLoader(self._policies()).load()
+
+        self.assertEqual(aggregates, {
+            self.assigned_policies[0].uuid: PolicyAggregates(
+                total_redeemed=-1000, total_allocated=-300, spend_available=4700,
+            ),
+            self.assigned_policies[1].uuid: PolicyAggregates(
+                total_redeemed=-1000, total_allocated=0, spend_available=5000,
+            ),
+            self.spend_cap_policy.uuid: PolicyAggregates(
+                total_redeemed=-1000, total_allocated=0, spend_available=5000,
+            ),
+        })
+        # One subsidy record fetch for the shared subsidy, one aggregates fetch per policy.
+        self.assertEqual(self.mock_subsidy_client.retrieve_subsidy.call_count, 1)
+        self.assertEqual(self.mock_subsidy_client.list_subsidy_transactions.call_count, 3)
+
+    def test_load_matches_per_policy_aggregates(self):
+        aggregates = PolicyAggregatesLoader(self._policies()).load()
+        RequestCache.clear_all_namespaces()
+
+        for policy in self._policies():
+            self.assertEqual(
+                aggregates[policy.uuid],
+                PolicyAggregates(policy.total_redeemed, policy.total_allocated, policy.spend_available),
+            )
+
+    def test_subsidy_errors(self):
+        self.mock_subsidy_client.list_subsidy_transactions.side_effect = HTTPError('boom')
+
+        aggregates = PolicyAggregatesLoader(self._policies()).load()
+
+        self.assertEqual(
+            aggregates[self.assigned_policies[0].uuid],
+            PolicyAggregates(total_redeemed=None, total_allocated=-300, spend_available=None),
+        )
+
+    @override_settings(POLICY_SPEND_SNAPSHOT_MAX_AGE=60 * 15)
+    def test_load_uses_fresh_spend_snapshots(self):
+        PolicySpendSnapshot.reconcile(self.spend_cap_policy)
+        RequestCache.clear_all_namespaces()
+        self.mock_subsidy_client.list_subsidy_transactions.reset_mock()
+
+        aggregates = PolicyAggregatesLoader(self._policies()).load()
+
+        self.assertEqual(aggregates[self.spend_cap_policy.uuid].total_redeemed, -1000)
+        # Only the policies without a snapshot need their aggregates fetched.
+        self.assertEqual(self.mock_subsidy_client.list_subsidy_transactions.call_count, 2)
@@ -0,0 +1,149 @@
+"""
+Tests for the subsidy_access_policy api module.
+"""
+from unittest import mock
+from uuid import uuid4
+
+from django.core.cache import cache as django_cache
+from django.test import TestCase, override_settings
+from edx_django_utils.cache import RequestCache
+
+from enterprise_access.apps.core.tests.factories import UserFactory
+from enterprise_access.cache_utils import process_local_cache
+
+from ..api import (
+    get_redeemable_policies_for_customer,
+    redeemable_policies_for_customer,
+    redeemable_policies_version_cache_key
+)
+from ..models import (
+    AssignedLearnerCreditAccessPolicy,
+    PerLearnerSpendCreditAccessPolicy,
+    SubsidyAccessPolicy,
+    get_policy_classes_by_type
+)
+from .factories import (
+    AssignedLearnerCreditAccessPolicyFactory,
+    PerLearnerSpendCapLearnerCreditAccessPolicyFactory,
+    PolicyGroupAssociationFactory
+)
+
+
+class RedeemablePoliciesForCustomerTests(TestCase):
+    """
+    Tests for ``redeemable_policies_for_customer()`` and ``get_redeemable_policies_for_customer()``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.customer_uuid = uuid4()
+        self.group_uuid = uuid4()
+        self.assigned_policy = AssignedLearnerCreditAccessPolicyFactory(enterprise_customer_uuid=self.customer_uuid)
+        self.spend_cap_policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(
+            enterprise_customer_uuid=self.customer_uuid,
+        )
+        PolicyGroupAssociationFactory(
+            subsidy_access_policy=self.spend_cap_policy,
+            enterprise_group_uuid=self.group_uuid,
+        )
+        # Neither retired nor other customers' policies are redeemable.
+        PerLearnerSpendCapLearnerCreditAccessPolicyFactory(enterprise_customer_uuid=self.customer_uuid, retired=True)
+        PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+
+        process_local_cache.cache_clear()
+        self.addCleanup(process_local_cache.cache_clear)
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(django_cache.clear)
+
+    def test_policies_are_loaded_with_their_relations(self):
+        # One query for the policies and their assignment configurations, one for their groups.
+        with self.assertNumQueries(2):
+            policies = list(redeemable_policies_for_customer(self.customer_uuid))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(policies, [self.spend_cap_policy, self.assigned_policy])
+            self.assertIsInstance(policies[0], PerLearnerSpendCreditAccessPolicy)
+            self.assertIsInstance(policies[1], AssignedLearnerCreditAccessPolicy)
+            self.assertEqual(policies[1].assignment_configuration, self.assigned_policy.assignment_configuration)
+            self.assertEqual(policies[0].group_uuids(), (self.group_uuid,))
+            self.assertEqual(policies[1].group_uuids(), ())
+
+    def test_local_cache_is_disabled_by_default_in_tests(self):
+        get_redeemable_policies_for_customer(self.customer_uuid)
+
+        with self.assertNumQueries(2):
+            get_redeemable_policies_for_customer(self.customer_uuid)
+
+    @override_settings(PROCESS_LOCAL_CACHE_TIMEOUTS={'redeemable_policies': 60})
+    def test_local_cache_is_invalidated_on_save(self):
+        get_redeemable_policies_for_customer(self.customer_uuid)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_redeemable_policies_for_customer(self.customer_uuid)), 2)
+
+        self.spend_cap_policy.retired = True
+        self.spend_cap_policy.save()
+
+        self.assertEqual(get_redeemable_policies_for_customer(self.customer_uuid), [self.assigned_policy])
+
+    @override_settings(PROCESS_LOCAL_CACHE_TIMEOUTS={'redeemable_policies': 60})
+    def test_local_cache_is_invalidated_on_delete(self):
+        get_redeemable_policies_for_customer(self.customer_uuid)
+
+        self.spend_cap_policy.delete()
+
+        self.assertEqual(get_redeemable_policies_for_customer(self.customer_uuid), [self.assigned_policy])
+
+    @override_settings(PROCESS_LOCAL_CACHE_TIMEOUTS={'redeemable_policies': 60})
+    def test_local_cache_is_invalidated_on_assignment_configuration_save(self):
+        get_redeemable_policies_for_customer(self.customer_uuid)
+        assignment_configuration = self.assigned_policy.assignment_configuration
+
+        assignment_configuration.active = False
+        assignment_configuration.save()
+
+        cached_policies = get_redeemable_policies_for_customer(self.customer_uuid)
+        self.assertFalse(cached_policies[1].assignment_configuration.active)
+
+    def test_other_models_dont_invalidate_local_cache(self):
+        with mock.patch(
+            'enterprise_access.apps.subsidy_access_policy.signals.invalidate_redeemable_policies_for_customer',
+        ) as mock_invalidate:
+            UserFactory()
+
+        mock_invalidate.assert_not_called()
+
+    @override_settings(PROCESS_LOCAL_CACHE_TIMEOUTS={'redeemable_policies': 60})
+    def test_local_cache_is_invalidated_by_other_processes(self):
+        get_redeemable_policies_for_customer(self.customer_uuid)
+
+        # Another process saves the policy, which only bumps the version shared via the django cache.
+        SubsidyAccessPolicy.objects.filter(uuid=self.spend_cap_policy.uuid).update(retired=True)
+        django_cache.set(redeemable_policies_version_cache_key(self.customer_uuid), 'saved-elsewhere', None)
+
+        self.assertEqual(get_redeemable_policies_for_customer(self.customer_uuid), [self.assigned_policy])
+
+
+class PolicyClassRegistryTests(TestCase):
+    """
+    Tests for the registry of policy types.
+    """
+    def test_get_policy_class_by_type(self):
+        self.assertIs(
+            SubsidyAccessPolicy.get_policy_class_by_type('AssignedLearnerCreditAccessPolicy'),
+            AssignedLearnerCreditAccessPolicy,
+        )
+        self.assertIsNone(SubsidyAccessPolicy.get_policy_class_by_type('NotAPolicyType'))
+        self.assertEqual(set(get_policy_classes_by_type().values()), set(SubsidyAccessPolicy.__subclasses__()))
+
+    def test_registry_is_cached(self):
+        registry = get_policy_classes_by_type()
+        misses_before = get_policy_classes_by_type.cache_info().misses
+
+        self.assertIs(get_policy_classes_by_type(), registry)
+        SubsidyAccessPolicy.get_policy_class_by_type('AssignedLearnerCreditAccessPolicy')
+
+        self.assertEqual(get_policy_classes_by_type.cache_info().misses, misses_before)
+
+    def test_instances_are_of_their_policy_type(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+
+        self.assertIsInstance(SubsidyAccessPolicy.objects.get(uuid=policy.uuid), PerLearnerSpendCreditAccessPolicy)
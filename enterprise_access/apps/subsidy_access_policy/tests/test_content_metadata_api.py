@@ -2,11 +2,25 @@
 Test content_metadata_api.py
 """
 import contextlib
+from unittest import mock
+from uuid import uuid4
 
 import ddt
+from django.core.cache import cache as django_cache
 from django.test import TestCase
+from edx_django_utils.cache import RequestCache
+from requests.exceptions import HTTPError
 
-from enterprise_access.apps.subsidy_access_policy.content_metadata_api import make_list_price_dict
+from enterprise_access.apps.subsidy_access_policy.content_metadata_api import (
+    get_and_cache_catalog_contains_content,
+    get_and_cache_catalog_contains_content_keys,
+    get_and_cache_content_metadata,
+    get_and_cache_content_metadata_for_keys,
+    make_list_price_dict
+)
+
+SUBSIDY_CLIENT_PATH = 'enterprise_access.apps.subsidy_access_policy.content_metadata_api.get_versioned_subsidy_client'
+CATALOG_CLIENT_PATH = 'enterprise_access.apps.subsidy_access_policy.content_metadata_api.EnterpriseCatalogApiClient'
 
 
 @ddt.ddt
@@ -71,3 +85,143 @@ class ContentMetadataApiTests(TestCase):
             )
         if not expect_raises:
             assert actual_result == expected_result
+
+
+@mock.patch(CATALOG_CLIENT_PATH)
+class CatalogContainsContentKeysTests(TestCase):
+    """
+    Tests for ``get_and_cache_catalog_contains_content_keys()``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.catalog_uuid = uuid4()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(django_cache.clear)
+
+    @staticmethod
+    def _contains_any_of(keys_in_catalog):
+        return lambda catalog_uuid, content_keys: any(key in keys_in_catalog for key in content_keys)
+
+    @staticmethod
+    def _metadata_in_catalog(records):
+        return lambda catalog_uuid, content_keys: {
+            'results': [record for record in records if record['key'] in content_keys],
+        }
+
+    def test_single_request_when_none_are_contained(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.return_value = {'results': []}
+        mock_client.contains_content_items.return_value = False
+
+        result = get_and_cache_catalog_contains_content_keys(self.catalog_uuid, ['a', 'b', 'c'])
+
+        self.assertEqual(result, {'a': False, 'b': False, 'c': False})
+        mock_client.catalog_content_metadata.assert_called_once_with(self.catalog_uuid, ['a', 'b', 'c'])
+        mock_client.contains_content_items.assert_called_once_with(self.catalog_uuid, ['a', 'b', 'c'])
+
+    def test_bulk_metadata_decides_inclusion_per_key(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.side_effect = self._metadata_in_catalog([
+            {'key': 'course-a', 'course_runs': [{'key': 'run-a'}]},
+            {'key': 'b', 'course_runs': []},
+        ])
+        mock_client.contains_content_items.return_value = False
+
+        result = get_and_cache_catalog_contains_content_keys(self.catalog_uuid, ['run-a', 'b', 'c'])
+
+        # The course run is answered for by its course, and only the unknown key is checked on its own.
+        self.assertEqual(result, {'run-a': True, 'b': True, 'c': False})
+        mock_client.contains_content_items.assert_called_once_with(self.catalog_uuid, ['c'])
+
+    def test_no_fallback_when_bulk_metadata_answers_every_key(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.side_effect = self._metadata_in_catalog([{'key': 'a'}, {'key': 'b'}])
+
+        result = get_and_cache_catalog_contains_content_keys(self.catalog_uuid, ['a', 'b'])
+
+        self.assertEqual(result, {'a': True, 'b': True})
+        self.assertFalse(mock_client.contains_content_items.called)
+
+    def test_per_key_fallback_for_unknown_keys(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.catalog_content_metadata.side_effect = HTTPError('boom')
+        mock_client.contains_content_items.side_effect = self._contains_any_of({'b'})
+
+        result = get_and_cache_catalog_contains_content_keys(self.catalog_uuid, ['a', 'b', 'c'])
+
+        self.assertEqual(result, {'a': False, 'b': True, 'c': False})
+        self.assertEqual(mock_client.contains_content_items.call_count, 4)
+
+    def test_only_misses_are_fetched(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.contains_content_items.side_effect = self._contains_any_of({'a'})
+        self.assertTrue(get_and_cache_catalog_contains_content(self.catalog_uuid, 'a'))
+        mock_client.contains_content_items.reset_mock()
+
+        # Hits from the django cache, as well as the request cache, are reused.
+        RequestCache.clear_all_namespaces()
+        result = get_and_cache_catalog_contains_content_keys(self.catalog_uuid, ['a', 'b'])
+
+        self.assertEqual(result, {'a': True, 'b': False})
+        mock_client.contains_content_items.assert_called_once_with(self.catalog_uuid, ['b'])
+
+        mock_client.contains_content_items.reset_mock()
+        self.assertFalse(get_and_cache_catalog_contains_content(self.catalog_uuid, 'b'))
+        self.assertFalse(mock_client.contains_content_items.called)
+
+
+@mock.patch(SUBSIDY_CLIENT_PATH)
+class ContentMetadataForKeysTests(TestCase):
+    """
+    Tests for ``get_and_cache_content_metadata_for_keys()``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.customer_uuid = uuid4()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(django_cache.clear)
+
+    @staticmethod
+    def _metadata(customer_uuid, content_key):
+        if content_key == 'broken':
+            raise HTTPError('boom')
+        return {'content_key': content_key, 'content_price': 100}
+
+    def test_fetches_each_key_once(self, mock_get_client):
+        mock_client = mock_get_client.return_value
+        mock_client.get_subsidy_content_data.side_effect = self._metadata
+
+        outcome = get_and_cache_content_metadata_for_keys(self.customer_uuid, ['a', 'b', 'a'])
+
+        self.assertEqual(outcome.results, {'a': self._metadata(None, 'a'), 'b': self._metadata(None, 'b')})
+        self.assertEqual(outcome.errors, {})
+        self.assertEqual(mock_client.get_subsidy_content_data.call_count, 2)
+
+    def test_only_misses_are_fetched(self, mock_get_client):
+        mock_client = mock_get_client.return_value
+        mock_client.get_subsidy_content_data.side_effect = self._metadata
+        get_and_cache_content_metadata(self.customer_uuid, 'a')
+        mock_client.get_subsidy_content_data.reset_mock()
+
+        RequestCache.clear_all_namespaces()
+        outcome = get_and_cache_content_metadata_for_keys(self.customer_uuid, ['a', 'b'])
+
+        self.assertEqual(set(outcome.results), {'a', 'b'})
+        mock_client.get_subsidy_content_data.assert_called_once_with(self.customer_uuid, 'b')
+
+    def test_errors_are_returned_per_key(self, mock_get_client):
+        mock_client = mock_get_client.return_value
+        mock_client.get_subsidy_content_data.side_effect = self._metadata
+
+        outcome = get_and_cache_content_metadata_for_keys(self.customer_uuid, ['a', 'broken'])
+
+        self.assertEqual(outcome.results, {'a': self._metadata(None, 'a')})
+        self.assertEqual(list(outcome.errors), ['broken'])
+        self.assertIsInstance(outcome.errors['broken'], HTTPError)
+        self.assertEqual(outcome.pending, [])
+        with self.assertRaises(HTTPError):
+            get_and_cache_content_metadata(self.customer_uuid, 'broken')
+
+        mock_client.get_subsidy_content_data.reset_mock()
+        self.assertEqual(get_and_cache_content_metadata(self.customer_uuid, 'a'), self._metadata(None, 'a'))
+        self.assertFalse(mock_client.get_subsidy_content_data.called)
@@ -0,0 +1,97 @@
+"""
+Tests for the credits_available module.
+"""
+from unittest import mock
+from uuid import uuid4
+
+from django.test import TestCase
+
+from enterprise_access.apps.content_assignments.constants import AssignmentActions, LearnerContentAssignmentStateChoices
+from enterprise_access.apps.content_assignments.tests.factories import LearnerContentAssignmentFactory
+
+from ..credits_available import LearnerAssignmentsLoader
+from .factories import AssignedLearnerCreditAccessPolicyFactory, PerLearnerSpendCapLearnerCreditAccessPolicyFactory
+
+LMS_USER_ID = 42
+
+
+class LearnerAssignmentsLoaderTests(TestCase):
+    """
+    Tests for ``LearnerAssignmentsLoader``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.catalog_uuid = uuid4()
+        # Two assignable policies sharing a catalog, and one with its own catalog.
+        self.assigned_policies = [
+            AssignedLearnerCreditAccessPolicyFactory(catalog_uuid=self.catalog_uuid),
+            AssignedLearnerCreditAccessPolicyFactory(catalog_uuid=self.catalog_uuid),
+            AssignedLearnerCreditAccessPolicyFactory(),
+        ]
+        self.spend_cap_policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+
+        self.allocated_assignments = [
+            LearnerContentAssignmentFactory(
+                assignment_configuration=policy.assignment_configuration,
+                lms_user_id=LMS_USER_ID,
+                state=LearnerContentAssignmentStateChoices.ALLOCATED,
+            )
+            for policy in self.assigned_policies
+        ]
+        self.allocated_assignments[0].add_successful_linked_action()
+        acknowledged_assignment = LearnerContentAssignmentFactory(
+            assignment_configuration=self.assigned_policies[0].assignment_configuration,
+            lms_user_id=LMS_USER_ID,
+            state=LearnerContentAssignmentStateChoices.CANCELLED,
+        )
+        acknowledged_assignment.add_successful_cancel_action()
+        acknowledged_assignment.add_successful_acknowledged_cancelled_action()
+        # Another learner's assignment.
+        LearnerContentAssignmentFactory(
+            assignment_configuration=self.assigned_policies[0].assignment_configuration,
+            lms_user_id=LMS_USER_ID + 1,
+        )
+
+        metadata_patcher = mock.patch(
+            'enterprise_access.apps.subsidy_access_policy.credits_available.get_content_metadata_for_assignments',
+            side_effect=lambda catalog_uuid, assignments: {
+                assignment.content_key: {'key': assignment.content_key} for assignment in assignments
+            },
+        )
+        self.mock_get_content_metadata_for_assignments = metadata_patcher.start()
+        self.addCleanup(metadata_patcher.stop)
+
+    def _policies(self):
+        return [*self.assigned_policies, self.spend_cap_policy]
+
+    def test_load(self):
+        policies = self._policies()
+        for policy in policies:
+            # As loaded for the view, with their configurations.
+            policy.assignment_configuration  # pylint: disable=pointless-statement
+
+        # One query for the assignments, one for their actions.
+        with self.assertNumQueries(2):
+            assignments_by_policy_uuid = LearnerAssignmentsLoader(policies, LMS_USER_ID).load()
+
+        self.assertEqual(set(assignments_by_policy_uuid), {policy.uuid for policy in self.assigned_policies})
+        for policy, assignment in zip(self.assigned_policies, self.allocated_assignments):
+            policy_assignments = assignments_by_policy_uuid[policy.uuid]
+            self.assertEqual(policy_assignments.assignments, [assignment])
+            self.assertEqual(
+                policy_assignments.content_metadata[assignment.content_key],
+                {'key': assignment.content_key},
+            )
+
+        # Content metadata is fetched once per catalog.
+        self.assertEqual(self.mock_get_content_metadata_for_assignments.call_count, 2)
+
+    def test_actions_need_no_further_queries(self):
+        assignments_by_policy_uuid = LearnerAssignmentsLoader(self._policies(), LMS_USER_ID).load()
+        assignment = assignments_by_policy_uuid[self.assigned_policies[0].uuid].assignments[0]
+
+        with self.assertNumQueries(0):
+            actions = list(assignment.actions.all())
+            self.assertEqual([action.action_type for action in actions], [AssignmentActions.LEARNER_LINKED])
+            self.assertIsNone(actions[0].learner_acknowledged)
+            self.assertIsNone(assignment.learner_acknowledged)
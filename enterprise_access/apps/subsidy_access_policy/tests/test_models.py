@@ -2,6 +2,8 @@
 Tests for subsidy_access_policy models.
 """
 import contextlib
+import threading
+import time
 from datetime import datetime, timedelta
 from unittest.mock import ANY, patch
 from uuid import uuid4
@@ -10,8 +12,10 @@ import ddt
 import pytest
 import requests
 from django.conf import settings
+from django.core.cache import cache as django_cache
 from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from enterprise_access.apps.content_assignments.constants import (
     AssignmentActionErrors,
@@ -37,12 +41,17 @@ from enterprise_access.apps.subsidy_access_policy.constants import (
     REASON_POLICY_SPEND_LIMIT_REACHED,
     REASON_SUBSIDY_EXPIRED
 )
-from enterprise_access.apps.subsidy_access_policy.exceptions import MissingAssignment, SubsidyAPIHTTPError
+from enterprise_access.apps.subsidy_access_policy.exceptions import (
+    MissingAssignment,
+    SubsidyAccessPolicySpendReservationFailed,
+    SubsidyAPIHTTPError
+)
 from enterprise_access.apps.subsidy_access_policy.models import (
     ALLOW_LATE_ENROLLMENT_KEY,
     REQUEST_CACHE_NAMESPACE,
     PerLearnerEnrollmentCreditAccessPolicy,
     PerLearnerSpendCreditAccessPolicy,
+    PolicySpendSnapshot,
     SubsidyAccessPolicy,
     SubsidyAccessPolicyLockAttemptFailed
 )
@@ -56,6 +65,7 @@ from enterprise_access.cache_utils import request_cache
 from enterprise_access.utils import localized_utcnow
 from test_utils import TEST_ENTERPRISE_GROUP_UUID, TEST_USER_RECORD, TEST_USER_RECORD_NO_GROUPS
 
+from ..api import reconcile_policy_spend_snapshots
 from ..constants import AccessMethods
 from ..exceptions import PriceValidationError
 from .mixins import MockPolicyDependenciesMixin
@@ -985,6 +995,50 @@ class SubsidyAccessPolicyResolverTests(TestCase):
         assert SubsidyAccessPolicy.resolve_policy(policies) == self.policy_five
         assert SubsidyAccessPolicy.resolve_policy(list(reversed(policies))) == self.policy_five
 
+    @override_settings(MULTI_POLICY_RESOLUTION_ENABLED=True)
+    def test_resolve_policy_with_trace(self):
+        """
+        Test the resolution trace ranks every candidate, reading each subsidy record only once.
+        """
+        policies = [self.policy_one, self.policy_two, self.policy_three]
+
+        resolved_policy, trace = SubsidyAccessPolicy.resolve_policy_with_trace(policies)
+
+        assert resolved_policy == self.policy_two
+        assert trace['resolved_by'] == 'score'
+        assert [entry['policy_uuid'] for entry in trace['ranked']] == [
+            str(self.policy_two.uuid), str(self.policy_one.uuid), str(self.policy_three.uuid),
+        ]
+        assert trace['ranked'][0]['balance'] == 50
+        for mock_subsidy_record in (
+            self.mock_policy_one_subsidy_record,
+            self.mock_policy_two_subsidy_record,
+            self.mock_policy_three_subsidy_record,
+        ):
+            assert mock_subsidy_record.call_count == 1
+
+    @override_settings(MULTI_POLICY_RESOLUTION_ENABLED=True)
+    def test_resolve_policy_reuses_given_policy_facts(self):
+        """
+        Test that policy facts passed in are used and filled in, rather than recomputed.
+        """
+        policy_facts = {}
+        SubsidyAccessPolicy.resolve_policy([self.policy_one, self.policy_two], policy_facts=policy_facts)
+        SubsidyAccessPolicy.resolve_policy([self.policy_one, self.policy_three], policy_facts=policy_facts)
+
+        assert set(policy_facts) == {self.policy_one.uuid, self.policy_two.uuid, self.policy_three.uuid}
+        assert self.mock_policy_one_subsidy_record.call_count == 1
+
+    def test_resolve_policy_trace_when_disabled(self):
+        """
+        Test that no facts are computed when multi-policy resolution is disabled.
+        """
+        resolved_policy, trace = SubsidyAccessPolicy.resolve_policy_with_trace([self.policy_one, self.policy_two])
+
+        assert resolved_policy == self.policy_one
+        assert trace == {'resolved_by': 'multi_policy_resolution_disabled', 'ranked': []}
+        self.mock_policy_one_subsidy_record.assert_not_called()
+
 
 @ddt.ddt
 class AssignedLearnerCreditAccessPolicyTests(MockPolicyDependenciesMixin, TestCase):
@@ -1535,3 +1589,411 @@ class PolicyGroupAssociationTests(MockPolicyDependenciesMixin, TestCase):
 
         self.assertEqual(policy.enterprise_group_uuid, self.group_uuid)
         self.assertIsNotNone(policy.subsidy_access_policy)
+
+    def test_includes_learner_loads_group_associations_once(self):
+        """
+        Test that the group associations of all of a customer's policies are loaded in one query,
+        shared by every policy's ``includes_learner()``, and reloaded once associations change.
+        """
+        customer_uuid = uuid4()
+        ungrouped_policy, grouped_policy, other_grouped_policy = [
+            PerLearnerSpendCapLearnerCreditAccessPolicyFactory(enterprise_customer_uuid=customer_uuid)
+            for _ in range(3)
+        ]
+        PolicyGroupAssociationFactory(enterprise_group_uuid=self.group_uuid, subsidy_access_policy=grouped_policy)
+        PolicyGroupAssociationFactory(enterprise_group_uuid=uuid4(), subsidy_access_policy=other_grouped_policy)
+        self.mock_enterprise_user_record.return_value = {
+            **TEST_USER_RECORD, 'enterprise_group': [str(self.group_uuid)],
+        }
+
+        with self.assertNumQueries(1):
+            self.assertEqual(ungrouped_policy.includes_learner(self.lms_user_id), (True, None))
+            self.assertEqual(grouped_policy.includes_learner(self.lms_user_id), (True, None))
+            self.assertEqual(
+                other_grouped_policy.includes_learner(self.lms_user_id),
+                (False, REASON_LEARNER_NOT_IN_ENTERPRISE_GROUP),
+            )
+            self.assertEqual(grouped_policy.group_uuids(), (self.group_uuid,))
+
+        PolicyGroupAssociationFactory(enterprise_group_uuid=self.group_uuid, subsidy_access_policy=other_grouped_policy)
+        self.assertEqual(other_grouped_policy.includes_learner(self.lms_user_id), (True, None))
+
+    def test_includes_learner_normalizes_group_uuids(self):
+        """
+        Test that learners' group uuids match the policy's regardless of how they're formatted.
+        """
+        PolicyGroupAssociationFactory(enterprise_group_uuid=self.group_uuid, subsidy_access_policy=self.access_policy)
+        for group_uuid in (self.group_uuid.hex, str(self.group_uuid).upper(), self.group_uuid):
+            self.mock_enterprise_user_record.return_value = {
+                **TEST_USER_RECORD, 'enterprise_group': ['not-a-uuid', group_uuid],
+            }
+            self.assertEqual(self.access_policy.includes_learner(self.lms_user_id), (True, None))
+
+
+class RedemptionConcurrencyTests(MockPolicyDependenciesMixin, TestCase):
+    """
+    Tests concurrent redemption against a single policy, by different learners.
+    """
+    course_id = 'course-v1:DemoX+flossing'
+    content_price = 100
+    num_learners = 8
+
+    def setUp(self):
+        super().setUp()
+        self.committed_spend = 0
+        self.spend_lock = threading.Lock()
+        self.mock_get_content_metadata.return_value = {'content_price': self.content_price}
+        self.mock_subsidy_client.list_subsidy_transactions.side_effect = lambda **kwargs: {
+            'results': [],
+            'aggregates': {'total_quantity': -self.committed_spend},
+        }
+        self.mock_subsidy_client.create_subsidy_transaction.side_effect = self._create_transaction
+
+    def _create_transaction(self, **kwargs):
+        # Simulate a slow subsidy API request, during which we hold our locks.
+        time.sleep(0.2)
+        with self.spend_lock:
+            self.committed_spend += self.content_price
+        return {'uuid': str(uuid4()), 'lms_user_id': kwargs['lms_user_id']}
+
+    def _redeem_concurrently(self, policy, lock_whole_policy=False):
+        """
+        Has ``num_learners`` learners simultaneously lock and redeem against the given policy.
+
+        Returns:
+            dict: lms_user_id -> 'redeemed', or the class of the exception that prevented redemption.
+        """
+        start_together = threading.Barrier(self.num_learners)
+        outcomes = {}
+
+        def redeem(lms_user_id):
+            start_together.wait()
+            lock_kwargs = {} if lock_whole_policy else {'lms_user_id': lms_user_id}
+            try:
+                with policy.lock(**lock_kwargs):
+                    policy.redeem(lms_user_id, self.course_id, [])
+                outcomes[lms_user_id] = 'redeemed'
+            except SubsidyAccessPolicyLockAttemptFailed as exc:
+                outcomes[lms_user_id] = exc.__class__
+
+        threads = [threading.Thread(target=redeem, args=(lms_user_id,)) for lms_user_id in range(self.num_learners)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_per_learner_locks_increase_redemption_throughput(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=10000, per_learner_spend_limit=1000)
+
+        whole_policy_outcomes = self._redeem_concurrently(policy, lock_whole_policy=True)
+        per_learner_outcomes = self._redeem_concurrently(policy)
+
+        # Locking the whole policy only lets one of the simultaneous requests through,
+        # the rest would be 429s.  Locking each learner lets all of them through.
+        self.assertEqual(list(whole_policy_outcomes.values()).count('redeemed'), 1)
+        self.assertEqual(list(per_learner_outcomes.values()).count('redeemed'), self.num_learners)
+        self.assertEqual(policy.total_reserved_spend(), 0)
+
+    def test_spend_limit_holds_under_concurrent_redemption(self):
+        redeemable_count = 3
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(
+            spend_limit=self.content_price * redeemable_count,
+            per_learner_spend_limit=1000,
+        )
+
+        outcomes = self._redeem_concurrently(policy)
+
+        redeemed_count = list(outcomes.values()).count('redeemed')
+        self.assertEqual(redeemed_count, redeemable_count)
+        self.assertEqual(
+            list(outcomes.values()).count(SubsidyAccessPolicySpendReservationFailed),
+            self.num_learners - redeemable_count,
+        )
+        self.assertLessEqual(self.committed_spend, policy.spend_limit)
+        self.assertEqual(policy.total_reserved_spend(), 0)
+
+    def test_spend_reservation_is_released_on_failure(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=10000, per_learner_spend_limit=1000)
+        self.mock_subsidy_client.create_subsidy_transaction.side_effect = requests.exceptions.HTTPError
+
+        with self.assertRaises(SubsidyAPIHTTPError):
+            policy.redeem(12345, self.course_id, [])
+
+        self.assertEqual(policy.total_reserved_spend(), 0)
+
+    def test_released_reservations_dont_affect_others(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=10000, per_learner_spend_limit=1000)
+
+        with policy.reserve_spend(self.course_id, 300):
+            with policy.reserve_spend(self.course_id, 200):
+                self.assertEqual(policy.total_reserved_spend(), 500)
+            self.assertEqual(policy.total_reserved_spend(), 300)
+
+        self.assertEqual(policy.total_reserved_spend(), 0)
+
+    @override_settings(POLICY_SPEND_RESERVATION_TIMEOUT=0.2)
+    def test_leaked_reservations_expire(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=10000, per_learner_spend_limit=1000)
+
+        stripe_key = policy._take_spend_reservation(200)  # pylint: disable=protected-access
+        self.assertEqual(policy.total_reserved_spend(), 200)
+
+        time.sleep(0.7)
+        self.assertEqual(policy.total_reserved_spend(), 0)
+
+        # Releasing a reservation from an expired counter doesn't bring the counter back.
+        policy._release_spend_reservation(stripe_key, 200)  # pylint: disable=protected-access
+        self.assertIsNone(django_cache.get(stripe_key))
+
+    @override_settings(POLICY_SPEND_RESERVATION_STRIPES=2)
+    def test_reservations_share_a_bounded_number_of_counters(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=10000, per_learner_spend_limit=1000)
+
+        stripe_keys = {
+            policy._take_spend_reservation(10)  # pylint: disable=protected-access
+            for _ in range(20)
+        }
+
+        self.assertLessEqual(len(stripe_keys), 2)
+        self.assertEqual(policy.total_reserved_spend(), 200)
+
+    def _hold_redemption_locks(self, policy, lms_user_id):
+        """
+        Holds the locks of a redemption by ``lms_user_id`` from a background thread, until the returned event is set.
+        """
+        held, done = threading.Event(), threading.Event()
+
+        def redeem():
+            with policy.lock_for_redemption(lms_user_id):
+                held.set()
+                done.wait(5)
+
+        redemption = threading.Thread(target=redeem)
+        redemption.start()
+        self.addCleanup(redemption.join)
+        self.addCleanup(done.set)
+        held.wait()
+        return done
+
+    def test_allocation_excludes_concurrent_redemption_of_assignments(self):
+        policy = AssignedLearnerCreditAccessPolicyFactory(
+            spend_limit=10000,
+            assignment_configuration=AssignmentConfiguration.objects.create(),
+        )
+
+        redemption_done = self._hold_redemption_locks(policy, 1)
+        with self.assertRaises(SubsidyAccessPolicyLockAttemptFailed):
+            with policy.lock():
+                pass
+
+        redemption_done.set()
+        with policy.lock():
+            # While allocating, redemptions (by any learner) are turned away.
+            with self.assertRaises(SubsidyAccessPolicyLockAttemptFailed):
+                with policy.lock_for_redemption(2):
+                    pass
+
+    def test_redemption_of_non_assignable_policies_only_locks_the_learner(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=10000, per_learner_spend_limit=1000)
+
+        self._hold_redemption_locks(policy, 1)
+        with policy.lock(), policy.lock_for_redemption(2):
+            pass
+
+
+class PolicyLockTests(MockPolicyDependenciesMixin, TestCase):
+    """
+    Tests for blocking acquisition, and lease renewal, of policy locks.
+    """
+    lms_user_id = 12345
+
+    def setUp(self):
+        super().setUp()
+        self.policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+
+    def _hold_lock_in_background(self, hold_seconds):
+        acquired = threading.Event()
+
+        def hold():
+            with self.policy.lock(lms_user_id=self.lms_user_id):
+                acquired.set()
+                time.sleep(hold_seconds)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        self.addCleanup(holder.join)
+        acquired.wait()
+
+    def test_lock_waits_for_release(self):
+        self._hold_lock_in_background(0.2)
+
+        with self.policy.lock(lms_user_id=self.lms_user_id, wait_seconds=5) as lock_id:
+            self.assertIsNotNone(lock_id)
+
+    def test_lock_wait_budget_is_bounded(self):
+        self._hold_lock_in_background(1)
+
+        started_at = time.monotonic()
+        with self.assertRaises(SubsidyAccessPolicyLockAttemptFailed):
+            with self.policy.lock(lms_user_id=self.lms_user_id, wait_seconds=0.1):
+                pass
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_lock_without_wait_fails_fast(self):
+        self._hold_lock_in_background(0.2)
+
+        self.assertIsNone(self.policy.acquire_lock(lms_user_id=self.lms_user_id))
+
+    @override_settings(POLICY_LOCK_LEASE_TIMEOUT=0.3)
+    def test_lease_is_renewed_while_held(self):
+        with self.policy.lock(lms_user_id=self.lms_user_id):
+            time.sleep(0.6)
+            self.assertIsNone(self.policy.acquire_lock(lms_user_id=self.lms_user_id))
+
+        self.assertIsNotNone(self.policy.acquire_lock(lms_user_id=self.lms_user_id))
+
+    @override_settings(POLICY_LOCK_LEASE_TIMEOUT=0.3)
+    def test_redemption_leases_are_renewed_by_one_thread(self):
+        policy = AssignedLearnerCreditAccessPolicyFactory(
+            spend_limit=10000,
+            assignment_configuration=AssignmentConfiguration.objects.create(),
+        )
+
+        def renewers():
+            return {thread for thread in threading.enumerate() if thread.name == 'policy-lock-renewal'}
+
+        renewers_before = renewers()
+        with policy.lock_for_redemption(self.lms_user_id):
+            started_renewers = renewers() - renewers_before
+            time.sleep(0.6)
+            self.assertIsNone(policy.acquire_lock())
+            self.assertIsNone(policy.acquire_lock(lms_user_id=self.lms_user_id))
+
+        self.assertEqual(len(started_renewers), 1)
+        self.assertIsNotNone(policy.acquire_lock())
+
+    def test_release_only_releases_own_lock(self):
+        lock_id = self.policy.acquire_lock()
+        # Simulate our lease expiring, and being taken over by someone else.
+        django_cache.delete(self.policy.lock_resource_key())
+        other_lock_id = self.policy.acquire_lock()
+
+        self.policy.release_lock(lock_id=lock_id)
+
+        self.assertEqual(django_cache.get(self.policy.lock_resource_key()), other_lock_id)
+
+
+@override_settings(POLICY_SPEND_SNAPSHOT_MAX_AGE=60 * 15)
+class PolicySpendSnapshotTests(MockPolicyDependenciesMixin, TestCase):
+    """
+    Tests for ``PolicySpendSnapshot`` and how policies answer spend checks from it.
+    """
+    lms_user_id = 12345
+    course_id = 'course-v1:DemoX+flossing'
+
+    def setUp(self):
+        super().setUp()
+        self.policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=None)
+        self.mock_subsidy_client.list_subsidy_transactions.return_value = {
+            'results': [], 'aggregates': {'total_quantity': -1000},
+        }
+        self.addCleanup(request_cache(namespace=REQUEST_CACHE_NAMESPACE).clear)
+
+    def _set_live_total_redeemed(self, total_quantity):
+        self.mock_subsidy_client.list_subsidy_transactions.return_value = {
+            'results': [], 'aggregates': {'total_quantity': total_quantity},
+        }
+        request_cache(namespace=REQUEST_CACHE_NAMESPACE).clear()
+
+    def test_total_redeemed_is_answered_from_fresh_snapshot(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+        self._set_live_total_redeemed(-5000)
+        self.mock_subsidy_client.list_subsidy_transactions.reset_mock()
+
+        self.assertEqual(self.policy.total_redeemed, -1000)
+        self.mock_subsidy_client.list_subsidy_transactions.assert_not_called()
+
+    def test_stale_snapshot_is_ignored(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+        PolicySpendSnapshot.objects.filter(subsidy_access_policy=self.policy).update(
+            reconciled_at=timezone.now() - timedelta(seconds=settings.POLICY_SPEND_SNAPSHOT_MAX_AGE + 1),
+        )
+        self._set_live_total_redeemed(-5000)
+
+        self.assertEqual(self.policy.total_redeemed, -5000)
+
+    @override_settings(POLICY_SPEND_SNAPSHOT_MAX_AGE=0)
+    def test_snapshots_can_be_disabled(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+        self._set_live_total_redeemed(-5000)
+
+        self.assertEqual(self.policy.total_redeemed, -5000)
+
+    def test_redemptions_and_reversals_update_snapshot(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+        existing_transaction = {'uuid': str(uuid4()), 'quantity': -300}
+        self.mock_subsidy_client.create_subsidy_transaction.return_value = existing_transaction
+
+        self.policy.redeem(self.lms_user_id, self.course_id, [])
+        self.assertEqual(self.policy.total_redeemed, -1300)
+
+        # Idempotently redeeming again returns the existing transaction, which is already counted.
+        self.policy.redeem(self.lms_user_id, self.course_id, [existing_transaction])
+        self.assertEqual(self.policy.total_redeemed, -1300)
+
+        PolicySpendSnapshot.record_redemption(self.policy.uuid, 300)
+        self.assertEqual(self.policy.total_redeemed, -1000)
+
+    def test_reconcile_records_drift(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+        PolicySpendSnapshot.record_redemption(self.policy.uuid, -200)
+        self._set_live_total_redeemed(-1500)
+
+        snapshot = PolicySpendSnapshot.reconcile(self.policy)
+
+        self.assertEqual(snapshot.total_redeemed, -1500)
+        self.assertEqual(snapshot.redeemed_drift, -300)
+
+    def test_reconcile_keeps_increments_made_while_fetching(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+
+        def list_subsidy_transactions(**kwargs):
+            # A redemption is recorded while live totals are being fetched, and isn't part of them yet.
+            PolicySpendSnapshot.record_redemption(self.policy.uuid, -200)
+            return {'results': [], 'aggregates': {'total_quantity': -1000}}
+
+        self.mock_subsidy_client.list_subsidy_transactions.side_effect = list_subsidy_transactions
+
+        snapshot = PolicySpendSnapshot.reconcile(self.policy)
+
+        self.assertEqual(snapshot.total_redeemed, -1200)
+        self.assertEqual(snapshot.redeemed_drift, 0)
+
+    def test_reversals_are_recorded_once(self):
+        PolicySpendSnapshot.reconcile(self.policy)
+        transaction_uuid = uuid4()
+
+        self.assertTrue(PolicySpendSnapshot.record_reversal(self.policy.uuid, transaction_uuid, -300))
+        self.assertFalse(PolicySpendSnapshot.record_reversal(self.policy.uuid, transaction_uuid, -300))
+
+        self.assertEqual(self.policy.total_redeemed, -700)
+
+    @override_settings(POLICY_SPEND_SNAPSHOT_DRIFT_WARNING_THRESHOLD=100)
+    def test_reconcile_policy_spend_snapshots(self):
+        drifting_policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=None)
+        failing_policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(spend_limit=None)
+        PolicySpendSnapshot.reconcile(drifting_policy)
+        PolicySpendSnapshot.record_redemption(drifting_policy.uuid, 500)
+
+        def list_subsidy_transactions(subsidy_access_policy_uuid, **kwargs):
+            if subsidy_access_policy_uuid == failing_policy.uuid:
+                raise requests.exceptions.ConnectionError('boom')
+            return {'results': [], 'aggregates': {'total_quantity': -1000}}
+
+        self.mock_subsidy_client.list_subsidy_transactions.side_effect = list_subsidy_transactions
+
+        results = reconcile_policy_spend_snapshots([self.policy.uuid, drifting_policy.uuid, failing_policy.uuid])
+
+        self.assertEqual(results, {'reconciled': 2, 'drifted': 1, 'failed': 1})
+        self.assertFalse(PolicySpendSnapshot.objects.filter(subsidy_access_policy=failing_policy).exists())
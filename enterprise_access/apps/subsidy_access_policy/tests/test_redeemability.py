@@ -0,0 +1,133 @@
+"""
+Tests for the redeemability module.
+"""
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.test import TestCase, override_settings
+from edx_django_utils.cache import RequestCache
+from requests.exceptions import HTTPError
+
+from enterprise_access.concurrency_utils import FanOutResult
+
+from ..constants import REASON_CONTENT_NOT_IN_CATALOG, REASON_POLICY_EXPIRED
+from ..models import SubsidyAccessPolicy
+from ..redeemability import PolicyRedeemabilityEvaluator
+from .factories import PerLearnerEnrollmentCapLearnerCreditAccessPolicyFactory
+from .mixins import MockPolicyDependenciesMixin
+
+LMS_USER_ID = 42
+
+
+class PolicyRedeemabilityEvaluatorTests(MockPolicyDependenciesMixin, TestCase):
+    """
+    Tests for ``PolicyRedeemabilityEvaluator``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.customer_uuid = uuid4()
+        self.catalog_uuid = uuid4()
+        self.subsidy_uuid = uuid4()
+        # Two policies that share a customer, catalog, and subsidy.
+        self.policy_a, self.policy_b = [
+            PerLearnerEnrollmentCapLearnerCreditAccessPolicyFactory(
+                enterprise_customer_uuid=self.customer_uuid,
+                catalog_uuid=self.catalog_uuid,
+                subsidy_uuid=self.subsidy_uuid,
+                per_learner_enrollment_limit=None,
+                spend_limit=None,
+            )
+            for _ in range(2)
+        ]
+        self.inactive_policy = PerLearnerEnrollmentCapLearnerCreditAccessPolicyFactory(
+            enterprise_customer_uuid=self.customer_uuid,
+            active=False,
+        )
+        self.mock_catalog_contains_content_key.side_effect = lambda content_key: content_key != 'not-in-catalog'
+        self.mock_get_content_metadata.return_value = {'content_price': 100}
+        self.mock_subsidy_client.can_redeem.return_value = {
+            'can_redeem': True, 'active': True, 'all_transactions': [],
+        }
+        self.addCleanup(RequestCache.clear_all_namespaces)
+
+    def _evaluator(self):
+        return PolicyRedeemabilityEvaluator(
+            [self.policy_a, self.policy_b, self.inactive_policy],
+            LMS_USER_ID,
+            skip_customer_user_check=True,
+        )
+
+    def test_evaluate_all_returns_verdicts_per_content_key(self):
+        results = self._evaluator().evaluate_all(['course-1', 'not-in-catalog'])
+
+        redeemable, non_redeemable = results['course-1']
+        self.assertEqual(set(redeemable), {self.policy_a, self.policy_b})
+        self.assertEqual(dict(non_redeemable), {REASON_POLICY_EXPIRED: [self.inactive_policy]})
+
+        redeemable, non_redeemable = results['not-in-catalog']
+        self.assertEqual(redeemable, [])
+        self.assertEqual(
+            dict(non_redeemable),
+            {
+                REASON_CONTENT_NOT_IN_CATALOG: [self.policy_a, self.policy_b],
+                REASON_POLICY_EXPIRED: [self.inactive_policy],
+            },
+        )
+
+    def test_subsidy_can_redeem_fetched_once_per_subsidy_and_key(self):
+        self._evaluator().evaluate_all(['course-1', 'course-2', 'not-in-catalog'])
+
+        # Two policies share one subsidy, and nothing is fetched for content outside the catalog.
+        self.assertEqual(self.mock_subsidy_client.can_redeem.call_count, 2)
+        self.mock_subsidy_client.can_redeem.assert_any_call(self.subsidy_uuid, LMS_USER_ID, 'course-1')
+        self.mock_subsidy_client.can_redeem.assert_any_call(self.subsidy_uuid, LMS_USER_ID, 'course-2')
+
+    def test_prefetch_continues_past_content_metadata_errors(self):
+        with patch.object(
+            SubsidyAccessPolicy,
+            'get_content_metadata_for_keys',
+            return_value=FanOutResult({'course-1': {'content_price': 100}}, {'course-2': HTTPError('boom')}, []),
+        ):
+            self._evaluator().prefetch(['course-1', 'course-2'])
+
+        # Only the metadata of course-2 is missing, so course-1 is still prefetched.
+        self.mock_subsidy_client.can_redeem.assert_called_once_with(self.subsidy_uuid, LMS_USER_ID, 'course-1')
+
+    def test_prefetch_skips_inactive_policies(self):
+        evaluator = PolicyRedeemabilityEvaluator([self.inactive_policy], LMS_USER_ID)
+        evaluator.prefetch(['course-1'])
+
+        self.assertFalse(self.mock_catalog_contains_content_key.called)
+        self.assertFalse(self.mock_get_content_metadata.called)
+        self.assertFalse(self.mock_subsidy_client.can_redeem.called)
+        self.assertFalse(self.mock_enterprise_user_record.called)
+
+    def test_prefetch_credit_available_warms_request_cache(self):
+        self.mock_subsidy_client.retrieve_subsidy.return_value = {
+            'is_active': True, 'current_balance': 1000,
+        }
+        evaluator = PolicyRedeemabilityEvaluator([self.policy_a, self.policy_b], LMS_USER_ID)
+        evaluator.prefetch_credit_available()
+
+        self.mock_enterprise_user_record.assert_called_once_with(LMS_USER_ID)
+        self.mock_subsidy_client.retrieve_subsidy.assert_called_once_with(subsidy_uuid=self.subsidy_uuid)
+
+        # Subsidy records fetched on worker threads are visible to the request thread.
+        self.assertTrue(self.policy_a.credit_available(LMS_USER_ID, skip_customer_user_check=True))
+        self.assertTrue(self.policy_b.credit_available(LMS_USER_ID, skip_customer_user_check=True))
+        self.assertEqual(self.mock_subsidy_client.retrieve_subsidy.call_count, 1)
+
+    @override_settings(MULTI_POLICY_RESOLUTION_ENABLED=True)
+    def test_resolve_policy_shares_policy_facts(self):
+        self.mock_subsidy_client.retrieve_subsidy.return_value = {
+            'is_active': True, 'current_balance': 1000, 'expiration_datetime': '2030-01-01T00:00:00Z',
+        }
+        evaluator = self._evaluator()
+
+        for _ in range(3):
+            resolved_policy, trace = evaluator.resolve_policy_with_trace([self.policy_a, self.policy_b])
+            self.assertIn(resolved_policy, (self.policy_a, self.policy_b))
+            self.assertEqual(len(trace['ranked']), 2)
+
+        self.assertEqual(set(evaluator.policy_facts), {self.policy_a.uuid, self.policy_b.uuid})
+        self.assertEqual(evaluator.policy_facts[self.policy_a.uuid].balance, 1000)
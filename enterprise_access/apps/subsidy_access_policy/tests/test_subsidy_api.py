@@ -4,9 +4,17 @@ Tests for the subsidy_api module.
 import uuid
 from unittest import mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from edx_django_utils.cache import RequestCache, TieredCache
 
-from ..subsidy_api import get_and_cache_transactions_for_learner, get_redemptions_by_content_and_policy_for_learner
+from ..subsidy_api import (
+    fetch_and_cache_subsidy_record,
+    get_and_cache_transactions_for_learner,
+    get_learner_redemption_index,
+    get_redemptions_by_content_and_policy_for_learner,
+    get_tiered_cache_subsidy_record,
+    invalidate_transactions_for_learner
+)
 from .factories import PerLearnerSpendCapLearnerCreditAccessPolicyFactory
 
 
@@ -94,6 +102,53 @@ class TransactionsForLearnerTests(TestCase):
         )
         mock_client.client.get.assert_called_once_with(first_response_payload['next'])
 
+    @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.get_versioned_subsidy_client')
+    def test_transactions_are_shared_across_requests_until_invalidated(self, mock_client_getter):
+        """
+        Test that transactions are cached across requests, and refetched after they're invalidated.
+        """
+        mock_client = mock_client_getter.return_value
+        mock_client.list_subsidy_transactions.side_effect = [
+            {'next': None, 'previous': None, 'count': 1, 'results': [{'thing': 1}]},
+            {'next': None, 'previous': None, 'count': 2, 'results': [{'thing': 1}, {'thing': 2}]},
+        ]
+        subsidy_uuid = uuid.uuid4()
+        lms_user_id = 42
+
+        first_result = get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id)
+        # Simulate a later request.
+        RequestCache.clear_all_namespaces()
+        self.assertEqual(get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id), first_result)
+        self.assertEqual(mock_client.list_subsidy_transactions.call_count, 1)
+
+        invalidate_transactions_for_learner(subsidy_uuid, lms_user_id)
+
+        result = get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id)
+        self.assertEqual(result['transactions'], [{'thing': 1}, {'thing': 2}])
+        self.assertEqual(mock_client.list_subsidy_transactions.call_count, 2)
+
+    @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.get_versioned_subsidy_client')
+    def test_fetch_in_flight_during_invalidation_is_not_reused(self, mock_client_getter):
+        """
+        Test that transactions fetched before an invalidation aren't served after it.
+        """
+        subsidy_uuid = uuid.uuid4()
+        lms_user_id = 42
+
+        def list_subsidy_transactions(**kwargs):
+            # Some other request redeems while we're waiting on the subsidy service.
+            invalidate_transactions_for_learner(subsidy_uuid, lms_user_id)
+            return {'next': None, 'previous': None, 'count': 0, 'results': []}
+
+        mock_client = mock_client_getter.return_value
+        mock_client.list_subsidy_transactions.side_effect = list_subsidy_transactions
+
+        get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id)
+        RequestCache.clear_all_namespaces()
+        get_and_cache_transactions_for_learner(subsidy_uuid, lms_user_id)
+
+        self.assertEqual(mock_client.list_subsidy_transactions.call_count, 2)
+
     @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.get_and_cache_transactions_for_learner')
     def test_redemptions_by_content_and_policy(self, mock_transaction_cache):
         cake_subsidy_uuid = uuid.uuid4()
@@ -151,3 +206,110 @@ class TransactionsForLearnerTests(TestCase):
             },
             result,
         )
+
+    def test_redemptions_by_content_and_policy_lookups(self):
+        policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory()
+        other_policy = PerLearnerSpendCapLearnerCreditAccessPolicyFactory(subsidy_uuid=policy.subsidy_uuid)
+        committed = {'state': 'committed', 'reversal': None}
+        reversed_ = {'state': 'committed', 'reversal': {'state': 'committed'}}
+        transactions = [
+            {'uuid': 'alpha', 'content_key': 'content-1', 'subsidy_access_policy_uuid': str(policy.uuid), **reversed_},
+            {
+                'uuid': 'beta', 'content_key': 'content-1', 'subsidy_access_policy_uuid': str(other_policy.uuid),
+                **committed,
+            },
+            {'uuid': 'gamma', 'content_key': 'content-2', 'subsidy_access_policy_uuid': str(policy.uuid), **reversed_},
+        ]
+
+        with mock.patch(
+            'enterprise_access.apps.subsidy_access_policy.subsidy_api.get_and_cache_transactions_for_learner',
+            return_value={'transactions': transactions, 'aggregates': {}},
+        ):
+            result = get_redemptions_by_content_and_policy_for_learner([policy, other_policy], 123)
+
+        self.assertEqual(result.redemptions_for_content('content-1'), transactions[:2])
+        self.assertEqual(result.successful_redemptions_for_content('content-1'), [transactions[1]])
+        self.assertEqual(result.successful_redemptions_for_content('content-2'), [])
+        self.assertEqual(result.redemptions_for_content('content-3'), [])
+        self.assertEqual(result.policy_for_redemption('beta'), other_policy)
+        self.assertNotIn('content-3', result)
+
+
+class LearnerRedemptionIndexTests(TestCase):
+    """
+    Tests for ``LearnerRedemptionIndex`` and ``get_learner_redemption_index()``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+
+    def test_lookups_by_policy(self):
+        policy_uuid = uuid.uuid4()
+        transactions = [
+            {'subsidy_access_policy_uuid': str(policy_uuid), 'quantity': -100},
+            {'subsidy_access_policy_uuid': str(uuid.uuid4()), 'quantity': -200},
+            {'subsidy_access_policy_uuid': str(policy_uuid), 'quantity': -300},
+        ]
+
+        index = get_learner_redemption_index(uuid.uuid4(), 42, transactions)
+
+        self.assertEqual(index.for_policy(policy_uuid), [transactions[0], transactions[2]])
+        self.assertEqual(index.total_quantity_for_policy(str(policy_uuid)), -400)
+        self.assertEqual(index.for_policy(uuid.uuid4()), [])
+        self.assertEqual(index.total_quantity_for_policy(uuid.uuid4()), 0)
+
+    def test_index_is_request_cached_per_subsidy_and_learner(self):
+        subsidy_uuid = uuid.uuid4()
+        transactions = [{'subsidy_access_policy_uuid': str(uuid.uuid4()), 'quantity': -100}]
+
+        index = get_learner_redemption_index(subsidy_uuid, 42, transactions)
+
+        self.assertIs(get_learner_redemption_index(subsidy_uuid, 42, transactions), index)
+        self.assertIsNot(get_learner_redemption_index(subsidy_uuid, 43, transactions), index)
+        # Transactions that were fetched again are indexed again.
+        self.assertIsNot(get_learner_redemption_index(subsidy_uuid, 42, list(transactions)), index)
+
+    def test_index_is_invalidated_with_transactions(self):
+        subsidy_uuid = uuid.uuid4()
+        transactions = [{'subsidy_access_policy_uuid': str(uuid.uuid4()), 'quantity': -100}]
+        index = get_learner_redemption_index(subsidy_uuid, 42, transactions)
+
+        invalidate_transactions_for_learner(subsidy_uuid, 42)
+
+        self.assertIsNot(get_learner_redemption_index(subsidy_uuid, 42, transactions), index)
+
+
+class TieredCacheSubsidyRecordTests(TestCase):
+    """
+    Tests the stale-while-revalidate behavior of ``get_tiered_cache_subsidy_record``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(TieredCache.dangerous_clear_all_tiers)
+
+    @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.refresh_subsidy_record_task')
+    @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.get_versioned_subsidy_client')
+    def test_stale_record_is_served_and_revalidated(self, mock_client_getter, mock_task):
+        subsidy_uuid = str(uuid.uuid4())
+        mock_client_getter.return_value.retrieve_subsidy.return_value = {'uuid': subsidy_uuid}
+
+        with override_settings(SUBSIDY_RECORD_CACHE_SOFT_TIMEOUT=0):
+            fetch_and_cache_subsidy_record(subsidy_uuid, 'some-context')
+
+        for _ in range(2):
+            self.assertEqual(
+                get_tiered_cache_subsidy_record(subsidy_uuid, 'some-context'),
+                {'uuid': subsidy_uuid},
+            )
+        mock_task.delay.assert_called_once_with(subsidy_uuid, 'some-context')
+
+    @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.refresh_subsidy_record_task')
+    @mock.patch('enterprise_access.apps.subsidy_access_policy.subsidy_api.get_versioned_subsidy_client')
+    def test_fresh_record_is_not_revalidated(self, mock_client_getter, mock_task):
+        subsidy_uuid = str(uuid.uuid4())
+        mock_client_getter.return_value.retrieve_subsidy.return_value = {'uuid': subsidy_uuid}
+
+        fetch_and_cache_subsidy_record(subsidy_uuid)
+
+        self.assertEqual(get_tiered_cache_subsidy_record(subsidy_uuid), {'uuid': subsidy_uuid})
+        self.assertFalse(mock_task.delay.called)
@@ -2,28 +2,108 @@
 Utils for interacting with cache interfaces.
 """
 import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from functools import lru_cache
+from uuid import uuid4
 
 from django.conf import settings
-from edx_django_utils.cache import RequestCache
+from django.core.cache import cache as django_cache
+from django.core.signals import request_finished, setting_changed
+from django.dispatch import receiver
+from edx_django_utils.cache import DEFAULT_REQUEST_CACHE, RequestCache, TieredCache
+from edx_django_utils.cache.utils import CachedResponse
+from edx_django_utils.monitoring import increment
 
 from enterprise_access import __version__ as code_version
 
+logger = logging.getLogger(__name__)
+
 CACHE_KEY_SEP = ':'
 DEFAULT_NAMESPACE = 'enterprise-access-default'
 
+# blake2b is considerably faster than sha512 in CPython, and a 32-byte digest
+# (64 hex chars) is plenty to avoid collisions while keeping memcached keys short.
+CACHE_KEY_DIGEST_SIZE = 32
+
+# Bounds the memo of recently computed versioned cache keys.
+VERSIONED_CACHE_KEY_MEMO_SIZE = 4096
+
+LOCAL_CACHE_MISS = object()
+
+SoftExpiringValue = namedtuple('SoftExpiringValue', ['value', 'refresh_after'])
+SoftExpiringValue.__doc__ = """
+A cached value that should be served, but also revalidated, once ``refresh_after`` (a unix timestamp) has passed.
+The django cache timeout of the entry holding it is its hard expiry.
+"""
+
+PROCESS_LOCAL_CACHE_SETTINGS = (
+    'PROCESS_LOCAL_CACHE_TIMEOUTS',
+    'PROCESS_LOCAL_CACHE_MAX_ENTRIES',
+    'PROCESS_LOCAL_CACHE_MAX_BYTES',
+    'PROCESS_LOCAL_CACHE_METRICS_BATCH_SIZE',
+)
+
+
+@lru_cache(maxsize=1)
+def _version_suffix():
+    """
+    The suffix appended to every versioned cache key, computed once per process
+    (and again whenever the ``CACHE_KEY_VERSION_STAMP`` setting changes).
+    """
+    components = ['', code_version]
+    if stamp_from_settings := getattr(settings, 'CACHE_KEY_VERSION_STAMP', None):
+        components.append(stamp_from_settings)
+    return CACHE_KEY_SEP.join(components)
+
+
+@lru_cache(maxsize=VERSIONED_CACHE_KEY_MEMO_SIZE, typed=True)
+def _memoized_versioned_cache_key(*args):
+    # Args are passed individually, rather than as a tuple, so that ``typed=True`` tells apart
+    # args that compare equal but stringify differently (e.g. 1, 1.0 and True).
+    return _compute_versioned_cache_key(args)
+
+
+def _compute_versioned_cache_key(args):
+    decoded_cache_key = CACHE_KEY_SEP.join([str(arg) for arg in args]) + _version_suffix()
+    return hashlib.blake2b(decoded_cache_key.encode(), digest_size=CACHE_KEY_DIGEST_SIZE).hexdigest()
+
+
+@receiver(setting_changed)
+def _reset_cache_settings_memos(setting, **kwargs):  # pylint: disable=unused-argument
+    if setting == 'CACHE_KEY_VERSION_STAMP':
+        _version_suffix.cache_clear()
+        _memoized_versioned_cache_key.cache_clear()
+    if setting in PROCESS_LOCAL_CACHE_SETTINGS:
+        process_local_cache.cache_clear()
+
 
 def versioned_cache_key(*args):
     """
     Utility to produce a versioned cache key, which includes
     an optional settings variable and the current code version,
     so that we can perform key-based cache invalidation.
+
+    Keys for identical (hashable) args are memoized, since the same
+    keys tend to be computed many times over within a single request.
     """
-    components = [str(arg) for arg in args]
-    components.append(code_version)
-    if stamp_from_settings := getattr(settings, 'CACHE_KEY_VERSION_STAMP', None):
-        components.append(stamp_from_settings)
-    decoded_cache_key = CACHE_KEY_SEP.join(components)
-    return hashlib.sha512(decoded_cache_key.encode()).hexdigest()
+    try:
+        return _memoized_versioned_cache_key(*args)
+    except TypeError:
+        # Some arg is unhashable, so there's no memoizing this one.
+        return _compute_versioned_cache_key(args)
+
+
+def request_cache_key(*args):
+    """
+    Utility to produce a key for values that are only ever stored in a ``RequestCache``.
+    Such values never leave the process (nor outlive the code version that wrote them),
+    so there's no need to version or digest the key; a tuple of the stringified args will do.
+    """
+    return tuple(str(arg) for arg in args)
 
 
 def request_cache(namespace=DEFAULT_NAMESPACE):
@@ -31,3 +111,337 @@ def request_cache(namespace=DEFAULT_NAMESPACE):
     Helper that returns a namespaced RequestCache instance.
     """
     return RequestCache(namespace=namespace)
+
+
+class ProcessLocalCache:
+    """
+    A bounded, thread-safe, in-process LRU cache, whose entries expire after a per-namespace TTL.
+
+    Values are stored pickled, so that callers in different requests never share
+    (and so can't mutate) the same object, and so that each entry's size in bytes is known.
+    The least recently used entries are evicted whenever either ``max_entries``
+    or ``max_bytes`` would be exceeded.  Hits, misses, evictions and expirations are counted per namespace,
+    and reported to monitoring in batches (see ``flush_metrics()``), rather than on every lookup.
+    """
+
+    COUNTER_NAMES = ('hits', 'misses', 'evictions', 'expirations')
+
+    def __init__(self, timeouts_by_namespace, max_entries, max_bytes, metrics_batch_size=100):
+        self.timeouts_by_namespace = dict(timeouts_by_namespace)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.metrics_batch_size = metrics_batch_size
+        self._lock = threading.Lock()
+        # Maps (namespace, key) -> (expires_at, pickled_value), in least- to most-recently used order.
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._counters = defaultdict(Counter)
+        self._unreported_counters = defaultdict(Counter)
+        self._unreported_count = 0
+
+    def is_enabled(self, namespace):
+        return bool(self.timeouts_by_namespace.get(namespace))
+
+    def get(self, namespace, key):
+        """
+        Returns the cached value for the given key, or ``LOCAL_CACHE_MISS`` if absent or expired.
+        """
+        if not self.is_enabled(namespace):
+            return LOCAL_CACHE_MISS
+
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove((namespace, key))
+                self._count(namespace, 'expirations')
+                entry = None
+            if entry is None:
+                self._count(namespace, 'misses')
+                pickled_value = None
+            else:
+                self._entries.move_to_end((namespace, key))
+                self._count(namespace, 'hits')
+                pickled_value = entry[1]
+            should_flush_metrics = self._unreported_count >= self.metrics_batch_size
+
+        if should_flush_metrics:
+            self.flush_metrics()
+        if pickled_value is None:
+            return LOCAL_CACHE_MISS
+        return pickle.loads(pickled_value)
+
+    def set(self, namespace, key, value, timeout=None):
+        """
+        Caches the given value for the lesser of ``timeout`` and the namespace's TTL.
+        A ``SoftExpiringValue`` is only cached until it becomes stale, so that once the django cache holds
+        a revalidated value, this process reads that, rather than keep serving (and revalidating) its stale copy.
+        Values that can't be pickled, or that alone exceed ``max_bytes``, are not cached.
+        """
+        if not self.is_enabled(namespace):
+            return
+        ttl = self.timeouts_by_namespace[namespace]
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if isinstance(value, SoftExpiringValue):
+            ttl = min(ttl, value.refresh_after - time.time())
+        if ttl <= 0:
+            return
+
+        try:
+            pickled_value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        if len(pickled_value) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove((namespace, key))
+            self._entries[(namespace, key)] = (time.monotonic() + ttl, pickled_value)
+            self._total_bytes += len(pickled_value)
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self._count(evicted_key[0], 'evictions')
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._remove((namespace, key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Returns a dict of hit, miss, eviction and expiration counts per namespace, along with
+        the current number of entries and their total size in bytes.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'namespaces': {
+                    namespace: {name: counter[name] for name in self.COUNTER_NAMES}
+                    for namespace, counter in self._counters.items()
+                },
+            }
+
+    def flush_metrics(self):
+        """
+        Reports the counts accumulated since the last flush to monitoring, one ``increment()`` per namespace
+        and count.  Called at the end of every request, and whenever ``metrics_batch_size`` lookups
+        have gone unreported (e.g. in celery tasks).
+        """
+        with self._lock:
+            unreported_counters = self._unreported_counters
+            self._unreported_counters = defaultdict(Counter)
+            self._unreported_count = 0
+        for namespace, counter in unreported_counters.items():
+            for name, count in counter.items():
+                increment(f'process_local_cache.{namespace}.{name}', count)
+
+    def _count(self, namespace, name):
+        self._counters[namespace][name] += 1
+        self._unreported_counters[namespace][name] += 1
+        self._unreported_count += 1
+
+    def _remove(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+
+
+@lru_cache(maxsize=1)
+def process_local_cache():
+    """
+    Returns this process's ``ProcessLocalCache``, configured from settings.
+    Namespaces without a positive TTL in ``settings.PROCESS_LOCAL_CACHE_TIMEOUTS`` bypass it.
+    """
+    return ProcessLocalCache(
+        timeouts_by_namespace=getattr(settings, 'PROCESS_LOCAL_CACHE_TIMEOUTS', {}),
+        max_entries=getattr(settings, 'PROCESS_LOCAL_CACHE_MAX_ENTRIES', 1000),
+        max_bytes=getattr(settings, 'PROCESS_LOCAL_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+        metrics_batch_size=getattr(settings, 'PROCESS_LOCAL_CACHE_METRICS_BATCH_SIZE', 100),
+    )
+
+
+@receiver(request_finished)
+def _flush_process_local_cache_metrics(**kwargs):  # pylint: disable=unused-argument
+    if process_local_cache.cache_info().currsize:
+        process_local_cache().flush_metrics()
+
+
+class LocalTieredCache:
+    """
+    Like ``TieredCache``, but with a process-local tier (see ``ProcessLocalCache``) between the
+    request cache and the django cache, for the given namespace of slow-moving data.
+
+    Deletes only reach the process-local tier of the current process, so other processes may serve
+    a deleted value for up to the namespace's TTL.  Only opt in data that can tolerate that.
+    """
+
+    @staticmethod
+    def get_cached_response(key, namespace):
+        request_cached_response = DEFAULT_REQUEST_CACHE.get_cached_response(key)
+        if request_cached_response.is_found:
+            return request_cached_response
+
+        local_value = process_local_cache().get(namespace, key)
+        if local_value is not LOCAL_CACHE_MISS:
+            DEFAULT_REQUEST_CACHE.set(key, local_value)
+            return CachedResponse(is_found=True, key=key, value=local_value)
+
+        cached_response = TieredCache.get_cached_response(key)
+        if cached_response.is_found:
+            process_local_cache().set(namespace, key, cached_response.value)
+        return cached_response
+
+    @staticmethod
+    def set_all_tiers(key, value, django_cache_timeout, namespace):
+        TieredCache.set_all_tiers(key, value, django_cache_timeout)
+        process_local_cache().set(namespace, key, value, django_cache_timeout)
+
+    @staticmethod
+    def delete_all_tiers(key, namespace):
+        TieredCache.delete_all_tiers(key)
+        process_local_cache().delete(namespace, key)
+
+
+def _single_flight_lease_key(cache_key):
+    return f'single-flight:{cache_key}'
+
+
+def refresh_many_with_single_flight(cache_keys, recheck, refresh):
+    """
+    Coordinates refreshing missed cache entries so that, across the fleet, only one caller at a time
+    fetches any given entry from upstream, rather than every concurrent caller that missed it.
+
+    A lease on each missed key is taken via ``django_cache.add()`` (as ``SubsidyAccessPolicy.acquire_lock()``
+    does).  Keys we hold the lease for are refreshed immediately.  For keys some other caller holds the lease
+    for, we poll the cache for up to ``settings.SINGLE_FLIGHT_WAIT_SECONDS``; whatever still isn't cached
+    after that, or whose lease holder finished without caching anything, we refresh ourselves.
+
+    Args:
+        cache_keys (list): The cache keys that missed.
+        recheck (callable): Given a list of cache keys, returns a dict of cache key -> value for those now cached.
+        refresh (callable): Given a list of cache keys, fetches their values from upstream, caches them,
+            and returns a dict of cache key -> value.
+
+    Returns:
+        dict of cache key -> value, for each key that could be resolved.
+    """
+    lease_timeout = getattr(settings, 'SINGLE_FLIGHT_LEASE_TIMEOUT', 10)
+    wait_seconds = getattr(settings, 'SINGLE_FLIGHT_WAIT_SECONDS', 2)
+    poll_interval = getattr(settings, 'SINGLE_FLIGHT_POLL_INTERVAL', 0.05)
+
+    lease_id = str(uuid4())
+    leased_keys = [
+        cache_key for cache_key in cache_keys
+        if django_cache.add(_single_flight_lease_key(cache_key), lease_id, lease_timeout)
+    ]
+    results = {}
+    try:
+        if leased_keys:
+            results.update(refresh(leased_keys))
+    finally:
+        django_cache.delete_many([_single_flight_lease_key(cache_key) for cache_key in leased_keys])
+
+    waiting_keys = [cache_key for cache_key in cache_keys if cache_key not in leased_keys]
+    deadline = time.monotonic() + wait_seconds
+    while waiting_keys and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        results.update(recheck(waiting_keys))
+        active_leases = django_cache.get_many([_single_flight_lease_key(cache_key) for cache_key in waiting_keys])
+        # Stop waiting on keys that are now cached, or whose lease holder has given up.
+        waiting_keys = [
+            cache_key for cache_key in waiting_keys
+            if cache_key not in results and _single_flight_lease_key(cache_key) in active_leases
+        ]
+
+    remaining_keys = [
+        cache_key for cache_key in cache_keys
+        if cache_key not in results and cache_key not in leased_keys
+    ]
+    if remaining_keys:
+        results.update(recheck(remaining_keys))
+        remaining_keys = [cache_key for cache_key in remaining_keys if cache_key not in results]
+    if remaining_keys:
+        results.update(refresh(remaining_keys))
+    return results
+
+
+def refresh_with_single_flight(cache_key, refresh, recheck=None):
+    """
+    Single-key version of ``refresh_many_with_single_flight()``, for use by ``get_and_cache_*``
+    helpers once they've missed the cache for ``cache_key``.
+
+    Args:
+        cache_key (str): The cache key that missed.
+        refresh (callable): Takes no args, fetches the value from upstream, caches it, and returns it.
+        recheck (callable): Takes no args and returns a ``CachedResponse`` for ``cache_key``.
+            Defaults to checking the ``TieredCache``.
+
+    Returns:
+        The refreshed (or concurrently cached) value.
+    """
+    if recheck is None:
+        def recheck():
+            return TieredCache.get_cached_response(cache_key)
+
+    def recheck_many(_):
+        cached_response = recheck()
+        return {cache_key: cached_response.value} if cached_response.is_found else {}
+
+    results = refresh_many_with_single_flight(
+        [cache_key],
+        recheck_many,
+        lambda _: {cache_key: refresh()},
+    )
+    return results[cache_key]
+
+
+def wrap_soft_expiring_value(value, soft_timeout):
+    """
+    Wraps ``value`` for caching, such that it becomes stale after ``soft_timeout`` seconds.
+    """
+    return SoftExpiringValue(value, time.time() + soft_timeout)
+
+
+def unwrap_soft_expiring_value(cached_value):
+    """
+    Returns a tuple of (value, is_stale) for something read from a cache that holds ``SoftExpiringValue`` entries.
+    Plain values, e.g. cached before stale-while-revalidate was introduced, are never considered stale.
+    """
+    if isinstance(cached_value, SoftExpiringValue):
+        return cached_value.value, time.time() >= cached_value.refresh_after
+    return cached_value, False
+
+
+def _revalidation_lease_key(cache_key):
+    return f'revalidate:{cache_key}'
+
+
+def schedule_revalidation(cache_keys, revalidate):
+    """
+    Call after serving stale values for ``cache_keys``.  Calls ``revalidate`` with those of the keys that
+    no caller has scheduled a revalidation of in the last ``settings.STALE_WHILE_REVALIDATE_LEASE_TIMEOUT``
+    seconds.  ``revalidate`` should schedule, not perform, the refresh, e.g. by enqueuing a celery task.
+
+    Returns: The list of cache keys that this call scheduled a revalidation of.
+    """
+    lease_timeout = getattr(settings, 'STALE_WHILE_REVALIDATE_LEASE_TIMEOUT', 60)
+    leased_keys = [
+        cache_key for cache_key in cache_keys
+        if django_cache.add(_revalidation_lease_key(cache_key), True, lease_timeout)
+    ]
+    if not leased_keys:
+        return []
+    try:
+        revalidate(leased_keys)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception(f'Failed to schedule revalidation of cache keys {leased_keys}')
+        django_cache.delete_many([_revalidation_lease_key(cache_key) for cache_key in leased_keys])
+        return []
+    increment('stale_while_revalidate_scheduled')
+    return leased_keys
@@ -0,0 +1,259 @@
+"""
+Utils for fanning out independent, I/O-bound upstream calls across a bounded thread pool.
+"""
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from functools import partial
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from django.conf import settings
+from django.db import connections
+from edx_django_utils.cache import RequestCache
+
+from enterprise_access.cache_utils import DEFAULT_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAN_OUT_MAX_WORKERS = 8
+DEFAULT_FAN_OUT_TIMEOUT_SECONDS = 10
+
+# The deadline of the fan_out() whose call is running on the current thread, if any.
+_enclosing_fan_out_deadline = ContextVar('enclosing_fan_out_deadline', default=None)
+
+FanOutResult = namedtuple('FanOutResult', ['results', 'errors', 'pending'])
+FanOutResult.__doc__ = """
+The outcome of a ``fan_out()`` call.
+
+results: dict mapping call key -> return value, for calls that completed without error.
+errors: dict mapping call key -> exception instance, for calls that raised.
+pending: list of call keys that did not complete before the deadline.
+"""
+
+
+def fan_out_max_workers():
+    return getattr(settings, 'UPSTREAM_FAN_OUT_MAX_WORKERS', DEFAULT_FAN_OUT_MAX_WORKERS)
+
+
+def fan_out_timeout():
+    return getattr(settings, 'UPSTREAM_FAN_OUT_TIMEOUT_SECONDS', DEFAULT_FAN_OUT_TIMEOUT_SECONDS)
+
+
+def deadline_from_now(timeout=None):
+    """
+    Returns a ``time.monotonic()`` deadline that is ``timeout`` seconds (default from settings) from now.
+    """
+    if timeout is None:
+        timeout = fan_out_timeout()
+    return time.monotonic() + timeout
+
+
+def _snapshot_request_caches(namespaces):
+    return {namespace: dict(RequestCache(namespace).data) for namespace in namespaces}
+
+
+def _call_with_request_caches(func, request_cache_snapshot, abandoned, deadline):
+    """
+    Runs ``func`` in a worker thread, seeded with a copy of the calling thread's request caches.
+    ``RequestCache`` is thread-local, so anything ``func`` writes to it is returned
+    alongside its result, for the calling thread to merge back into its own request caches.
+    Once the calling thread has ``abandoned`` this call, it isn't started, and whatever it cached is dropped.
+    Any ``fan_out()`` made by ``func`` itself is bound by the given ``deadline``.
+    """
+    if abandoned.is_set():
+        return None, {}
+    RequestCache.clear_all_namespaces()
+    deadline_token = _enclosing_fan_out_deadline.set(deadline)
+    try:
+        for namespace, data in request_cache_snapshot.items():
+            RequestCache(namespace).data.update(data)
+        result = func()
+        if abandoned.is_set():
+            return None, {}
+        return result, _snapshot_request_caches(request_cache_snapshot.keys())
+    finally:
+        _enclosing_fan_out_deadline.reset(deadline_token)
+        RequestCache.clear_all_namespaces()
+        connections.close_all()
+
+
+def fan_out(calls, max_workers=None, deadline=None, request_cache_namespaces=()):
+    """
+    Concurrently execute independent, zero-argument callables on a bounded thread pool.
+
+    Only use this for calls that spend their time waiting on upstream services; DB access
+    should stay on the request thread.  Request-scoped caching is preserved: each call
+    sees the request caches of the calling thread, and whatever it caches there is visible
+    to the calling thread once ``fan_out()`` returns.  ``TieredCache`` request caching
+    is always propagated, in addition to the given ``request_cache_namespaces``.
+
+    Calls still running at the deadline are abandoned (their results, and whatever they request-cached,
+    are discarded) and reported as ``pending``, so that callers may fall back to making those calls sequentially.
+
+    ``requests.Session`` isn't thread-safe, so calls shouldn't share API clients with one another, nor with the
+    calling thread, which may keep using them while abandoned calls are still running.  Give each call a client
+    of its own, e.g. by constructing it within the call.
+
+    A ``fan_out()`` made from within a call of another one doesn't start threads of its own, which would multiply
+    the outer ``max_workers``: its calls run sequentially on the worker thread, bound by the outer deadline.
+
+    Args:
+        calls (dict): Mapping of hashable keys to zero-argument callables.
+        max_workers (int): Cap on concurrent calls, defaults to ``settings.UPSTREAM_FAN_OUT_MAX_WORKERS``.
+        deadline (float): A ``time.monotonic()`` value after which to stop waiting for results,
+            defaults to ``settings.UPSTREAM_FAN_OUT_TIMEOUT_SECONDS`` from now.
+        request_cache_namespaces (iterable): Additional ``RequestCache`` namespaces to propagate.
+
+    Returns:
+        FanOutResult
+    """
+    results, errors = {}, {}
+    if not calls:
+        return FanOutResult(results, errors, [])
+
+    enclosing_deadline = _enclosing_fan_out_deadline.get()
+    if enclosing_deadline is not None:
+        # This worker thread already takes up its share of the enclosing fan-out's workers.
+        return _run_sequentially(calls, enclosing_deadline if deadline is None else min(deadline, enclosing_deadline))
+
+    if max_workers is None:
+        max_workers = fan_out_max_workers()
+    if deadline is None:
+        deadline = deadline_from_now()
+
+    if max_workers <= 1 or len(calls) == 1:
+        return _run_sequentially(calls, deadline)
+
+    namespaces = {None, DEFAULT_NAMESPACE, *request_cache_namespaces}
+    request_cache_snapshot = _snapshot_request_caches(namespaces)
+
+    abandoned = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(calls)), thread_name_prefix='upstream-fan-out')
+    try:
+        futures = {
+            executor.submit(_call_with_request_caches, func, request_cache_snapshot, abandoned, deadline): key
+            for key, func in calls.items()
+        }
+        done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+    finally:
+        abandoned.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Iterate in submission order so that results are merged deterministically.
+    for future, key in futures.items():
+        if future not in done:
+            continue
+        try:
+            result, worker_request_caches = future.result()
+        except Exception as exc:  # pylint: disable=broad-except
+            errors[key] = exc
+            continue
+        results[key] = result
+        for namespace, data in worker_request_caches.items():
+            RequestCache(namespace).data.update(data)
+
+    pending = [futures[future] for future in futures if future in not_done]
+    if pending:
+        logger.warning(f'[fan_out] {len(pending)} of {len(calls)} calls did not complete before the deadline')
+    return FanOutResult(results, errors, pending)
+
+
+def _run_sequentially(calls, deadline):
+    """
+    Executes the given calls in order on the calling thread, until the deadline passes.
+    """
+    results, errors, pending = {}, {}, []
+    for key, func in calls.items():
+        if time.monotonic() > deadline:
+            pending.append(key)
+            continue
+        try:
+            results[key] = func()
+        except Exception as exc:  # pylint: disable=broad-except
+            errors[key] = exc
+    return FanOutResult(results, errors, pending)
+
+
+def _remaining_page_urls(first_page):
+    """
+    Helper to compute the URLs of every page after ``first_page`` of a paginated DRF list response,
+    from its ``count``, ``next`` link and page size.  Supports page-number and limit-offset pagination.
+
+    Returns: A list of URLs, or None if they can't be determined (e.g. no count, or cursor pagination).
+    """
+    next_url = first_page.get('next')
+    count = first_page.get('count')
+    page_size = len(first_page.get('results') or [])
+    if not next_url or not count or not page_size:
+        return None
+
+    parsed_url = urlparse(next_url)
+    query_params = parse_qs(parsed_url.query, keep_blank_values=True)
+    try:
+        if 'page' in query_params:
+            param_name = 'page'
+            param_values = range(int(query_params['page'][0]), math.ceil(count / page_size) + 1)
+        elif 'offset' in query_params and 'limit' in query_params:
+            param_name = 'offset'
+            param_values = range(int(query_params['offset'][0]), count, int(query_params['limit'][0]))
+        else:
+            return None
+    except ValueError:
+        return None
+
+    return [
+        parsed_url._replace(query=urlencode({**query_params, param_name: [str(value)]}, doseq=True)).geturl()
+        for value in param_values
+    ]
+
+
+def _get_page_with(new_get_page, url):
+    return new_get_page()(url)
+
+
+def fetch_all_pages(first_page, get_page, max_workers=None, new_get_page=None):
+    """
+    Fetches every page after ``first_page`` of a paginated DRF list response.
+
+    When the URLs of the remaining pages can be derived from the first page (see ``_remaining_page_urls()``),
+    they're fetched concurrently via ``fan_out()``.  Otherwise, ``next`` links are followed one at a time.
+    Either way, pages are only kept as long as the previous one links to a next page, and any ``next`` link
+    on the last page is still followed, so that items added or removed meanwhile don't break traversal.
+
+    Args:
+        first_page (dict): The already-fetched, JSON-decoded first page.
+        get_page (callable): Given a page URL, fetches and returns that page as a JSON-decoded dict.
+            Should raise on unsuccessful responses.
+        max_workers (int): Cap on concurrent page fetches, defaults to ``settings.UPSTREAM_FAN_OUT_MAX_WORKERS``.
+        new_get_page (callable): Returns a new ``get_page``, bound to an API client of its own, for each page
+            that's fetched concurrently (see ``fan_out()``).  Defaults to sharing ``get_page``, which is only safe
+            if it doesn't use a ``requests.Session`` of the calling thread.
+
+    Returns:
+        list of dict: All pages, in order, starting with ``first_page``.
+
+    Raises:
+        Whatever ``get_page`` raised for the earliest page that failed.
+    """
+    pages = [first_page]
+    page_urls = _remaining_page_urls(first_page)
+    if page_urls:
+        fetch_page = partial(_get_page_with, new_get_page) if new_get_page else get_page
+        outcome = fan_out({url: partial(fetch_page, url) for url in page_urls}, max_workers=max_workers)
+        for url in page_urls:
+            if not pages[-1].get('next'):
+                # Items were removed meanwhile, and there are fewer pages than we expected.
+                break
+            if url in outcome.errors:
+                raise outcome.errors[url]
+            pages.append(outcome.results[url] if url in outcome.results else get_page(url))
+
+    next_url = pages[-1].get('next')
+    while next_url:
+        pages.append(get_page(next_url))
+        next_url = pages[-1].get('next')
+    return pages
@@ -527,6 +527,79 @@ ENTERPRISE_COURSE_ENROLLMENTS_CACHE_TIMEOUT = 0  # 0 seconds (no caching, as enr
 SUBSIDY_RECORD_CACHE_TIMEOUT = DEFAULT_CACHE_TIMEOUT
 DEFAULT_ENTERPRISE_ENROLLMENT_INTENTIONS_CACHE_TIMEOUT = DEFAULT_CACHE_TIMEOUT
 ALL_ENTERPRISE_GROUP_MEMBERS_CACHE_TIMEOUT = DEFAULT_CACHE_TIMEOUT
+# Learner transactions are invalidated whenever we redeem, or a transaction is reversed,
+# so this only bounds staleness from writes that happen outside of this service.
+LEARNER_TRANSACTIONS_CACHE_TIMEOUT = 60 * 1  # 1 minute
+
+# Stale-while-revalidate: entries older than these soft timeouts are still served until their (hard)
+# timeouts above, but a background refresh of them is scheduled, at most once per lease timeout per entry.
+CONTENT_METADATA_CACHE_SOFT_TIMEOUT = 60 * 20  # 20 minutes
+SUBSIDY_RECORD_CACHE_SOFT_TIMEOUT = 60 * 3  # 3 minutes
+STALE_WHILE_REVALIDATE_LEASE_TIMEOUT = 60  # 1 minute
+
+# How long content that the catalog service didn't return (e.g. restricted or retired runs) is negatively cached.
+CONTENT_METADATA_NEGATIVE_CACHE_TIMEOUT = 60 * 2  # 2 minutes
+
+# Process-local (L1) cache tier in front of the django cache, for slow-moving data.
+# Maps namespace -> TTL in seconds. Namespaces not listed here bypass the L1 tier.
+PROCESS_LOCAL_CACHE_TIMEOUTS = {
+    'subsidy_record': 60,  # 1 minute
+    'enterprise_customer': 60 * 5,  # 5 minutes
+    'catalog_content_metadata': 60 * 5,  # 5 minutes
+    # Versioned in the django cache, and dropped by every process whenever a policy is saved.
+    'redeemable_policies': 30,
+}
+PROCESS_LOCAL_CACHE_MAX_ENTRIES = 5000
+PROCESS_LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+# Process-local cache hits, misses and evictions are reported to monitoring at the end of each request,
+# or after this many lookups, whichever comes first.
+PROCESS_LOCAL_CACHE_METRICS_BATCH_SIZE = 100
+
+# Bounds on concurrent fan-out of upstream API calls within a single request
+UPSTREAM_FAN_OUT_MAX_WORKERS = 8
+UPSTREAM_FAN_OUT_TIMEOUT_SECONDS = 10
+
+# Large catalog content metadata fetches are split into chunks of at most this many keys
+# (the enterprise-catalog endpoint supports up to 100 per request), and of at most this many
+# characters of URL-encoded content_keys query parameters.  Chunks are fetched concurrently,
+# and each chunk that fails is retried on its own this many times.
+CATALOG_CONTENT_METADATA_CHUNK_SIZE = 100
+CATALOG_CONTENT_METADATA_CHUNK_MAX_QUERY_LENGTH = 4000
+CATALOG_CONTENT_METADATA_CHUNK_RETRIES = 1
+
+# Warming the content metadata of live assignments: how many keys are fetched at a time,
+# and how long to sleep between fetches, to rate limit requests to the catalog service.
+CONTENT_METADATA_WARMING_BATCH_SIZE = 100
+CONTENT_METADATA_WARMING_SLEEP_SECONDS = 1
+
+# Single-flight refreshes of missed cache entries: how long a refresh lease lives,
+# and how long (and how often) other callers poll the cache for the lease holder's result.
+SINGLE_FLIGHT_LEASE_TIMEOUT = 10
+SINGLE_FLIGHT_WAIT_SECONDS = 2
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+# Policy locks are leases, renewed while held, that expire after POLICY_LOCK_LEASE_TIMEOUT seconds
+# if their holder dies.  Redemption waits up to POLICY_LOCK_REDEEM_WAIT_SECONDS for a contended lock,
+# polling with jittered exponential backoff.
+POLICY_LOCK_LEASE_TIMEOUT = 30
+POLICY_LOCK_REDEEM_WAIT_SECONDS = 5
+POLICY_LOCK_POLL_INTERVAL = 0.05
+POLICY_LOCK_MAX_POLL_INTERVAL = 0.5
+
+# Reservations of a policy's spend by in-flight redemptions are added to POLICY_SPEND_RESERVATION_STRIPES
+# counters per POLICY_SPEND_RESERVATION_TIMEOUT-long time bucket, each expiring three buckets after it's created,
+# which bounds the impact of reservations leaked by a crashed process.  The timeout must comfortably exceed
+# the subsidy transaction API timeout.
+POLICY_SPEND_RESERVATION_TIMEOUT = 60 * 5  # 5 minutes
+POLICY_SPEND_RESERVATION_STRIPES = 8
+
+# Policy spend snapshots (see PolicySpendSnapshot) answer spend checks for up to POLICY_SPEND_SNAPSHOT_MAX_AGE
+# seconds after they were last reconciled (0 disables them), which bounds drift from writes this service doesn't
+# make itself.  Reconciliation (the reconcile_policy_spend_snapshots management command) must therefore be
+# scheduled to run more often than that before enabling them, e.g. with a max age of 15 minutes.
+# It warns about any snapshot found to be off by more than POLICY_SPEND_SNAPSHOT_DRIFT_WARNING_THRESHOLD USD cents.
+POLICY_SPEND_SNAPSHOT_MAX_AGE = 0
+POLICY_SPEND_SNAPSHOT_DRIFT_WARNING_THRESHOLD = 100
 
 BRAZE_GROUP_EMAIL_FORCE_REMIND_ALL_PENDING_LEARNERS = False
 BRAZE_GROUPS_EMAIL_AUTO_REMINDER_DAY_5_CAMPAIGN = ''
@@ -27,6 +27,9 @@ results_dir = tempfile.TemporaryDirectory()
 CELERY_RESULT_BACKEND = f'file://{results_dir.name}'
 # END CELERY
 
+# The process-local cache tier outlives the django cache clears between tests, so it's off by default.
+PROCESS_LOCAL_CACHE_TIMEOUTS = {}
+
 ECOMMERCE_URL = 'http://ecommerce.example.com'
 LICENSE_MANAGER_URL = 'http://license-manager.example.com'
 LMS_URL = 'http://edx-platform.example.com'
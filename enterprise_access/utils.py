@@ -13,6 +13,8 @@ from pytz import UTC
 from enterprise_access.apps.content_assignments.constants import AssignmentAutomaticExpiredReason
 from enterprise_access.apps.content_assignments.content_metadata_api import (
     get_content_metadata_for_assignments,
+    get_course_run_metadata_for_course,
+    get_normalized_metadata_for_course,
     parse_datetime_string
 )
 from enterprise_access.apps.enterprise_groups.constants import (
@@ -226,13 +228,7 @@ def get_normalized_metadata_for_assignment(assignment, content_metadata):
     Returns:
         dict: Normalized metadata, either for a specific course run or the advertised course run, if any.
     """
-    normalized_metadata_by_run = content_metadata.get('normalized_metadata_by_run', {})
-    # Return the content metadata for a specific course run based on the preferred_course_run_key
-    if preferred_course_run_key := assignment.preferred_course_run_key:
-        return normalized_metadata_by_run.get(preferred_course_run_key, {})
-    # Return current advertised course run metadata if preferred_course_run_key is NULL (i.e.,
-    # impacting legacy course-based assignments created pre-May 2024).
-    return content_metadata.get('normalized_metadata', {})
+    return get_normalized_metadata_for_course(assignment, content_metadata)
 
 
 def _curr_date(date_format=None):
@@ -249,12 +245,6 @@ def _days_from_now(days_from_now=0, date_format=None):
     return date.strftime(date_format)
 
 
-def get_advertised_course_run_metadata(content_metadata):
-    course_runs = content_metadata.get('course_runs', [])
-    advertised_course_run_uuid = content_metadata.get('advertised_course_run_uuid')
-    return next((run for run in course_runs if run.get('uuid') == advertised_course_run_uuid), None)
-
-
 def get_course_run_metadata_for_assignment(assignment, content_metadata):
     """
     Retrieves metadata for a specific course run associated with an assignment. If the assignment has
@@ -268,25 +258,7 @@ def get_course_run_metadata_for_assignment(assignment, content_metadata):
     Returns:
         dict: Course run metadata if available, otherwise advertised_course_run.
     """
-    course_runs = content_metadata.get('course_runs', [])
-
-    # For run-based assignments, return metadata for the preferred course run if
-    # available. If not, fallback to advertised run.
-    if preferred_course_run_key := assignment.preferred_course_run_key:
-        course_run = next((run for run in course_runs if run.get('key') == preferred_course_run_key), None)
-        if not course_run:
-            logger.warning(
-                'Metadata not found for preferred course run key %s in content metadata %s. Assignment UUID: %s',
-                preferred_course_run_key,
-                content_metadata.get('key'),
-                assignment.uuid
-            )
-            # Fallback to advertised course run if preferred course run metadata is missing
-            return get_advertised_course_run_metadata(content_metadata)
-        return course_run
-
-    # For course-based assignments, return metadata for the advertised course run
-    return get_advertised_course_run_metadata(content_metadata)
+    return get_course_run_metadata_for_course(assignment, content_metadata)
 
 
 def determine_timeout_offset(
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of cache key construction along the can-redeem path.
+
+Compares the original key construction (sha512 over every key, no memoization)
+with the current ``enterprise_access.cache_utils`` helpers, for the keys computed
+when checking redeemability of some content keys against a customer's policies.
+
+Usage (from the repository root):
+
+    python scripts/benchmark_cache_keys.py [--policies 4] [--content-keys 25] [--repeat 200]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import timeit
+from uuid import uuid4
+
+import django
+from django.conf import settings
+
+
+def make_legacy_versioned_cache_key(code_version):
+    """
+    Returns the original implementation of ``versioned_cache_key()``.
+    """
+    def legacy_versioned_cache_key(*args):
+        components = [str(arg) for arg in args]
+        components.append(code_version)
+        if stamp_from_settings := getattr(settings, 'CACHE_KEY_VERSION_STAMP', None):
+            components.append(stamp_from_settings)
+        decoded_cache_key = ':'.join(components)
+        return hashlib.sha512(decoded_cache_key.encode()).hexdigest()
+    return legacy_versioned_cache_key
+
+
+def can_redeem_keys(tiered_key_func, request_key_func, customer_uuid, lms_user_id, policies, content_keys):
+    """
+    Computes the cache keys that evaluating every policy against every content key touches.
+    """
+    tiered_key_func('get_enterprise_user', customer_uuid, lms_user_id)
+    for policy_uuid, subsidy_uuid, catalog_uuid in policies:
+        request_key_func('get_subsidy_record', customer_uuid, subsidy_uuid)
+        request_key_func('aggregates_for_policy', subsidy_uuid, policy_uuid)
+        request_key_func('get_transactions_for_learner', subsidy_uuid, lms_user_id)
+        for content_key in content_keys:
+            tiered_key_func('contains_content_key', catalog_uuid, content_key)
+            tiered_key_func('get_subsidy_content_metadata', customer_uuid, content_key)
+            request_key_func('subsidy_can_redeem', subsidy_uuid, lms_user_id, content_key)
+            request_key_func('get_assignment', policy_uuid, lms_user_id, content_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policies', type=int, default=4)
+    parser.add_argument('--content-keys', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    settings.configure(CACHE_KEY_VERSION_STAMP='benchmark')
+    django.setup()
+    # pylint: disable=import-outside-toplevel
+    from enterprise_access import __version__ as code_version
+    from enterprise_access.cache_utils import request_cache_key, versioned_cache_key
+
+    legacy_versioned_cache_key = make_legacy_versioned_cache_key(code_version)
+
+    customer_uuid = uuid4()
+    lms_user_id = 12345
+    policies = [(uuid4(), uuid4(), uuid4()) for _ in range(args.policies)]
+    content_keys = [f'course-v1:edX+DemoX{i}+2T2024' for i in range(args.content_keys)]
+
+    timings = {
+        'legacy (sha512, no memo)': timeit.timeit(
+            lambda: can_redeem_keys(
+                legacy_versioned_cache_key, legacy_versioned_cache_key,
+                customer_uuid, lms_user_id, policies, content_keys,
+            ),
+            number=args.repeat,
+        ),
+        'current (blake2b + memo, tuple request keys)': timeit.timeit(
+            lambda: can_redeem_keys(
+                versioned_cache_key, request_cache_key,
+                customer_uuid, lms_user_id, policies, content_keys,
+            ),
+            number=args.repeat,
+        ),
+    }
+    baseline = timings['legacy (sha512, no memo)']
+    for name, seconds in timings.items():
+        per_request_us = seconds / args.repeat * 1e6
+        print(f'{name:<48} {per_request_us:>10.1f} us/request  {baseline / seconds:>5.1f}x')
+
+
+if __name__ == '__main__':
+    main()